@@ -0,0 +1,251 @@
+"""Shared cache for the results of pure actions.
+
+An action opts into caching either with the ``cacheable`` decorator or with a
+``cache:`` entry on the action in the role template, which takes precedence.
+Only actions whose result depends solely on their key (the selected target
+slots and, optionally, the user query) may be cached: side effects such as
+writing slots are not replayed on a hit.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.entity.action_context import ActionContext
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_POLICY_ATTR = "cache_policy"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Data class describing how the results of an action are cached."""
+
+    # Seconds a result stays valid, None to keep it until evicted
+    ttl: Optional[float] = None
+    # Target slots the result depends on, None for every filled slot
+    key_slots: Optional[Tuple[str, ...]] = None
+    include_query: bool = False
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "CachePolicy":
+        """Create a policy from the ``cache:`` entry of a role template action.
+
+        Args:
+            config: Mapping with optional ttl, key_slots and include_query keys
+
+        Returns:
+            CachePolicy: The policy described by the config
+
+        Raises:
+            ValueError: If the config has unknown keys or an invalid ttl
+        """
+        unknown = set(config) - {"ttl", "key_slots", "include_query"}
+        if unknown:
+            raise ValueError(f"Unknown cache options: {', '.join(sorted(unknown))}")
+        ttl = config.get("ttl")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Cache ttl must be positive, got {ttl}")
+        key_slots = config.get("key_slots")
+        return cls(
+            ttl=ttl,
+            key_slots=tuple(key_slots) if key_slots is not None else None,
+            include_query=bool(config.get("include_query", False)),
+        )
+
+
+def cacheable(
+    ttl: Optional[float] = None,
+    key_slots: Optional[List[str]] = None,
+    include_query: bool = False,
+) -> Callable[[Callable], Callable]:
+    """Declare an action as pure so the registry may serve it from the cache.
+
+    The decorated function is returned unchanged apart from the policy
+    attribute, so it is still registered under its own name and module.
+
+    Args:
+        ttl: Seconds a result stays valid, None to keep it until evicted
+        key_slots: Target slots the result depends on, None for all filled slots
+        include_query: Whether the user query is part of the key
+
+    Returns:
+        Callable: Decorator attaching the cache policy to the action
+    """
+    policy = CachePolicy.from_config(
+        {"ttl": ttl, "key_slots": key_slots, "include_query": include_query}
+    )
+
+    def decorator(function: Callable) -> Callable:
+        setattr(function, CACHE_POLICY_ATTR, policy)
+        return function
+
+    return decorator
+
+
+def _freeze(value: Any) -> Hashable:
+    """Convert slot values such as lists into hashable key parts."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+@dataclass
+class ActionCacheStats:
+    """Data class counting cache lookups of one action."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ActionCache:
+    """Bounded LRU cache of action results shared by all engagements."""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Number of results kept before the least recently used is evicted
+            clock: Time source for TTL expiry, injectable for tests
+        """
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.max_entries = max_entries
+        self._clock = clock
+        # key -> (result, expires_at)
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._stats: Dict[str, ActionCacheStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(action_id: str, policy: CachePolicy, context: ActionContext) -> Tuple:
+        """Build the cache key of an action call.
+
+        Args:
+            action_id: Scope and name of the action, e.g. "make_recommendation/generate_recommendation"
+            policy: Cache policy of the action
+            context: Inputs the action is executed with
+
+        Returns:
+            Tuple: Hashable key identifying the result
+        """
+        slots = context.slots
+        if slots is None:
+            slot_values = ()
+        elif policy.key_slots is None:
+            slot_values = _freeze(slots.filled())
+        else:
+            slot_values = tuple(
+                (name, _freeze(slots.get(name))) for name in policy.key_slots
+            )
+        query = context.user_query if policy.include_query else None
+        return (action_id, slot_values, query)
+
+    def get(self, action_id: str, key: Tuple) -> Tuple[bool, Any]:
+        """Look up a result, counting the hit or miss against the action.
+
+        Args:
+            action_id: Action the statistics are recorded for
+            key: Key built by make_key
+
+        Returns:
+            Tuple[bool, Any]: Whether the result was found, and the result
+        """
+        with self._lock:
+            stats = self._stats.setdefault(action_id, ActionCacheStats())
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    stats.hits += 1
+                    return True, result
+                del self._entries[key]
+            stats.misses += 1
+            return False, None
+
+    def put(self, key: Tuple, result: Any, ttl: Optional[float] = None) -> None:
+        """Store a result, evicting the least recently used ones when full.
+
+        Args:
+            key: Key built by make_key
+            result: Result of the action
+            ttl: Seconds the result stays valid, None to keep it until evicted
+        """
+        expires_at = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted_stats = self._stats.get(evicted_key[0])
+                if evicted_stats is not None:
+                    evicted_stats.evictions += 1
+
+    def wrap(self, action_id: str, function: Callable, policy: CachePolicy) -> Callable:
+        """Wrap an action so repeated calls are served from the cache.
+
+        Args:
+            action_id: Scope and name of the action
+            function: The registered action function
+            policy: Cache policy of the action
+
+        Returns:
+            Callable: Function with the same signature as the action
+        """
+
+        @functools.wraps(function)
+        def cached_action(context: ActionContext):
+            key = self.make_key(action_id, policy, context)
+            found, result = self.get(action_id, key)
+            if found:
+                logger.debug("Serving %s from the action cache", action_id)
+                return result
+            result = function(context)
+            self.put(key, result, policy.ttl)
+            return result
+
+        return cached_action
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get the lookup statistics of every cached action.
+
+        Returns:
+            Dict[str, Dict[str, float]]: hits, misses, evictions and hit_rate per action
+        """
+        with self._lock:
+            return {
+                action_id: {
+                    "hits": stats.hits,
+                    "misses": stats.misses,
+                    "evictions": stats.evictions,
+                    "hit_rate": stats.hit_rate,
+                }
+                for action_id, stats in self._stats.items()
+            }
+
+    def clear(self) -> None:
+        """Drop every cached result and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,313 @@
+"""Process pool running the CPU-bound actions of roles.
+
+An action opts in with ``cpu_bound: true`` on the action in the role template.
+Running it inline would hold the GIL and stall every other engagement served
+by the process, so it runs on a shared pool of worker processes instead. The
+workers import the ``ext`` modules once when they start, and a call only sends
+the module and name of the action with a copy of the query, event, state and
+the slot values the action reads, and receives the result. Changes the action
+makes to the context, such as writing slots, stay in the worker, so only
+actions that return their whole effect may be CPU-bound.
+
+Workers are forked where the platform allows it, so they start with the
+modules of the parent already loaded; ``warm`` starts them ahead of the first
+call, preferably before the process starts request threads. The only thread
+a fork must not lose, the log listener, is restarted in the workers by
+``utils.logging``.
+"""
+import functools
+import importlib
+import multiprocessing
+import pkgutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from core.entity.action_context import ActionContext
+from core.entity.target import Target
+from utils.logging import bind_log_context, logging, reset_log_context
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTION_POOL_TASKS = metrics.counter(
+    "action_pool_tasks",
+    "CPU-bound action calls by where they ran",
+    ["action", "outcome"],
+)
+ACTION_POOL_WAIT_SECONDS = metrics.histogram(
+    "action_pool_wait_seconds",
+    "Time CPU-bound action calls waited for a worker",
+    ["action"],
+)
+ACTION_POOL_RUN_SECONDS = metrics.histogram(
+    "action_pool_run_seconds",
+    "Time CPU-bound actions ran in a worker",
+    ["action"],
+)
+ACTION_POOL_BUSY_SECONDS = metrics.counter(
+    "action_pool_busy_seconds",
+    "Seconds workers spent running actions; divide its rate by the workers",
+)
+ACTION_POOL_IN_FLIGHT = metrics.gauge(
+    "action_pool_in_flight", "CPU-bound action calls submitted and not done"
+)
+ACTION_POOL_WORKERS = metrics.gauge(
+    "action_pool_workers", "Worker processes of the action pool"
+)
+
+
+def _import_ext() -> None:
+    """Import every ext module, run once by each worker when it starts."""
+    package = importlib.import_module("ext")
+    for _, module_name, _ in pkgutil.iter_modules(package.__path__):
+        importlib.import_module(f"ext.{module_name}")
+
+
+def _ping() -> None:
+    """Task submitted to start the workers."""
+
+
+def _run_action(
+    module: str, name: str, context: ActionContext
+) -> Tuple[Any, float, float]:
+    """Run an action in a worker.
+
+    Returns:
+        The result of the action, the wall clock time it started at and the
+        seconds it ran
+    """
+    started_at = time.time()
+    started = time.perf_counter()
+    log_context = bind_log_context(
+        engagement_id=context.engagement_id, state=context.state, event=context.event
+    )
+    try:
+        result = getattr(importlib.import_module(module), name)(context)
+    finally:
+        reset_log_context(log_context)
+    return result, started_at, time.perf_counter() - started
+
+
+def _worker_context(
+    context: ActionContext, slots: Optional[Iterable[str]]
+) -> ActionContext:
+    """Copy the inputs an action reads into a context that is cheap to send.
+
+    The target keeps only the definitions and values of the given slots, and
+    the deadline stays with the turn, as its degradations would be lost.
+
+    Args:
+        context: Context the action was called with
+        slots: Slots the action reads, None for every filled slot
+
+    Returns:
+        ActionContext: The copy sent to the worker
+    """
+    target = None
+    if context.target is not None:
+        store = context.target.slots
+        values = store.filled()
+        if slots is not None:
+            values = {name: values[name] for name in slots if name in values}
+        target = Target(
+            name=context.target.name,
+            description="",
+            slot_definitions=[store.get_definition(name) for name in values],
+            engagement_id=context.engagement_id,
+        )
+        for name, value in values.items():
+            target.slots.set(name, value)
+    return ActionContext(
+        user_query=context.user_query,
+        event=context.event,
+        state=context.state,
+        target=target,
+        engagement_id=context.engagement_id,
+        extracted_slots=context.extracted_slots,
+    )
+
+
+def _default_start_method() -> str:
+    """Fork where available, so workers start with the parent's modules."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return "fork"
+    return multiprocessing.get_start_method()
+
+
+class ActionPool:  # pylint:disable=too-many-instance-attributes
+    """Shared pool of worker processes running CPU-bound actions."""
+
+    def __init__(self, max_workers: int = 0, start_method: Optional[str] = None):
+        """Initialize the pool without starting workers.
+
+        Args:
+            max_workers: Worker processes, 0 to run CPU-bound actions inline
+            start_method: Multiprocessing start method, fork where available
+        """
+        self.max_workers = max_workers
+        self.start_method = start_method or _default_start_method()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._tasks = 0
+        self._in_flight = 0
+        self._busy_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether CPU-bound actions run in worker processes."""
+        return self.max_workers > 0
+
+    def configure(self, max_workers: int) -> None:
+        """Resize the pool, replacing the workers if any are running.
+
+        Args:
+            max_workers: Worker processes, 0 to run CPU-bound actions inline
+
+        Raises:
+            ValueError: If max_workers is negative
+        """
+        if max_workers < 0:
+            raise ValueError(f"max_workers must not be negative, got {max_workers}")
+        self.shutdown()
+        self.max_workers = max_workers
+
+    def warm(self) -> None:
+        """Start every worker and wait until they imported the ext modules."""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(_ping) for _ in range(self.max_workers)]:
+            future.result()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_import_ext,
+                )
+                self._started = time.perf_counter()
+                ACTION_POOL_WORKERS.set(self.max_workers)
+                logger.info(
+                    "Started %d action workers (%s)",
+                    self.max_workers,
+                    self.start_method,
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken executor so the next call starts new workers."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def wrap(
+        self,
+        action_id: str,
+        function: Callable,
+        slots: Optional[Iterable[str]] = None,
+    ) -> Callable:
+        """Wrap an action so it runs in a worker process.
+
+        Args:
+            action_id: Scope and name of the action
+            function: The registered action function
+            slots: Target slots the action reads, None to send every filled slot
+
+        Returns:
+            Callable: Function with the same signature as the action
+
+        Raises:
+            ValueError: If the worker cannot find the function by its module
+                and name, e.g. for lambdas and nested functions
+        """
+        module, name = function.__module__, function.__name__
+        if getattr(sys.modules.get(module), name, None) is not function:
+            raise ValueError(
+                f"Action {action_id} must be a module level function to be cpu_bound"
+            )
+
+        slots = tuple(slots) if slots is not None else None
+
+        @functools.wraps(function)
+        def pooled_action(context: ActionContext):
+            if not self.enabled:
+                ACTION_POOL_TASKS.inc(action=action_id, outcome="inline")
+                return function(context)
+            return self._submit(action_id, function, module, name, context, slots)
+
+        return pooled_action
+
+    def _submit(  # pylint:disable=too-many-arguments
+        self,
+        action_id: str,
+        function: Callable,
+        module: str,
+        name: str,
+        context: ActionContext,
+        slots: Optional[Tuple[str, ...]],
+    ):
+        """Run an action in a worker, inline if the pool broke."""
+        executor = self._get_executor()
+        slim_context = _worker_context(context, slots)
+        submitted_at = time.time()
+        with self._lock:
+            self._in_flight += 1
+        ACTION_POOL_IN_FLIGHT.inc()
+        try:
+            result, started_at, seconds = executor.submit(
+                _run_action, module, name, slim_context
+            ).result()
+        except BrokenProcessPool as e:
+            logger.error("Action pool broke, running %s inline: %s", action_id, e)
+            self._reset(executor)
+            ACTION_POOL_TASKS.inc(action=action_id, outcome="inline")
+            return function(context)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            ACTION_POOL_IN_FLIGHT.dec()
+
+        with self._lock:
+            self._tasks += 1
+            self._busy_seconds += seconds
+        ACTION_POOL_TASKS.inc(action=action_id, outcome="pool")
+        ACTION_POOL_WAIT_SECONDS.observe(
+            max(0.0, started_at - submitted_at), action=action_id
+        )
+        ACTION_POOL_RUN_SECONDS.observe(seconds, action=action_id)
+        ACTION_POOL_BUSY_SECONDS.inc(seconds)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """Get the calls and utilization of the workers since they started.
+
+        Returns:
+            Dict[str, float]: workers, tasks, in_flight, busy_seconds and
+                utilization, the share of worker time spent running actions
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            capacity = elapsed * self.max_workers
+            return {
+                "workers": self.max_workers,
+                "tasks": self._tasks,
+                "in_flight": self._in_flight,
+                "busy_seconds": self._busy_seconds,
+                "utilization": self._busy_seconds / capacity if capacity else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the workers; the next call starts new ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+            ACTION_POOL_WORKERS.set(0)
@@ -0,0 +1,27 @@
+"""Action context entity module."""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.entity.slot_store import SlotStore
+from core.entity.target import Target
+from utils.deadline import Deadline
+
+
+@dataclass
+class ActionContext:
+    """Data class holding the inputs an action is executed with."""
+
+    user_query: str
+    event: str
+    state: str
+    target: Optional[Target] = None
+    engagement_id: Optional[str] = None
+    # Slot values the LLM extracted from the query along with the event
+    extracted_slots: Optional[Dict[str, Any]] = None
+    # Deadline of the turn, None when the caller set none
+    deadline: Optional[Deadline] = None
+
+    @property
+    def slots(self) -> Optional[SlotStore]:
+        """Slot store of the target, if the engagement has one."""
+        return self.target.slots if self.target else None
@@ -0,0 +1,54 @@
+"""Action result entity module."""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+
+@dataclass
+class ActionResult:
+    """Data class for actions that shape the reply of the turn.
+
+    Actions usually return a plain message. In states with ``fused_reply`` the
+    LLM drafts the reply along with the event, and that draft replaces the
+    action messages unless an action vetoes it or overrides it with a reply of
+    its own.
+    """
+
+    message: str = ""
+    # Reply sent to the target instead of the draft or the action messages
+    reply: Optional[str] = None
+    # Discard the draft, e.g. when the action learned something it contradicts
+    veto_reply: bool = False
+
+
+def compose_reply(
+    responses: Sequence[Union[str, ActionResult]], draft: Optional[str] = None
+) -> str:
+    """Compose the reply of a turn from the action responses and the draft.
+
+    The last override wins, then the draft unless an action vetoed it, and
+    otherwise the action messages are joined as before.
+
+    Args:
+        responses: Non-empty responses of the actions in execution order
+        draft: Reply drafted by the LLM in the intent detection call, if any
+
+    Returns:
+        str: The message sent to the target
+    """
+    messages: List[str] = []
+    override = None
+    vetoed = False
+    for response in responses:
+        if isinstance(response, ActionResult):
+            if response.message:
+                messages.append(response.message)
+            if response.reply is not None:
+                override = response.reply
+            vetoed = vetoed or response.veto_reply
+        else:
+            messages.append(response)
+    if override is not None:
+        return override
+    if draft and not vetoed:
+        return draft
+    return "; ".join(messages)
@@ -1,20 +1,54 @@
 """Agent entity module."""
-from dataclasses import dataclass
-from typing import Optional
-
-import yaml
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+from core.entity.action_context import ActionContext
+from core.entity.action_result import compose_reply
+from core.entity.interaction_history import InteractionHistory
 from core.entity.response import AgentResponse
 from core.entity.role import Role, State
+from core.entity.state import StateStatus
+from core.entity.target import Target
 from service import service_center
-from utils.logging import logging
+from service.event_action_registry import BoundAction
+from service.llm_scheduler import PRIORITY_ACTIVE, PRIORITY_NEW, LoadShedError
+from service.prompt_service import PromptSnapshot
+from service.turn_log import TurnRecord
+from utils.deadline import (
+    FALLBACK_INTENT,
+    SKIPPED_ACTION,
+    SKIPPED_TRANSITION,
+    Deadline,
+)
+from utils.logging import bind_log_context, logging, reset_log_context
+from utils.metrics import metrics
 from utils.response_type import EventActions
+from utils.yaml_loader import safe_load
 
 logger = logging.getLogger(__name__)
 
+TURNS = metrics.counter("agent_turns", "Turns handled by outcome", ["role", "outcome"])
+TURN_SECONDS = metrics.histogram(
+    "agent_turn_seconds", "Latency of agent turns", ["role"]
+)
+FUSED_REPLIES = metrics.counter(
+    "agent_fused_replies",
+    "Turns of fused reply states by whether the draft was sent",
+    ["role", "outcome"],
+)
+DEGRADATIONS = metrics.counter(
+    "agent_degradations",
+    "Steps of turns degraded to meet the turn deadline",
+    ["role", "kind"],
+)
+
+# Budget below which optional actions are skipped on turns with a deadline
+OPTIONAL_ACTION_MIN_SECONDS = 0.1
+
 
 @dataclass
-class Agent:
+class Agent:  # pylint:disable=too-many-instance-attributes
     """Data class representing an agent with its role, goal, and current state."""
 
     name: str
@@ -23,9 +57,27 @@ class Agent:
     role: Role
     current_state: Optional[State] = None
     engagement_id: Optional[str] = None
+    interaction_history: Optional[InteractionHistory] = field(default=None, repr=False)
+    target: Optional[Target] = field(default=None, repr=False)
+    prompt_snapshot: Optional[PromptSnapshot] = field(default=None, repr=False)
+    # Run cacheable actions of likely events while intent detection is in flight
+    speculative: bool = False
+    # Names of the states completed in this engagement; the role is shared by
+    # engagements, so its states do not hold engagement status
+    completed_states: Set[str] = field(default_factory=set, repr=False)
 
     def __init__(
-        self, goal, agent_name, description, role, current_state, engagement_id=None
+        self,
+        goal,
+        agent_name,
+        description,
+        role,
+        current_state,
+        engagement_id=None,
+        interaction_history=None,
+        target=None,
+        prompt_snapshot=None,
+        speculative=False,
     ):
         """Initialize the agent with its goal, role, and current state."""
         self.name = agent_name
@@ -34,7 +86,17 @@ class Agent:
         self.role = role
         self.current_state = current_state
         self.engagement_id = engagement_id
+        self.interaction_history = (
+            interaction_history
+            if interaction_history is not None
+            else InteractionHistory()
+        )
+        self.target = target
+        self.prompt_snapshot = prompt_snapshot
+        self.speculative = speculative
+        self.completed_states = set()
         self._init_agent()
+        self._state_entered_at = time.monotonic()
 
     @classmethod
     def from_template(
@@ -52,18 +114,32 @@ class Agent:
         """
         # Parse agent template
         with open(agent_template_path, "r", encoding="utf-8") as f:
-            template = yaml.safe_load(f)
-
-        agent_data = template["agent"]
+            template = safe_load(f)
 
         role = Role.from_template(role_template_path)
 
+        return cls.from_template_data(template, role)
+
+    @classmethod
+    def from_template_data(cls, template: Dict, role: Role) -> "Agent":
+        """Create an Agent instance from an already loaded agent template.
+
+        Args:
+            template: The parsed agent template
+            role: The role the agent plays
+
+        Returns:
+            Agent: Initialized agent with goal, role, and initial state
+        """
+        agent_data = template["agent"]
+
         return cls(
             goal=agent_data["goal"],
             agent_name=agent_data["name"],
             description=agent_data["description"],
             role=role,
             current_state=role.get_init_state(),
+            speculative=agent_data.get("speculative", False),
         )
 
     def get_goal(self) -> str:
@@ -113,10 +189,34 @@ class Agent:
         next_states = self.role.get_next_states(self.current_state.name)
         for next_state in next_states:
             if next_state.name == state_name:
+                now = time.monotonic()
+                service_center.transition_counters.record_transition(
+                    self.role.name,
+                    self.current_state.name,
+                    next_state.name,
+                    now - self._state_entered_at,
+                )
                 self.current_state = next_state
+                self._state_entered_at = now
                 return True
         return False
 
+    def get_state_status(self, state_name: str) -> StateStatus:
+        """Get the status of a state in this engagement.
+
+        Args:
+            state_name: Name of the state
+
+        Returns:
+            StateStatus: Completed once a turn was handled in the state, in
+                progress while it is the current state, not started otherwise
+        """
+        if state_name in self.completed_states:
+            return StateStatus.COMPLETED
+        if self.current_state and self.current_state.name == state_name:
+            return StateStatus.IN_PROGRESS
+        return StateStatus.NOT_STARTED
+
     def is_in_end_state(self) -> bool:
         """Check if the agent is in an end state.
 
@@ -147,18 +247,35 @@ class Agent:
             if next_state:
                 self.current_state = next_state
 
-    def interact(self, user_query: str) -> AgentResponse:
+    def interact(  # pylint:disable=too-many-locals,too-many-statements,too-many-branches
+        self, user_query: str, deadline: Union[Deadline, float, None] = None
+    ) -> AgentResponse:
         """
         Interact with the user involve 5 steps:
         1. Get the event from the raw query with intent detection
         2. Find action with event from the event-action registry
         3. Execute actions
         4. Update the current state
-        5. Return the response
+        5. Record the turn and return the response
+
+        With a deadline, intent detection degrades to a cached, local or
+        fallback intent and optional actions are skipped when the budget runs
+        low; a fallback intent forced by the deadline does not transition.
 
         :param user_query:
+        :param deadline: Deadline of the turn, or its budget in seconds
         :return: AgentResponse
         """
+        deadline = Deadline.of(deadline)
+        started = time.perf_counter()
+        turn_state = self.current_state.name
+        outcome = "error"
+        # What the turn log records of the turn
+        turn = {"timestamp": time.time(), "event": "", "actions": []}
+        response: Optional[AgentResponse] = None
+        log_context = bind_log_context(
+            engagement_id=self.engagement_id, state=turn_state, event=None
+        )
         try:
             # Step 1: Get the event from the raw query with intent detection
             args = {
@@ -168,39 +285,231 @@ class Agent:
                 "current_state": self.current_state.get_formatted_current_state(),
                 "raw_query": user_query,
                 "event_list": self.current_state.get_formatted_event_list(),
+                "interaction_history": self.interaction_history.render_text(),
+                "collected_slots": self.target.slots.render()
+                if self.target
+                else "None",
+                "extraction_instructions": self._extraction_instructions(),
+                "reply_instructions": self._reply_instructions(),
             }
 
-            event: EventActions = (
-                service_center.intent_detection_service.detect_intent_with_args(
-                    EventActions, **args
-                )
+            context = ActionContext(
+                user_query=user_query,
+                event="",
+                state=self.current_state.name,
+                target=self.target,
+                engagement_id=self.engagement_id,
+                deadline=deadline,
             )
+            speculation = None
+            if self.speculative:
+                self._bind_role()
+                speculation = service_center.speculation_service.start(
+                    self.role, context
+                )
 
-            # Step 2: Find action with event from the event-action registry & filter based on the role's requriements
-            filtered_actions = self.filter_pre_authorized_actions(event)
+            # Engagements in progress are admitted before new ones
+            priority = (
+                PRIORITY_ACTIVE if len(self.interaction_history) else PRIORITY_NEW
+            )
+            intent_detection = service_center.intent_detection_service
+            try:
+                event: EventActions = intent_detection.detect_intent_with_args(
+                    intent_detection.response_model(
+                        self.role,
+                        self.current_state,
+                        self.target.slots.get_definitions() if self.target else None,
+                    ),
+                    self.prompt_snapshot,
+                    candidate_events=self.current_state.event_actions,
+                    priority=priority,
+                    cache_key=(self.role.name, self.current_state.name),
+                    deadline=deadline,
+                    # Cached and keyword intents come without extracted slots
+                    # and without a reply draft
+                    llm_only=bool(
+                        self.current_state.extract_slots
+                        or self.current_state.fused_reply
+                    ),
+                    **args,
+                )
+            except Exception:
+                if speculation:
+                    speculation.cancel()
+                raise
+            context.event = event.name
+            turn["event"] = event.name
+            turn["intent_seconds"] = time.perf_counter() - started
+            context.extracted_slots = {
+                name: getattr(event, name)
+                for name in self.current_state.extract_slots or ()
+                if getattr(event, name, None) is not None
+            }
+            bind_log_context(event=event.name)
 
-            # Step 3: Execute actions
+            # Step 2 and 3: Execute the actions bound to the event, using the
+            # speculative responses if they match the event
+            bound_actions = self.filter_pre_authorized_actions(event)
+            turn["actions"] = [bound_action.name for bound_action in bound_actions]
+            speculative = speculation.commit(event.name) if speculation else None
             responses = []
-            for _, action in filtered_actions.items():
-                response = action()
-                responses.append(response)
-
-            # Step 4: Update the current state // TODO - Update based on the action's effect
-            self.current_state.mark_completed()
-
-            # Step 4.1 Get next state based on transitions and transition to it
-            self.transit_to_next_state(event)
+            for index, bound_action in enumerate(bound_actions):
+                if self._skip_optional(bound_action, deadline):
+                    continue
+                if speculative is not None:
+                    action_response = speculative[index]
+                else:
+                    action_response = bound_action.function(context)
+                if action_response:
+                    responses.append(action_response)
+            turn["actions_seconds"] = (
+                time.perf_counter() - started - turn["intent_seconds"]
+            )
 
-            # Step 5: Return the response as an AgentResponse
-            return AgentResponse(message="; ".join(responses), success=True)
+            draft = getattr(event, "reply", None)
+            message = compose_reply(responses, draft)
+            if self.current_state.fused_reply:
+                FUSED_REPLIES.inc(
+                    role=self.role.name,
+                    outcome=_fused_outcome(message, draft),
+                )
 
+            # Step 4: Update the current state // TODO - Update based on the action's effect
+            self.completed_states.add(self.current_state.name)
+
+            # Step 4.1 Get next state based on transitions and transition to it,
+            # unless the event is a fallback forced by the deadline
+            if deadline is not None and FALLBACK_INTENT in deadline.degradations:
+                deadline.degrade(SKIPPED_TRANSITION)
+            else:
+                self.transit_to_next_state(event)
+
+            # Step 5: Record the turn and return the response as an AgentResponse
+            self.interaction_history.record_turn(user_query, message)
+            outcome = "ok"
+            response = AgentResponse(
+                message=message,
+                success=True,
+                degradations=deadline.degradations if deadline else None,
+            )
+            return response
+
+        except LoadShedError as e:
+            logger.warning("Shedding interaction: %s", str(e))
+            outcome = "shed"
+            response = AgentResponse(
+                message="We are handling a lot of requests right now, "
+                "please try again in a moment.",
+                success=False,
+                error=str(e),
+            )
+            return response
         except Exception as e:  # pylint:disable=broad-exception-caught
             logger.error("Error during interaction: %s", str(e))
-            return AgentResponse(
+            response = AgentResponse(
                 message="An error occurred during interaction.",
                 success=False,
                 error=str(e),
             )
+            return response
+        finally:
+            seconds = time.perf_counter() - started
+            service_center.transition_counters.record_turn(
+                self.role.name, turn_state, seconds
+            )
+            TURNS.inc(role=self.role.name, outcome=outcome)
+            TURN_SECONDS.observe(seconds, role=self.role.name)
+            for degradation in deadline.degradations if deadline else ():
+                DEGRADATIONS.inc(
+                    role=self.role.name, kind=degradation.split(":", maxsplit=1)[0]
+                )
+            if service_center.turn_log is not None:
+                self._log_turn(
+                    turn_state, outcome, seconds, user_query, response, **turn
+                )
+            reset_log_context(log_context)
+
+    def _log_turn(  # pylint:disable=too-many-arguments
+        self,
+        state_before: str,
+        outcome: str,
+        seconds: float,
+        user_query: str,
+        response: Optional[AgentResponse],
+        **turn,
+    ) -> None:
+        """Append a turn to the turn log without failing the turn."""
+        try:
+            service_center.turn_log.append_turn(
+                TurnRecord(
+                    engagement_id=self.engagement_id or "",
+                    state_before=state_before,
+                    state_after=self.current_state.name,
+                    event=turn["event"],
+                    actions=turn["actions"],
+                    timestamp=turn["timestamp"],
+                    turn_seconds=seconds,
+                    intent_seconds=turn.get("intent_seconds", 0.0),
+                    actions_seconds=turn.get("actions_seconds", 0.0),
+                    outcome=outcome,
+                    query=user_query,
+                    reply=response.message if response else "",
+                    slots=self.target.slots.filled() if self.target else {},
+                )
+            )
+        except Exception as e:  # pylint:disable=broad-exception-caught
+            logger.error("Cannot append the turn to the turn log: %s", str(e))
+
+    def _extraction_instructions(self) -> str:
+        """Ask the LLM to extract the slots of the current state from the query.
+
+        Returns:
+            str: Instructions for the intent detection prompt, empty if the
+                state extracts no slot the target defines
+        """
+        if not self.current_state.extract_slots or not self.target:
+            return ""
+        definitions = self.target.slots.get_definitions()
+        lines = [
+            f"- {name}: {definitions[name].description or name}"
+            for name in self.current_state.extract_slots
+            if name in definitions
+        ]
+        if not lines:
+            return ""
+        return (
+            "Also fill in these fields with the values the target gives in the "
+            "request; leave a field null if the target does not mention it:\n"
+            + "\n".join(lines)
+        )
+
+    def _reply_instructions(self) -> str:
+        """Ask the LLM to draft the reply of the turn in fused reply states.
+
+        Returns:
+            str: Instructions for the intent detection prompt, empty unless the
+                current state fuses the reply
+        """
+        if not self.current_state.fused_reply:
+            return ""
+        return (
+            f"Also write reply: the next message of {self.name} to the target, "
+            f"working towards the goal: {self.goal}. Ask for information that is "
+            "still missing instead of assuming it."
+        )
+
+    @staticmethod
+    def _skip_optional(bound_action: BoundAction, deadline: Optional[Deadline]) -> bool:
+        """Check if an optional action is skipped to meet the deadline."""
+        if (
+            deadline is None
+            or not bound_action.config.optional
+            or deadline.remaining() >= OPTIONAL_ACTION_MIN_SECONDS
+        ):
+            return False
+        logger.info("Skipping optional action %s", bound_action.name)
+        deadline.degrade(SKIPPED_ACTION, bound_action.name)
+        return True
 
     def transit_to_next_state(self, event):
         """Transit to the next state based on the event."""
@@ -208,27 +517,29 @@ class Agent:
         if transitions:
             # Filter transitions based on conditions
             valid_transitions = [
-                t for t in transitions if self._check_condition(t.condition, event.name)
+                t
+                for t in transitions
+                if self._check_condition(t.condition, event.name)
+                and self._check_required_slots(t.requires)
             ]
             if valid_transitions:
                 # Get highest priority transition
                 next_transition = max(valid_transitions, key=lambda t: t.priority)
                 self.transition_to(next_transition.to)
 
-    def filter_pre_authorized_actions(self, event) -> dict:
-        """Filter actions based on the current state's event actions."""
-        actions = service_center.event_action_registry.get_actions_from_scope(
-            scope=event.name
-        )
+    def filter_pre_authorized_actions(self, event) -> Tuple[BoundAction, ...]:
+        """Get the actions the current state executes for the event.
 
-        # Filter actions based on the current state's event actions
-        current_state_actions = self.current_state.event_actions.get(event.name, [])
+        The role is bound to the event action registry when it is loaded, so
+        this is a single lookup; roles built by hand are bound on first use.
+        """
+        self._bind_role()
+        return self.role.get_bound_actions(self.current_state.name, event.name)
 
-        filtered_actions = {}
-        for action_config in current_state_actions.actions:
-            if action_config.name in actions:
-                filtered_actions[action_config.name] = actions[action_config.name]
-        return filtered_actions
+    def _bind_role(self) -> None:
+        """Bind the role to the event action registry if it is not bound yet."""
+        if self.role.action_table is None:
+            service_center.event_action_registry.bind_role(self.role)
 
     def _check_condition(self, condition: str, event_name: str) -> bool:
         """Check if a given condition is met.
@@ -245,3 +556,25 @@ class Agent:
             return True
         # Add more conditions as needed
         return False
+
+    def _check_required_slots(self, required_slots: Optional[List[str]]) -> bool:
+        """Check if the target has filled every slot a transition requires.
+
+        Args:
+            required_slots: Slot names required by the transition, if any.
+
+        Returns:
+            bool: True if nothing is required or every required slot is filled.
+        """
+        if not required_slots:
+            return True
+        if not self.target:
+            return False
+        return not self.target.slots.missing(required_slots)
+
+
+def _fused_outcome(message: str, draft: Optional[str]) -> str:
+    """Label whether the draft of a fused reply state was sent."""
+    if not draft:
+        return "no_draft"
+    return "draft" if message == draft else "replaced"
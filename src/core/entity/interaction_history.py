@@ -0,0 +1,185 @@
+"""Interaction history entity module.
+
+Keeps the recent turns of an engagement inside a token budget and folds older
+turns into a rolling summary, so the rendered context stays bounded no matter
+how long the conversation grows. Turns leave the window whole, and the default
+summary is the transcript of the latest evicted messages that fit its budget,
+one line per message.
+"""
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils.tokens import estimate_tokens, truncate_to_tokens
+
+Summarizer = Callable[[str, List[Dict]], str]
+
+
+def concat_summarizer(summary: str, evicted: List[Dict]) -> str:
+    """Fold evicted messages into the summary by appending them as plain lines.
+
+    Line breaks inside a message are flattened, so the summary budget drops
+    whole messages first.
+
+    Args:
+        summary: The current rolling summary
+        evicted: Messages leaving the window, oldest first
+
+    Returns:
+        str: The updated summary
+    """
+    lines = [summary] if summary else []
+    lines.extend(
+        f"{message['role']}: {' '.join(message['content'].split())}"
+        for message in evicted
+    )
+    return "\n".join(lines)
+
+
+class InteractionHistory:  # pylint:disable=too-many-instance-attributes
+    """Append-only message buffer with a sliding token budget."""
+
+    def __init__(
+        self,
+        token_budget: int = 1024,
+        summary_token_budget: int = 256,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        """Initialize an empty interaction history.
+
+        Args:
+            token_budget: Maximum tokens kept verbatim in the message window
+            summary_token_budget: Maximum tokens kept in the rolling summary
+            summarizer: Callable folding evicted messages into the summary
+        """
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarizer = summarizer or concat_summarizer
+        self._window: Deque[Tuple[Dict, int]] = deque()
+        self._window_tokens = 0
+        self._summary = ""
+        self._summary_tokens = 0
+        self._total_messages = 0
+        self._version = 0
+        self._rendered: Optional[List[Dict]] = None
+        self._rendered_text: Optional[str] = None
+        self._rendered_version = -1
+
+    def append(self, message: Dict) -> None:
+        """Append a message to the history.
+
+        Args:
+            message: Chat message with "role" and "content" keys
+
+        Raises:
+            ValueError: If the message is missing the role or content
+        """
+        if "role" not in message or "content" not in message:
+            raise ValueError("Interaction message requires 'role' and 'content'")
+
+        tokens = estimate_tokens(message["content"])
+        self._window.append((message, tokens))
+        self._window_tokens += tokens
+        self._total_messages += 1
+        self._version += 1
+
+        if self._window_tokens > self.token_budget:
+            self._evict()
+
+    def record_turn(self, user_query: str, response: str) -> None:
+        """Record a user query and the agent response as one turn.
+
+        Args:
+            user_query: Raw query from the target
+            response: Message returned by the agent
+        """
+        self.append({"role": "user", "content": user_query})
+        self.append({"role": "assistant", "content": response})
+
+    def _evict(self) -> None:
+        """Move the oldest messages into the summary.
+
+        Evicts down to three quarters of the budget so the summarizer runs once
+        per batch of turns rather than on every append. An answer leaves the
+        window with its query, so the window starts at a turn.
+        """
+        target_tokens = self.token_budget * 3 // 4
+        evicted = []
+        while self._window_tokens > target_tokens and len(self._window) > 1:
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            evicted.append(message)
+        if (
+            evicted
+            and evicted[-1]["role"] == "user"
+            and len(self._window) > 1
+            and self._window[0][0]["role"] == "assistant"
+        ):
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            evicted.append(message)
+
+        if evicted:
+            summary = self.summarizer(self._summary, evicted)
+            self._summary = truncate_to_tokens(summary, self.summary_token_budget)
+            self._summary_tokens = estimate_tokens(self._summary)
+
+    def _refresh_render_cache(self) -> None:
+        """Rebuild the rendered context if new messages arrived since last render."""
+        if self._rendered_version == self._version:
+            return
+
+        rendered = []
+        if self._summary:
+            rendered.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{self._summary}",
+                }
+            )
+        rendered.extend(message for message, _ in self._window)
+
+        self._rendered = rendered
+        self._rendered_text = "\n".join(
+            f"{message['role']}: {message['content']}" for message in rendered
+        )
+        self._rendered_version = self._version
+
+    def render(self) -> List[Dict]:
+        """Get the bounded message list for chat completion APIs.
+
+        The list is cached until the next append and must not be mutated.
+
+        Returns:
+            List[Dict]: Summary message (if any) followed by the recent messages
+        """
+        self._refresh_render_cache()
+        return self._rendered
+
+    def render_text(self) -> str:
+        """Get the bounded history as plain text for prompt templates.
+
+        Returns:
+            str: One "role: content" line per rendered message
+        """
+        self._refresh_render_cache()
+        return self._rendered_text
+
+    def get_summary(self) -> str:
+        """Get the rolling summary of evicted turns."""
+        return self._summary
+
+    @property
+    def token_count(self) -> int:
+        """Estimated tokens of the rendered context."""
+        return self._window_tokens + self._summary_tokens
+
+    def __len__(self) -> int:
+        """Total number of messages ever appended."""
+        return self._total_messages
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Iterate over the messages still inside the window."""
+        return (message for message, _ in self._window)
+
+    def __str__(self) -> str:
+        return self.render_text()
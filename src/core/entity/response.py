@@ -1,20 +1,29 @@
 """Module to define the response entity for the agent."""
+from typing import List, Optional
 
 
 class AgentResponse:
     """Class to represent an agent response."""
 
-    def __init__(self, message: str, success: bool = True, error: str = None):
+    def __init__(
+        self,
+        message: str,
+        success: bool = True,
+        error: str = None,
+        degradations: Optional[List[str]] = None,
+    ):
         """Initialize an agent response.
 
         Args:
             message: The response message from the agent
             success: Whether the interaction was successful
             error: Error message if the interaction failed
+            degradations: Steps degraded to meet the deadline of the turn
         """
         self.message = message
         self.success = success
         self.error = error
+        self.degradations = list(degradations or ())
 
     def __str__(self) -> str:
         """String representation of the response.
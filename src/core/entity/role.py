@@ -1,11 +1,11 @@
 """Role entity module."""
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-
-import yaml
+from typing import Dict, List, Optional, Tuple
 
 from core.entity.state import State, Transition, Action, Event
+from core.role_compiler import COMPILED_SUFFIX, load_compiled
 from utils.logging import logging
+from utils.yaml_loader import load_file
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +18,8 @@ class Role:
     states: Dict[str, State]
     init_state: Optional[State] = None
     end_states: List[State] = None
+    # (state name, event name) -> bound actions, set by EventActionRegistry.bind_role
+    action_table: Optional[Dict[Tuple[str, str], Tuple]] = None
 
     def __init__(
         self,
@@ -31,20 +33,47 @@ class Role:
         self.states = states
         self.init_state = init_state
         self.end_states = end_states or []
+        self.action_table = None
 
     @classmethod
     def from_template(cls, template_path: str) -> "Role":
         """Create a Role instance from a template file.
 
         Args:
-            template_path: Path to the role template YAML file
+            template_path: Path to the role template YAML file, or to an
+                artifact compiled by tools/compile_role.py
 
         Returns:
             Role: Initialized role with states from template
         """
         parser = RoleTemplateParser(template_path)
         parser.parse()
+        return cls.from_parser(parser)
+
+    @classmethod
+    def from_template_data(cls, template: Dict) -> "Role":
+        """Create a Role instance from an already loaded role template.
+
+        Args:
+            template: The parsed role template
+
+        Returns:
+            Role: Initialized role with states from template
+        """
+        parser = RoleTemplateParser()
+        parser.parse_data(template)
+        return cls.from_parser(parser)
+
+    @classmethod
+    def from_parser(cls, parser: "RoleTemplateParser") -> "Role":
+        """Create a Role instance from a parser that has parsed a template.
 
+        Args:
+            parser: Parser holding the states of the template
+
+        Returns:
+            Role: Initialized role with states from template
+        """
         role_name = parser.get_role_name()
         states = parser.get_all_states()
 
@@ -110,6 +139,23 @@ class Role:
 
         return next_states
 
+    def get_bound_actions(self, state_name: str, event_name: str) -> Tuple:
+        """Get the bound actions to execute for an event in a given state.
+
+        Args:
+            state_name: Name of the state
+            event_name: Name of the event
+
+        Returns:
+            Tuple: Bound actions in execution order, empty if none
+
+        Raises:
+            ValueError: If the role has not been bound to an action registry
+        """
+        if self.action_table is None:
+            raise ValueError(f"Role {self.name} is not bound to an action registry")
+        return self.action_table.get((state_name, event_name), ())
+
     def get_event_description(self, state_name: str, event_name: str) -> Optional[str]:
         """Get the description of a specific event in a given state.
 
@@ -131,7 +177,7 @@ class Role:
 class RoleTemplateParser:
     """Parser for role template files."""
 
-    def __init__(self, template_path: str):
+    def __init__(self, template_path: Optional[str] = None):
         """Initialize the parser with the path to the template file."""
         self.template_path = template_path
         self.states: Dict[str, State] = {}
@@ -139,9 +185,16 @@ class RoleTemplateParser:
         self.template = None
 
     def parse(self) -> None:
-        """Parse the YAML template file and populate the states and properties"""
-        with open(self.template_path, "r", encoding="utf-8") as f:
-            self.template = yaml.safe_load(f)
+        """Parse the template file and populate the states and properties"""
+        if self.template_path.endswith(COMPILED_SUFFIX):
+            template = load_compiled(self.template_path).template
+        else:
+            template = load_file(self.template_path)
+        self.parse_data(template)
+
+    def parse_data(self, template: Dict) -> None:
+        """Populate the states and properties from an already loaded template"""
+        self.template = template
 
         # Parse properties
         self.properties = self.template.get("properties", {})
@@ -157,11 +210,11 @@ class RoleTemplateParser:
             if "event_actions" in state_data:
                 for event_name, event_data in state_data["event_actions"].items():
                     actions = [Action(**action) for action in event_data]
-                    description = self.properties.get(event_name, {}).get(
-                        "description", ""
-                    )
+                    event_properties = self.properties.get(event_name, {})
                     event_actions[event_name] = Event(
-                        description=description, actions=actions
+                        description=event_properties.get("description", ""),
+                        actions=actions,
+                        keywords=event_properties.get("keywords"),
                     )
 
             state = State(
@@ -170,6 +223,8 @@ class RoleTemplateParser:
                 description="",
                 transitions=transitions,
                 event_actions=event_actions,
+                extract_slots=state_data.get("extract_slots"),
+                fused_reply=bool(state_data.get("fused_reply", False)),
             )
 
             self.states[state.name] = state
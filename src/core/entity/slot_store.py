@@ -0,0 +1,202 @@
+"""Slot store entity module.
+
+Typed, keyed storage for the information collected from a target. Each slot is
+declared once (name, type, optional TTL) and looked up directly by name.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+SLOT_TYPES = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "list": list,
+}
+
+
+@dataclass
+class SlotDefinition:
+    """Data class describing a slot that can be filled for a target."""
+
+    name: str
+    type: str = "str"
+    description: Optional[str] = None
+    ttl: Optional[float] = None
+
+    def __post_init__(self):
+        if self.type not in SLOT_TYPES:
+            raise ValueError(f"Unsupported slot type '{self.type}' for {self.name}")
+
+
+@dataclass
+class Slot:
+    """Data class representing the current value of a filled slot."""
+
+    value: Any
+    version: int
+    updated_at: float
+    expires_at: Optional[float] = None
+
+
+class SlotStore:
+    """Keyed slot store with per-slot versioning and TTL."""
+
+    def __init__(
+        self,
+        definitions: Optional[Iterable[SlotDefinition]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the store with its slot definitions.
+
+        Args:
+            definitions: Slots that can be filled in this store
+            clock: Monotonic clock used for TTL expiry
+        """
+        self._definitions: Dict[str, SlotDefinition] = {}
+        self._slots: Dict[str, Slot] = {}
+        self._clock = clock
+        self._version = 0
+        for definition in definitions or []:
+            self.define(definition)
+
+    def define(self, definition: SlotDefinition) -> None:
+        """Declare a slot that can be filled.
+
+        Args:
+            definition: The slot definition
+        """
+        self._definitions[definition.name] = definition
+
+    def get_definition(self, name: str) -> Optional[SlotDefinition]:
+        """Get the definition of a slot by name."""
+        return self._definitions.get(name)
+
+    def get_definitions(self) -> Dict[str, SlotDefinition]:
+        """Get all slot definitions."""
+        return self._definitions
+
+    def set(self, name: str, value: Any, ttl: Optional[float] = None) -> int:
+        """Fill a slot with a value.
+
+        Args:
+            name: Name of the slot
+            value: Value matching the slot type
+            ttl: Seconds until the value expires, defaults to the slot's TTL
+
+        Returns:
+            int: The new version of the slot
+
+        Raises:
+            KeyError: If the slot is not defined
+            TypeError: If the value does not match the slot type
+        """
+        definition = self._definitions.get(name)
+        if definition is None:
+            raise KeyError(f"Slot not defined: {name}")
+
+        value = self._coerce(definition, value)
+        now = self._clock()
+        ttl = ttl if ttl is not None else definition.ttl
+        previous = self._slots.get(name)
+
+        self._slots[name] = Slot(
+            value=value,
+            version=previous.version + 1 if previous else 1,
+            updated_at=now,
+            expires_at=now + ttl if ttl else None,
+        )
+        self._version += 1
+        return self._slots[name].version
+
+    def get_slot(self, name: str) -> Optional[Slot]:
+        """Get a filled slot, dropping it if its TTL has passed.
+
+        Args:
+            name: Name of the slot
+
+        Returns:
+            Optional[Slot]: The slot if it is filled and not expired
+        """
+        slot = self._slots.get(name)
+        if slot is None:
+            return None
+        if slot.expires_at is not None and slot.expires_at <= self._clock():
+            del self._slots[name]
+            self._version += 1
+            return None
+        return slot
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Get the value of a slot.
+
+        Args:
+            name: Name of the slot
+            default: Value returned if the slot is not filled
+
+        Returns:
+            The slot value or the default
+        """
+        slot = self.get_slot(name)
+        return slot.value if slot else default
+
+    def is_filled(self, name: str) -> bool:
+        """Check if a slot currently holds a value."""
+        return self.get_slot(name) is not None
+
+    def missing(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """Get the slots that are not filled.
+
+        Args:
+            names: Slots to check, defaults to every defined slot
+
+        Returns:
+            List[str]: Names of the slots without a value
+        """
+        names = self._definitions if names is None else names
+        return [name for name in names if not self.is_filled(name)]
+
+    def clear(self, name: str) -> None:
+        """Remove the value of a slot."""
+        if self._slots.pop(name, None) is not None:
+            self._version += 1
+
+    def filled(self) -> Dict[str, Any]:
+        """Get the values of all filled slots."""
+        return {
+            name: self.get(name)
+            for name in list(self._slots)
+            if self.get_slot(name) is not None
+        }
+
+    @property
+    def version(self) -> int:
+        """Version of the store, bumped on every change."""
+        return self._version
+
+    def render(self) -> str:
+        """Render the filled slots as text for prompt templates.
+
+        Returns:
+            str: One "name: value" line per filled slot, or "None"
+        """
+        filled = self.filled()
+        if not filled:
+            return "None"
+        return "\n".join(f"{name}: {value}" for name, value in filled.items())
+
+    @staticmethod
+    def _coerce(definition: SlotDefinition, value: Any) -> Any:
+        """Check a value against the slot type, widening where lossless."""
+        expected = SLOT_TYPES[definition.type]
+        if expected is float and isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        if expected is list and isinstance(value, tuple):
+            return list(value)
+        if not isinstance(value, expected):
+            raise TypeError(
+                f"Slot {definition.name} expects {definition.type}, "
+                f"got {type(value).__name__}"
+            )
+        return value
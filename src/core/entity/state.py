@@ -18,6 +18,12 @@ class Action:
 
     name: str
     description: Optional[str] = None
+    # Cache options (ttl, key_slots, include_query) for pure actions
+    cache: Optional[Dict] = None
+    # Skipped when the turn deadline leaves too little time to run it
+    optional: bool = False
+    # Run on the action pool; changes to the context are not sent back
+    cpu_bound: bool = False
 
 
 @dataclass
@@ -27,6 +33,8 @@ class Transition:
     to: str
     condition: Optional[str] = None
     priority: int = 0
+    # Target slots that must be filled for the transition to fire
+    requires: Optional[List[str]] = None
 
 
 @dataclass
@@ -35,10 +43,12 @@ class Event:
 
     description: str
     actions: List[Action]
+    # Phrases that identify the event without the LLM, see LocalIntentResolver
+    keywords: Optional[List[str]] = None
 
 
 @dataclass
-class State:
+class State:  # pylint:disable=too-many-instance-attributes
     """Data class representing a state with its description, events/actions, and status."""
 
     name: str
@@ -47,8 +57,12 @@ class State:
     event_actions: Dict[str, Event]
     transitions: List[Transition]
     status: StateStatus = StateStatus.NOT_STARTED
+    # Target slots extracted from the query in the intent detection call
+    extract_slots: Optional[List[str]] = None
+    # Draft the reply to the target in the intent detection call
+    fused_reply: bool = False
 
-    def __init__(
+    def __init__(  # pylint:disable=too-many-arguments
         self,
         name: str,
         state_type: str,
@@ -56,6 +70,8 @@ class State:
         event_actions: Dict[str, Event],
         transitions: List[Transition],
         status: StateStatus = StateStatus.NOT_STARTED,
+        extract_slots: Optional[List[str]] = None,
+        fused_reply: bool = False,
     ):
         """Initialize a state with description, event-action mappings and status.
 
@@ -63,6 +79,10 @@ class State:
             description: Description of what this state represents
             event_actions: Dictionary mapping events to Event objects
             status: Current status of the state (defaults to NOT_STARTED)
+            extract_slots: Target slots the LLM fills from the query while it
+                detects the intent
+            fused_reply: Whether the LLM drafts the reply to the target while
+                it detects the intent
         """
         self.name = name
         self.state_type = state_type
@@ -70,6 +90,8 @@ class State:
         self.event_actions = event_actions
         self.transitions = transitions
         self.status = status
+        self.extract_slots = extract_slots
+        self.fused_reply = fused_reply
 
     def get_actions_for_event(self, event: str) -> List[Action]:
         """Get all possible actions for a given event.
@@ -1,25 +1,35 @@
 """Target entity class and parser for target templates"""
-from typing import Optional, List
+from typing import Dict, Optional, List
 
-import yaml
+from core.entity.slot_store import SlotDefinition, SlotStore
+from utils.yaml_loader import safe_load
 
 
 class TargetTemplateParser:
     """Parser for target template files"""
 
-    def __init__(self, template_path: str):
+    def __init__(self, template_path: Optional[str] = None):
         self.template_path = template_path
         self.target: "Target" = None
 
     def parse(self) -> None:
         """Parse the YAML template file and populate the target"""
         with open(self.template_path, "r", encoding="utf-8") as f:
-            template = yaml.safe_load(f)
+            template = safe_load(f)
 
+        self.parse_data(template)
+
+    def parse_data(self, template: Dict) -> None:
+        """Populate the target from an already loaded template"""
         target_data = template["target"]
+        slot_definitions = [
+            SlotDefinition(name=name, **(slot_data or {}))
+            for name, slot_data in target_data.get("slots", {}).items()
+        ]
         self.target = Target(
             name=target_data["name"],
             description=target_data["description"],
+            slot_definitions=slot_definitions,
         )
 
     def get_target(self) -> "Target":
@@ -28,28 +38,24 @@ class TargetTemplateParser:
 
 
 class Target:
-    """Data class representing a target with its name, description, and storage"""
+    """Data class representing a target with its name, description, and slots"""
 
     def __init__(
         self,
         name: str,
         description: str,
-        storage: List = None,
+        slot_definitions: List[SlotDefinition] = None,
         engagement_id: Optional[str] = None,
     ):
-        """Initialize the target with its name, description, storage, and engagement ID"""
+        """Initialize the target with its name, description, slots, and engagement ID"""
         self.name = name
         self.description = description
-        self.storage = storage if storage else []
+        self.slots = SlotStore(slot_definitions)
         self.engagement_id = engagement_id
 
-    def add_storage(self, data):
-        """Add data to the storage"""
-        self.storage.append(data)
-
-    def get_storage(self) -> Optional[str]:
-        """Get the last item in the storage"""
-        return self.storage[-1] if self.storage else None
+    def get_slots(self) -> SlotStore:
+        """Get the slot store of the target"""
+        return self.slots
 
     @classmethod
     def from_template(
@@ -58,11 +64,27 @@ class Target:
         """Create a Target instance from template files with an engagement ID."""
         target_parser = TargetTemplateParser(target_template_path)
         target_parser.parse()
+        return cls.from_parser(target_parser, engagement_id)
+
+    @classmethod
+    def from_template_data(
+        cls, template: Dict, engagement_id: Optional[str] = None
+    ) -> "Target":
+        """Create a Target instance from an already loaded target template."""
+        target_parser = TargetTemplateParser()
+        target_parser.parse_data(template)
+        return cls.from_parser(target_parser, engagement_id)
+
+    @classmethod
+    def from_parser(
+        cls, target_parser: TargetTemplateParser, engagement_id: Optional[str] = None
+    ) -> "Target":
+        """Create a Target instance from a parser that has parsed a template."""
         target_data = target_parser.get_target()
 
         return cls(
             name=target_data.name,
             description=target_data.description,
-            storage=target_data.storage,
+            slot_definitions=list(target_data.slots.get_definitions().values()),
             engagement_id=engagement_id,
         )
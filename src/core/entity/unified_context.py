@@ -1,7 +1,8 @@
 """UnifiedContext class for managing the context in natural language understanding."""
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 
 from core.entity.agent import Agent
+from core.entity.interaction_history import InteractionHistory
 from core.entity.role import State
 from core.entity.target import Target
 
@@ -14,32 +15,37 @@ class UnifiedContext:
 
     agent: Agent
     target: Target
-    interaction_his: List[Dict]
+    interaction_his: InteractionHistory
     engagement_id: Optional[str]
+    template_versions: Dict[str, int]
 
     def __init__(
         self,
         agent: Agent,
         target: Target,
-        interaction_his: List[Dict],
+        interaction_his: InteractionHistory,
         engagement_id: Optional[str] = None,
+        template_versions: Optional[Dict[str, int]] = None,
     ):
         """Initialize UnifiedContext with agent, target, interaction history, and engagement ID."""
         self.agent = agent
         self.target = target
         self.interaction_his = interaction_his
         self.engagement_id = engagement_id
+        # Template versions the engagement is pinned to
+        self.template_versions = template_versions or {}
 
     @classmethod
     def from_config(
         cls,
         agent: Agent,
         target: Target,
-        interaction_his: List[Dict],
+        interaction_his: InteractionHistory,
         engagement_id: Optional[str] = None,
+        template_versions: Optional[Dict[str, int]] = None,
     ) -> "UnifiedContext":
         """Create a UnifiedContext instance from configuration with an engagement ID."""
-        return cls(agent, target, interaction_his, engagement_id)
+        return cls(agent, target, interaction_his, engagement_id, template_versions)
 
     def _get_current_state(self) -> State:
         """Get the current state of the role"""
@@ -53,7 +59,7 @@ class UnifiedContext:
         """Get the target"""
         return self.target
 
-    def _get_interaction_his(self) -> List[Dict]:
+    def _get_interaction_his(self) -> InteractionHistory:
         """Get the interaction history"""
         return self.interaction_his
 
@@ -0,0 +1,444 @@
+"""Role template compiler.
+
+Validates role templates before they are used at request time and writes a
+precompiled artifact that loads much faster than parsing the YAML source.
+
+Artifacts are pickles and must only be loaded from trusted locations.
+"""
+import hashlib
+import os
+import pickle
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from core.action_cache import CachePolicy
+from utils.logging import logging
+from utils.yaml_loader import safe_load
+
+if TYPE_CHECKING:
+    from service.event_action_registry import EventActionRegistry
+
+logger = logging.getLogger(__name__)
+
+COMPILED_SUFFIX = ".rolec"
+FORMAT_VERSION = 1
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass
+class Diagnostic:
+    """Data class representing a problem found in a role template."""
+
+    severity: str
+    code: str
+    message: str
+    state: Optional[str] = None
+
+    def __str__(self) -> str:
+        location = f"[{self.state}] " if self.state else ""
+        return f"{self.severity}: {self.code}: {location}{self.message}"
+
+
+@dataclass
+class CompiledRoleTemplate:
+    """Data class representing a validated role template."""
+
+    # Absolute path of the YAML source, so artifacts can be checked from any cwd
+    source: str
+    sha256: str
+    template: Dict
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    format_version: int = FORMAT_VERSION
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        """Diagnostics that make the template unusable."""
+        return [d for d in self.diagnostics if d.severity == ERROR]
+
+    @property
+    def warnings(self) -> List[Diagnostic]:
+        """Diagnostics that point at dead or undocumented parts of the template."""
+        return [d for d in self.diagnostics if d.severity == WARNING]
+
+
+class RoleTemplateCompiler:
+    """Compiler performing static analysis on role templates."""
+
+    def __init__(self, registry: Optional["EventActionRegistry"] = None):
+        """Initialize the compiler.
+
+        Args:
+            registry: Registry used to check that every action exists,
+                the check is skipped when omitted
+        """
+        self.registry = registry
+
+    def compile(self, template_path: str) -> CompiledRoleTemplate:
+        """Load and analyze a role template file.
+
+        Args:
+            template_path: Path to the role template YAML file
+
+        Returns:
+            CompiledRoleTemplate: The template with its diagnostics
+        """
+        with open(template_path, "rb") as f:
+            source = f.read()
+
+        template = safe_load(source)
+        return CompiledRoleTemplate(
+            source=os.path.abspath(template_path),
+            sha256=hashlib.sha256(source).hexdigest(),
+            template=template,
+            diagnostics=self.analyze(template),
+        )
+
+    def analyze(self, template: Dict) -> List[Diagnostic]:
+        """Run every static check on a parsed role template.
+
+        Args:
+            template: The parsed role template
+
+        Returns:
+            List[Diagnostic]: Problems found, errors first
+        """
+        if not isinstance(template, dict) or not isinstance(
+            template.get("states"), list
+        ):
+            return [Diagnostic(ERROR, "no-states", "Template has no list of states")]
+
+        states: Dict[str, Dict] = {}
+        diagnostics = []
+        for state_data in template["states"]:
+            name = state_data.get("name")
+            if not name or not state_data.get("state_type"):
+                diagnostics.append(
+                    Diagnostic(
+                        ERROR, "invalid-state", "State needs a name and a state_type"
+                    )
+                )
+                continue
+            if name in states:
+                diagnostics.append(
+                    Diagnostic(ERROR, "duplicate-state", "State defined twice", name)
+                )
+            states[name] = state_data
+
+        properties = template.get("properties") or {}
+        diagnostics.extend(self._check_start_state(states))
+        diagnostics.extend(self._check_transitions(states))
+        diagnostics.extend(self._check_actions(states))
+        diagnostics.extend(self._check_extract_slots(states))
+        diagnostics.extend(self._check_fused_reply(states))
+        diagnostics.extend(self._check_reachability(states))
+        diagnostics.extend(self._check_descriptions(states, properties))
+
+        return sorted(diagnostics, key=lambda d: d.severity != ERROR)
+
+    @staticmethod
+    def _check_start_state(states: Dict[str, Dict]) -> List[Diagnostic]:
+        start_states = [
+            name for name, data in states.items() if data["state_type"] == "start"
+        ]
+        if not start_states:
+            return [Diagnostic(ERROR, "no-start-state", "Template has no start state")]
+        if len(start_states) > 1:
+            return [
+                Diagnostic(
+                    ERROR,
+                    "multiple-start-states",
+                    f"Only one start state allowed, found {', '.join(start_states)}",
+                )
+            ]
+        return []
+
+    @staticmethod
+    def _live_transitions(state_data: Dict) -> List[Dict]:
+        """Transitions that can fire, mirroring Agent's transition rules.
+
+        Start states follow their lowest positive priority transition without a
+        condition. Other states follow the highest priority transition whose
+        condition is the detected event, so for each event only transitions down
+        to the first one without required slots can fire.
+        """
+        transitions = state_data.get("transitions") or []
+        if state_data["state_type"] == "start":
+            candidates = [
+                t
+                for t in transitions
+                if not t.get("condition") and t.get("priority", 0) > 0
+            ]
+            if not candidates:
+                return []
+            return [min(candidates, key=lambda t: t.get("priority", 0))]
+
+        events = state_data.get("event_actions") or {}
+        live = []
+        for event in events:
+            candidates = sorted(
+                (t for t in transitions if t.get("condition") == event),
+                key=lambda t: t.get("priority", 0),
+                reverse=True,
+            )
+            for transition in candidates:
+                live.append(transition)
+                if not transition.get("requires"):
+                    break
+        return live
+
+    def _check_transitions(self, states: Dict[str, Dict]) -> List[Diagnostic]:
+        diagnostics = []
+        for name, state_data in states.items():
+            transitions = state_data.get("transitions") or []
+            live = self._live_transitions(state_data)
+            events = state_data.get("event_actions") or {}
+
+            for transition in transitions:
+                target = transition.get("to")
+                if target not in states:
+                    diagnostics.append(
+                        Diagnostic(
+                            ERROR,
+                            "unknown-state",
+                            f"Transition to undefined state '{target}'",
+                            name,
+                        )
+                    )
+                if any(transition is t for t in live):
+                    continue
+
+                condition = transition.get("condition")
+                if condition and condition not in events:
+                    reason = f"no event '{condition}' is handled in this state"
+                elif condition:
+                    reason = (
+                        f"shadowed by a higher priority transition on '{condition}'"
+                    )
+                else:
+                    reason = (
+                        "transitions without a condition only fire from the start state"
+                    )
+                diagnostics.append(
+                    Diagnostic(
+                        WARNING,
+                        "dead-transition",
+                        f"Transition to '{target}' can never fire: {reason}",
+                        name,
+                    )
+                )
+
+            if state_data["state_type"] != "end" and not live:
+                diagnostics.append(
+                    Diagnostic(
+                        WARNING,
+                        "dead-end-state",
+                        "Non-end state has no transition that can fire",
+                        name,
+                    )
+                )
+        return diagnostics
+
+    def _check_actions(self, states: Dict[str, Dict]) -> List[Diagnostic]:
+        diagnostics = []
+        for name, state_data in states.items():
+            for event, actions in (state_data.get("event_actions") or {}).items():
+                for action in actions or []:
+                    action_name = action.get("name")
+                    if (
+                        self.registry is not None
+                        and self.registry.get_action(event, action_name) is None
+                    ):
+                        diagnostics.append(
+                            Diagnostic(
+                                ERROR,
+                                "unknown-action",
+                                f"Action '{action_name}' is not registered for event '{event}'",
+                                name,
+                            )
+                        )
+                    for flag in ("optional", "cpu_bound"):
+                        if not isinstance(action.get(flag, False), bool):
+                            diagnostics.append(
+                                Diagnostic(
+                                    ERROR,
+                                    f"invalid-{flag.replace('_', '-')}",
+                                    f"Action '{action_name}' must set {flag} to true or false",
+                                    name,
+                                )
+                            )
+                    if action.get("cache") is not None:
+                        try:
+                            CachePolicy.from_config(action["cache"])
+                        except (AttributeError, TypeError, ValueError) as e:
+                            diagnostics.append(
+                                Diagnostic(
+                                    ERROR,
+                                    "invalid-cache",
+                                    f"Action '{action_name}' has an invalid cache config: {e}",
+                                    name,
+                                )
+                            )
+        return diagnostics
+
+    @staticmethod
+    def _check_extract_slots(states: Dict[str, Dict]) -> List[Diagnostic]:
+        diagnostics = []
+        for name, state_data in states.items():
+            slots = state_data.get("extract_slots")
+            if slots is None:
+                continue
+            if not isinstance(slots, list) or not all(
+                isinstance(slot, str) for slot in slots
+            ):
+                diagnostics.append(
+                    Diagnostic(
+                        ERROR,
+                        "invalid-extract-slots",
+                        "extract_slots must be a list of slot names",
+                        name,
+                    )
+                )
+            elif state_data.get("state_type") == "end":
+                diagnostics.append(
+                    Diagnostic(
+                        WARNING,
+                        "unused-extract-slots",
+                        "End states never detect intents, extract_slots is ignored",
+                        name,
+                    )
+                )
+        return diagnostics
+
+    @staticmethod
+    def _check_fused_reply(states: Dict[str, Dict]) -> List[Diagnostic]:
+        diagnostics = []
+        for name, state_data in states.items():
+            fused_reply = state_data.get("fused_reply", False)
+            if not isinstance(fused_reply, bool):
+                diagnostics.append(
+                    Diagnostic(
+                        ERROR,
+                        "invalid-fused-reply",
+                        "fused_reply must be true or false",
+                        name,
+                    )
+                )
+            elif fused_reply and state_data.get("state_type") == "end":
+                diagnostics.append(
+                    Diagnostic(
+                        WARNING,
+                        "unused-fused-reply",
+                        "End states never detect intents, fused_reply is ignored",
+                        name,
+                    )
+                )
+        return diagnostics
+
+    def _check_reachability(self, states: Dict[str, Dict]) -> List[Diagnostic]:
+        start = next(
+            (name for name, data in states.items() if data["state_type"] == "start"),
+            None,
+        )
+        if start is None:
+            return []
+
+        reached: Set[str] = {start}
+        queue = deque([start])
+        while queue:
+            for transition in self._live_transitions(states[queue.popleft()]):
+                target = transition.get("to")
+                if target in states and target not in reached:
+                    reached.add(target)
+                    queue.append(target)
+
+        return [
+            Diagnostic(
+                WARNING, "unreachable-state", "State cannot be reached from start", name
+            )
+            for name in states
+            if name not in reached
+        ]
+
+    @staticmethod
+    def _check_descriptions(
+        states: Dict[str, Dict], properties: Dict[str, Dict]
+    ) -> List[Diagnostic]:
+        def described(name: str) -> bool:
+            return bool((properties.get(name) or {}).get("description"))
+
+        diagnostics = [
+            Diagnostic(WARNING, "missing-description", "State has no description", name)
+            for name in states
+            if not described(name)
+        ]
+        events = {
+            event
+            for state_data in states.values()
+            for event in (state_data.get("event_actions") or {})
+        }
+        diagnostics.extend(
+            Diagnostic(
+                WARNING, "missing-description", f"Event '{event}' has no description"
+            )
+            for event in sorted(events)
+            if not described(event)
+        )
+        return diagnostics
+
+
+def write_compiled(compiled: CompiledRoleTemplate, output_path: str) -> None:
+    """Write a compiled role template artifact.
+
+    Args:
+        compiled: The compiled template
+        output_path: Destination of the artifact
+    """
+    payload = asdict(compiled)
+    with open(output_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_compiled(path: str) -> CompiledRoleTemplate:
+    """Load a compiled role template artifact.
+
+    When the source template still exists, it is hashed again so an artifact
+    that was not recompiled after the template changed is rejected. Artifacts
+    shipped without their source are loaded as they are.
+
+    Args:
+        path: Path to an artifact written by ``write_compiled``
+
+    Returns:
+        CompiledRoleTemplate: The compiled template
+
+    Raises:
+        ValueError: If the artifact was written by an incompatible version, or
+            its source template changed since it was compiled
+    """
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+
+    if payload.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported compiled role format {payload.get('format_version')} in {path}"
+        )
+    source = payload["source"]
+    if not os.path.isfile(source):
+        logger.info("Source %s of %s not found, not checking staleness", source, path)
+    else:
+        with open(source, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        if sha256 != payload["sha256"]:
+            raise ValueError(
+                f"Compiled role {path} is stale, recompile it from {source}"
+            )
+    payload["diagnostics"] = [Diagnostic(**d) for d in payload["diagnostics"]]
+    return CompiledRoleTemplate(**payload)
+
+
+def compiled_path_for(template_path: str) -> str:
+    """Get the default artifact path for a role template."""
+    return os.path.splitext(template_path)[0] + COMPILED_SUFFIX
@@ -0,0 +1,344 @@
+"""Monte Carlo simulation of role state machines.
+
+A role is compiled into a Markov chain over its states: every turn the target
+emits an event drawn from the event priors of the current state, and the
+event moves the agent the way ``Agent.transit_to_next_state`` would. End
+states are absorbing. Engagements are simulated in vectorized batches, which
+makes millions of engagements a matter of seconds.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.entity.role import Role
+from core.entity.state import State, Transition
+
+DEFAULT_FALLBACK_EVENT = "default_fallback_event"
+
+# state name -> event name -> relative weight
+EventPriors = Dict[str, Dict[str, float]]
+
+
+def default_priors(role: Role) -> EventPriors:
+    """Get uniform priors over the events each state offers to the LLM.
+
+    States without events can only produce the fallback event.
+
+    Args:
+        role: The role to simulate
+
+    Returns:
+        EventPriors: Uniform weights per state
+    """
+    return {
+        name: {event: 1.0 for event in state.event_actions}
+        or {DEFAULT_FALLBACK_EVENT: 1.0}
+        for name, state in role.states.items()
+    }
+
+
+@dataclass
+class CompiledRole:
+    """Data class holding the Markov chain of a role."""
+
+    state_names: List[str]
+    # Row s holds the probabilities of the next state after a turn in state s
+    transitions: np.ndarray
+    start: int
+    absorbing: np.ndarray
+    # Expected LLM calls of a turn in each state
+    llm_calls: np.ndarray
+
+    def index(self, state_name: str) -> int:
+        """Get the row of a state."""
+        return self.state_names.index(state_name)
+
+
+@dataclass
+class SimulationReport:  # pylint:disable=too-many-instance-attributes
+    """Data class summarizing simulated engagements."""
+
+    engagements: int
+    max_turns: int
+    # End state -> fraction of engagements ending there
+    outcomes: Dict[str, float]
+    # End state -> mean, p50 and p95 turns of the engagements ending there
+    turns_to_end: Dict[str, Dict[str, float]]
+    # Fraction of engagements still running after max_turns
+    unfinished: float
+    # Unfinished engagements count as max_turns
+    mean_turns: float
+    # State -> mean turns an engagement spends in it
+    occupancy: Dict[str, float]
+    mean_llm_calls: float
+    p95_llm_calls: float
+    # Analytical expectations of the same chain, None if it cannot be solved
+    expected_turns: Optional[float] = None
+    expected_outcomes: Dict[str, float] = field(default_factory=dict)
+
+    def projected_llm_calls(self, engagements: int) -> float:
+        """Project the LLM calls of a number of engagements."""
+        return self.mean_llm_calls * engagements
+
+
+class RoleSimulator:
+    """Compile a role into a Markov chain and simulate engagements on it."""
+
+    def __init__(
+        self,
+        role: Role,
+        priors: Optional[EventPriors] = None,
+        requirement_probability: float = 1.0,
+        llm_calls_per_turn: float = 1.0,
+    ):
+        """Initialize the simulator.
+
+        Args:
+            role: The role to simulate
+            priors: Event weights per state, uniform over the offered events by
+                default; states missing from priors also use the default
+            requirement_probability: Chance that the slots a transition requires
+                are filled when its event is detected
+            llm_calls_per_turn: LLM calls a turn costs outside end states
+        """
+        self.role = role
+        self.priors = {**default_priors(role), **(priors or {})}
+        self.requirement_probability = requirement_probability
+        self.llm_calls_per_turn = llm_calls_per_turn
+        self.compiled = self.compile()
+
+    def _start_state(self) -> State:
+        """State an agent is in before its first turn, see Agent._init_agent."""
+        init_state = self.role.get_init_state()
+        if init_state is None:
+            raise ValueError(f"Role {self.role.name} has no start state")
+        candidates = [
+            t for t in init_state.transitions if not t.condition and t.priority > 0
+        ]
+        if candidates:
+            next_state = self.role.get_state(
+                min(candidates, key=lambda t: t.priority).to
+            )
+            if next_state:
+                return next_state
+        return init_state
+
+    def _route(
+        self, transitions: List[Transition], event: str
+    ) -> Tuple[Dict[str, float], float]:
+        """Distribution of the next state for an event, like transit_to_next_state.
+
+        The highest priority transition on the event fires; one with required
+        slots only fires with the requirement probability, passing to the next
+        transition otherwise. Without a transition the agent stays put.
+
+        Returns:
+            Tuple[Dict[str, float], float]: Probability per next state, and the
+                probability of staying in the current state
+        """
+        routes: Dict[str, float] = {}
+        remaining = 1.0
+        for transition in sorted(
+            (t for t in transitions if t.condition == event),
+            key=lambda t: t.priority,
+            reverse=True,
+        ):
+            fires = self.requirement_probability if transition.requires else 1.0
+            routes[transition.to] = routes.get(transition.to, 0.0) + remaining * fires
+            remaining *= 1.0 - fires
+        return routes, remaining
+
+    def compile(self) -> CompiledRole:  # pylint:disable=too-many-locals
+        """Build the transition matrix of the role.
+
+        Returns:
+            CompiledRole: The Markov chain of the role
+
+        Raises:
+            ValueError: If the role has no start state or priors have no weight
+        """
+        state_names = list(self.role.states)
+        index = {name: i for i, name in enumerate(state_names)}
+        size = len(state_names)
+        matrix = np.zeros((size, size))
+        absorbing = np.zeros(size, dtype=bool)
+        llm_calls = np.zeros(size)
+
+        for name, state in self.role.states.items():
+            row = index[name]
+            if state.state_type == "end":
+                absorbing[row] = True
+                matrix[row, row] = 1.0
+                continue
+
+            llm_calls[row] = self.llm_calls_per_turn
+            weights = self.priors.get(name, {})
+            total = sum(weights.values())
+            if total <= 0:
+                raise ValueError(f"Event priors of state {name} have no weight")
+            for event, weight in weights.items():
+                routes, stay = self._route(state.transitions, event)
+                for target, probability in routes.items():
+                    matrix[row, index[target]] += weight / total * probability
+                matrix[row, row] += weight / total * stay
+
+        return CompiledRole(
+            state_names=state_names,
+            transitions=matrix,
+            start=index[self._start_state().name],
+            absorbing=absorbing,
+            llm_calls=llm_calls,
+        )
+
+    @staticmethod
+    def _closure(adjacency: np.ndarray, sources: np.ndarray) -> np.ndarray:
+        """States reachable from the sources, including the sources."""
+        reached = np.zeros(len(adjacency), dtype=bool)
+        reached[sources] = True
+        frontier = reached.copy()
+        while frontier.any():
+            frontier = adjacency[frontier].any(axis=0) & ~reached
+            reached |= frontier
+        return reached
+
+    def analyze(self) -> Dict[str, object]:
+        """Solve the expected turns and outcomes of the chain exactly.
+
+        Uses the fundamental matrix N = (I - Q)^-1 of the transient states
+        reachable from the start state.
+
+        Returns:
+            Dict[str, object]: expected_turns and expected_outcomes, empty if
+                some reachable state can never reach an end state
+        """
+        compiled = self.compiled
+        edges = compiled.transitions > 0
+        reachable = self._closure(edges, np.array([compiled.start]))
+        can_end = self._closure(edges.T, np.flatnonzero(compiled.absorbing))
+        if not can_end[reachable].all():
+            return {}
+
+        transient = np.flatnonzero(reachable & ~compiled.absorbing)
+        absorbing = np.flatnonzero(compiled.absorbing)
+        if not transient.size:
+            return {
+                "expected_turns": 0.0,
+                "expected_outcomes": {compiled.state_names[compiled.start]: 1.0},
+            }
+        q = compiled.transitions[np.ix_(transient, transient)]
+        r = compiled.transitions[np.ix_(transient, absorbing)]
+        fundamental = np.linalg.inv(np.eye(len(transient)) - q)
+        start = int(np.flatnonzero(transient == compiled.start)[0])
+        outcomes = fundamental[start] @ r
+        return {
+            "expected_turns": float(fundamental[start].sum()),
+            "expected_outcomes": {
+                compiled.state_names[state]: float(probability)
+                for state, probability in zip(absorbing, outcomes)
+            },
+        }
+
+    def _simulate_batch(self, size: int, max_turns: int, rng: np.random.Generator):
+        """Simulate one batch of engagements.
+
+        Returns:
+            Tuple of the final state, the turn it was reached in (max_turns if
+            never absorbed), the visits per state and the LLM calls per engagement
+        """
+        compiled = self.compiled
+        cumulative = np.cumsum(compiled.transitions, axis=1)
+        cumulative[:, -1] = 1.0
+        states = np.full(size, compiled.start, dtype=np.int64)
+        ended_at = np.where(compiled.absorbing[states], 0, max_turns)
+        llm_calls = np.zeros(size)
+        visits = np.zeros(len(compiled.state_names), dtype=np.int64)
+        active = np.flatnonzero(~compiled.absorbing[states])
+
+        for turn in range(max_turns):
+            if not active.size:
+                break
+            current = states[active]
+            visits += np.bincount(current, minlength=len(visits))
+            llm_calls[active] += compiled.llm_calls[current]
+            draws = rng.random(active.size)
+            # Inverse CDF sampling of every active row at once
+            states[active] = (cumulative[current] < draws[:, None]).sum(axis=1)
+            done = compiled.absorbing[states[active]]
+            ended_at[active[done]] = turn + 1
+            active = active[~done]
+
+        return states, ended_at, visits, llm_calls
+
+    def simulate(  # pylint:disable=too-many-locals
+        self,
+        engagements: int,
+        max_turns: int = 50,
+        batch_size: int = 100_000,
+        seed: Optional[int] = None,
+    ) -> SimulationReport:
+        """Simulate engagements and summarize where they end and what they cost.
+
+        Args:
+            engagements: Number of engagements to simulate
+            max_turns: Turns after which an engagement counts as unfinished
+            batch_size: Engagements simulated at once
+            seed: Seed of the random generator
+
+        Returns:
+            SimulationReport: Outcomes, turns, occupancy and LLM calls
+
+        Raises:
+            ValueError: If there is no engagement to simulate
+        """
+        if engagements <= 0:
+            raise ValueError(f"Cannot simulate {engagements} engagements")
+        compiled = self.compiled
+        rng = np.random.default_rng(seed)
+        finals, ends, calls = [], [], []
+        visits = np.zeros(len(compiled.state_names), dtype=np.int64)
+        for start in range(0, engagements, batch_size):
+            size = min(batch_size, engagements - start)
+            states, ended_at, batch_visits, llm_calls = self._simulate_batch(
+                size, max_turns, rng
+            )
+            finals.append(states)
+            ends.append(ended_at)
+            calls.append(llm_calls)
+            visits += batch_visits
+
+        finals = np.concatenate(finals)
+        ends = np.concatenate(ends)
+        calls = np.concatenate(calls)
+        finished = compiled.absorbing[finals]
+
+        outcomes, turns_to_end = {}, {}
+        for state in np.flatnonzero(compiled.absorbing):
+            mask = finals == state
+            name = compiled.state_names[state]
+            outcomes[name] = float(mask.mean())
+            if mask.any():
+                turns = ends[mask]
+                turns_to_end[name] = {
+                    "mean": float(turns.mean()),
+                    "p50": float(np.percentile(turns, 50)),
+                    "p95": float(np.percentile(turns, 95)),
+                }
+
+        analysis = self.analyze()
+        return SimulationReport(
+            engagements=engagements,
+            max_turns=max_turns,
+            outcomes=outcomes,
+            turns_to_end=turns_to_end,
+            unfinished=float(1.0 - finished.mean()),
+            mean_turns=float(ends.mean()),
+            occupancy={
+                name: float(visits[i] / engagements)
+                for i, name in enumerate(compiled.state_names)
+            },
+            mean_llm_calls=float(calls.mean()),
+            p95_llm_calls=float(np.percentile(calls, 95)),
+            expected_turns=analysis.get("expected_turns"),
+            expected_outcomes=analysis.get("expected_outcomes", {}),
+        )
@@ -1,35 +1,251 @@
-"""This module contains functions that simulate the process of collecting user information."""
+"""This module contains functions that collect user information into target slots.
 
+Each action reads the query for the value of its slot, writes it to the target's
+slot store, replacing a value the target revises, and only asks the target when
+the slot is still missing. States with
+``extract_slots`` also get slot values from the intent detection call, which
+extract_mentioned_slots validates and stores before the ask actions run.
+"""
+import re
+from typing import Any, Callable, Dict, Optional
+
+from core.entity.action_context import ActionContext
+from core.entity.action_result import ActionResult
 from utils.logging import logging
 
 logger = logging.getLogger(__name__)
 
+# Bare pairs need decimals, so counts like "2, 3 people" are not coordinates;
+# whole degrees are only read after a latitude or coordinates label
+_COORDINATES = (
+    re.compile(r"(?<![\d.])(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)(?![\d.])"),
+    re.compile(
+        r"\blat(?:itude)?[\s:=]*(-?\d{1,2}(?:\.\d+)?)\s*,?\s*"
+        r"(?:lon|lng|long|longitude)\b[\s:=]*(-?\d{1,3}(?:\.\d+)?)",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"\bcoordinates?(?:\s+are)?[\s:=]*"
+        r"(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)",
+        re.IGNORECASE,
+    ),
+)
+# Dollar signs followed by an amount, like "$20", are prices, not levels
+_PRICE_SIGNS = re.compile(r"(?<!\$)\${1,4}(?!\$|\s*\d)")
+_RATING = re.compile(r"([0-5](?:\.\d)?)\s*(?:\+|stars?|or (?:more|higher|above))")
+_CARD_ISSUERS = {
+    "american express": "amex",
+    "amex": "amex",
+    "visa": "visa",
+    "mastercard": "mastercard",
+    "master card": "mastercard",
+    "discover": "discover",
+    "jcb": "jcb",
+    "unionpay": "unionpay",
+    "diners": "diners",
+}
+_PRICE_WORDS = {
+    "cheap": [1, 1],
+    "inexpensive": [1, 2],
+    "affordable": [1, 2],
+    "moderate": [2, 2],
+    "expensive": [3, 4],
+    "fancy": [3, 4],
+}
+
+
+def _parse_geo_location(query: str) -> Optional[list]:
+    for pattern in _COORDINATES:
+        match = pattern.search(query)
+        if match:
+            latitude, longitude = float(match.group(1)), float(match.group(2))
+            if abs(latitude) <= 90 and abs(longitude) <= 180:
+                return [latitude, longitude]
+    return None
+
+
+def _parse_credit_card_issuer(query: str) -> Optional[str]:
+    lowered = query.lower()
+    for phrase, issuer in _CARD_ISSUERS.items():
+        if phrase in lowered:
+            return issuer
+    return None
+
+
+def _parse_price_range(query: str) -> Optional[list]:
+    levels = [len(signs) for signs in _PRICE_SIGNS.findall(query)]
+    if levels:
+        return [min(levels), max(levels)]
+    lowered = query.lower()
+    for word, price_range in _PRICE_WORDS.items():
+        if word in lowered:
+            return list(price_range)
+    return None
+
+
+def _parse_rating_range(query: str) -> Optional[list]:
+    match = _RATING.search(query.lower())
+    if not match:
+        return None
+    return [float(match.group(1)), 5.0]
+
+
+def _number_list(value: Any, low: float, high: float) -> Optional[list]:
+    """Get the numbers of a list within bounds, None if any is not."""
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    numbers = []
+    for item in value:
+        if isinstance(item, bool) or not isinstance(item, (int, float)):
+            return None
+        if not low <= item <= high:
+            return None
+        numbers.append(item)
+    return numbers
+
+
+def _valid_geo_location(value: Any) -> Optional[list]:
+    numbers = _number_list(value, -180, 180)
+    if not numbers or len(numbers) != 2 or abs(numbers[0]) > 90:
+        return None
+    return [float(number) for number in numbers]
+
+
+def _valid_credit_card_issuer(value: Any) -> Optional[str]:
+    return _parse_credit_card_issuer(value) if isinstance(value, str) else None
+
+
+def _valid_price_range(value: Any) -> Optional[list]:
+    numbers = _number_list(value, 1, 4)
+    if not numbers or any(int(number) != number for number in numbers):
+        return None
+    return [int(min(numbers)), int(max(numbers))]
 
-def ask_geo_location() -> str:
-    """ask_geo_location() -> None"""
+
+def _valid_rating_range(value: Any) -> Optional[list]:
+    numbers = _number_list(value, 0, 5)
+    if not numbers:
+        return None
+    high = max(numbers) if len(numbers) > 1 else 5.0
+    return [float(min(numbers)), float(high)]
+
+
+# Parse the slot values the target mentions in a query
+QUERY_PARSERS: Dict[str, Callable[[str], Optional[object]]] = {
+    "geo_location": _parse_geo_location,
+    "credit_card_issuer": _parse_credit_card_issuer,
+    "price_range": _parse_price_range,
+    "rating_range": _parse_rating_range,
+}
+
+# Validate and normalize the slot values the LLM extracts
+_EXTRACTED_VALIDATORS: Dict[str, Callable[[Any], Optional[object]]] = {
+    "geo_location": _valid_geo_location,
+    "credit_card_issuer": _valid_credit_card_issuer,
+    "price_range": _valid_price_range,
+    "rating_range": _valid_rating_range,
+}
+
+
+def _collect_slot(
+    context: ActionContext,
+    slot_name: str,
+    parser: Callable[[str], Optional[object]],
+    question: str,
+) -> str:
+    """Fill a slot from the query, returning the question only if still missing.
+
+    A value the query mentions replaces the stored one, so the target can revise
+    it, unless the LLM extracted the slot from the same query.
+    """
+    slots = context.slots
+    if slots is None:
+        return question
+    filled = slots.is_filled(slot_name)
+    if filled and slot_name in (context.extracted_slots or {}):
+        return ""
+
+    value = parser(context.user_query)
+    if value is not None:
+        slots.set(slot_name, value)
+        logger.info("%s %s", "Revised" if filled else "Collected", slot_name)
+        return ""
+    return "" if filled else question
+
+
+def extract_mentioned_slots(context: ActionContext) -> Optional[ActionResult]:
+    """Store the slots the LLM extracted from the query along with the event.
+
+    Runs before the ask actions so they only ask for slots still missing.
+    Values that fail validation are dropped and left to the ask actions, and
+    the reply draft is vetoed since it may take them for granted.
+    """
+    slots = context.slots
+    if slots is None or not context.extracted_slots:
+        return None
+    dropped = False
+    for slot_name, value in context.extracted_slots.items():
+        validator = _EXTRACTED_VALIDATORS.get(slot_name)
+        checked = validator(value) if validator else value
+        if checked is None:
+            logger.info("Dropped invalid extracted %s", slot_name)
+            dropped = True
+            continue
+        try:
+            slots.set(slot_name, checked)
+        except (KeyError, TypeError) as e:
+            logger.info("Dropped extracted %s: %s", slot_name, str(e))
+            dropped = True
+            continue
+        logger.info("Extracted %s", slot_name)
+    return ActionResult(veto_reply=True) if dropped else None
+
+
+def ask_geo_location(context: ActionContext) -> str:
+    """Collect the geographical location of the target."""
     logger.info("Asking for geographical location...")
-    return "True"
+    return _collect_slot(
+        context,
+        "geo_location",
+        _parse_geo_location,
+        "Where are you located? Coordinates work best.",
+    )
 
 
-def ask_credit_card_type_issuer() -> str:
-    """ask_credit_card_type_issuer() -> None"""
+def ask_credit_card_type_issuer(context: ActionContext) -> str:
+    """Collect the credit card issuer of the target."""
     logger.info("Asking for credit card type and issuer...")
-    return "True"
+    return _collect_slot(
+        context,
+        "credit_card_issuer",
+        _parse_credit_card_issuer,
+        "Which credit card would you like to pay with?",
+    )
 
 
-def ask_price_range() -> str:
-    """ask_price_range() -> None"""
+def ask_price_range(context: ActionContext) -> str:
+    """Collect the preferred price range of the target."""
     logger.info("Asking for price range...")
-    return "True"
+    return _collect_slot(
+        context,
+        "price_range",
+        _parse_price_range,
+        "What price range do you prefer, from $ to $$$$?",
+    )
 
 
-def ask_rating_range() -> str:
-    """ask_rating_range() -> None"""
+def ask_rating_range(context: ActionContext) -> str:
+    """Collect the preferred minimum rating of the target."""
     logger.info("Asking for rating range...")
-    return "True"
+    return _collect_slot(
+        context,
+        "rating_range",
+        _parse_rating_range,
+        "What is the lowest rating you would accept, from 0 to 5 stars?",
+    )
 
 
-def ask_customize_preferences() -> str:
+def ask_customize_preferences(_context: ActionContext) -> str:
     """ask_customize_preferences() -> None"""
     logger.info("Asking to customize preferences...")
     return "True"
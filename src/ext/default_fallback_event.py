@@ -1,11 +1,12 @@
 """Default fallback event for the restaurant domain"""
 
+from core.entity.action_context import ActionContext
 from utils.logging import logging
 
 logger = logging.getLogger(__name__)
 
 
-def gently_ask_for_relevant_information() -> str:
+def gently_ask_for_relevant_information(_context: ActionContext) -> str:
     """gently_ask_for_relevant_information() -> None"""
     logger.info("<Target is asking info that not related to this role>")
     return "True"
@@ -1,10 +1,64 @@
 """make recommendation module"""
+import functools
+import os
+from typing import Optional
+
+from core.action_cache import cacheable
+from core.entity.action_context import ActionContext
+from core.restaurant_index import RestaurantIndex
 from utils.logging import logging
 
 logger = logging.getLogger(__name__)
 
+# Directory of the index built by tools/build_restaurant_index.py
+INDEX_DIR_ENV = "RESTAURANT_INDEX_DIR"
+SEARCH_RADIUS_KM = 5.0
+MAX_RECOMMENDATIONS = 3
+
+
+@functools.lru_cache(maxsize=4)
+def _load_index(directory: str) -> RestaurantIndex:
+    logger.info("Loading restaurant index from %s", directory)
+    return RestaurantIndex.load(directory)
+
 
-def generate_recommendation() -> str:
+def get_restaurant_index() -> Optional[RestaurantIndex]:
+    """Get the restaurant index configured by RESTAURANT_INDEX_DIR, if any."""
+    directory = os.environ.get(INDEX_DIR_ENV)
+    return _load_index(directory) if directory else None
+
+
+@cacheable(
+    ttl=300,
+    key_slots=["geo_location", "credit_card_issuer", "price_range", "rating_range"],
+)
+def generate_recommendation(context: ActionContext) -> str:
     """Generate recommendation for the user"""
-    logger.info("<Recommendation generated>")
-    return "True"
+    index = get_restaurant_index()
+    slots = context.slots
+    if index is None or slots is None or not slots.is_filled("geo_location"):
+        logger.info("<Recommendation generated>")
+        return "True"
+
+    latitude, longitude = slots.get("geo_location")
+    restaurants = index.query(
+        latitude,
+        longitude,
+        radius_km=SEARCH_RADIUS_KM,
+        price_range=slots.get("price_range"),
+        rating_range=slots.get("rating_range"),
+        issuer=slots.get("credit_card_issuer"),
+        limit=MAX_RECOMMENDATIONS,
+    )
+    logger.info("Recommended %d restaurants", len(restaurants))
+    if not restaurants:
+        return (
+            f"I could not find a restaurant within {SEARCH_RADIUS_KM:g} km "
+            "matching your preferences."
+        )
+    lines = [
+        f"{i + 1}. {r.name}: {r.rating:.1f} stars, {'$' * r.price}, "
+        f"{r.distance_km:.1f} km away"
+        for i, r in enumerate(restaurants)
+    ]
+    return "Here is what I recommend:\n" + "\n".join(lines)
@@ -1,10 +1,19 @@
 """modify_preferences"""
+from core.entity.action_context import ActionContext
+from ext.collect_info import QUERY_PARSERS
 from utils.logging import logging
 
 logger = logging.getLogger(__name__)
 
 
-def transit_to_information_collection() -> str:
-    """Transit to information collection"""
+def transit_to_information_collection(context: ActionContext) -> str:
+    """Store the preferences the target revises and transit to information collection"""
+    slots = context.slots
+    if slots is not None:
+        for slot_name, parser in QUERY_PARSERS.items():
+            value = parser(context.user_query)
+            if value is not None and slots.get_definition(slot_name) is not None:
+                slots.set(slot_name, value)
+                logger.info("Revised %s", slot_name)
     logger.info("<Transit to information collection>: TODO")
     return "True"
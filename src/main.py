@@ -1,4 +1,5 @@
 """main function for testing the agent initialization and intent detection"""
+from service.memory_profiler import register_memory_route
 from service.user_engagement_service import UserEngagementService
 from utils.logging import logging
 
@@ -12,6 +13,8 @@ def main():
     role_template_path = "./src/config/role_template/restaurant_guide_role.yaml"
     target_template_path = "./src/config/target_template/user.yaml"
     user_engagement_service = UserEngagementService()
+    # Served on METRICS_PORT along with the metrics
+    register_memory_route(user_engagement_service)
     engagement_id = user_engagement_service.create_engagement(
         agent_template_path=agent_template_path,
         role_template_path=role_template_path,
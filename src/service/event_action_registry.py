@@ -1,18 +1,55 @@
 """Event action registry module."""
-from typing import Callable, Optional
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
 import pkgutil
 import importlib
+import time
+
+from core.action_cache import CACHE_POLICY_ATTR, ActionCache, CachePolicy
+from core.action_pool import ActionPool
+from core.entity.role import Role
+from core.entity.state import Action
+from utils.metrics import metrics
+
+ACTION_LOOKUPS = metrics.counter(
+    "action_registry_lookups",
+    "Lookups of registered actions by result",
+    ["result"],
+)
+ROLE_BIND_SECONDS = metrics.histogram(
+    "action_registry_bind_seconds",
+    "Time spent binding roles to their registered actions",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+
+
+class BoundAction(NamedTuple):
+    """An action of a role resolved to its registered function."""
+
+    name: str
+    function: Callable
+    config: Action
+    # Served from the action cache, so free of side effects
+    cacheable: bool = False
+
+
+ActionTable = Dict[Tuple[str, str], Tuple[BoundAction, ...]]
 
 
 class EventActionRegistry:
     """Registry to manage event actions and their execution with scope."""
 
     _instance = None
+    action_cache: ActionCache = None
+    action_pool: ActionPool = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(EventActionRegistry, cls).__new__(cls)
             cls._instance._registry = {}
+            # Created once so roles bound earlier keep sharing the same cache
+            cls._instance.action_cache = ActionCache()
+            # Inline until the service center configures workers
+            cls._instance.action_pool = ActionPool()
         return cls._instance
 
     def __init__(self):
@@ -30,7 +67,12 @@ class EventActionRegistry:
 
                 for attr_name in dir(module):
                     attr = getattr(module, attr_name)
-                    if callable(attr) and not attr_name.startswith("_"):
+                    # Skip names imported into the module, e.g. type hints
+                    if (
+                        callable(attr)
+                        and not attr_name.startswith("_")
+                        and getattr(attr, "__module__", None) == module.__name__
+                    ):
                         self.register(scope, attr_name, attr)
 
         except ImportError as e:
@@ -52,10 +94,9 @@ class EventActionRegistry:
         Returns:
             The registered action function if found, None otherwise
         """
-        if scope in self._registry:
-            actions = self._registry[scope]
-            return actions.get(action_name)
-        return None
+        function = self._registry.get(scope, {}).get(action_name)
+        ACTION_LOOKUPS.inc(result="hit" if function is not None else "miss")
+        return function
 
     def get_actions_from_scope(self, scope: str) -> dict:
         """Get all actions registered under the given scope.
@@ -69,6 +110,85 @@ class EventActionRegistry:
         """
         return self._registry.get(scope, {})
 
+    def bind_role(self, role: Role) -> ActionTable:
+        """Resolve every action of a role to its registered function.
+
+        The resulting table maps (state name, event name) to the ordered tuple
+        of functions to execute and is stored on the role, so a turn only needs
+        a single lookup. Functions registered or removed later are not picked
+        up by roles that were already bound.
+
+        Actions marked ``cpu_bound`` in the role template are wrapped to run
+        on the shared action pool. Actions declared cacheable, by the
+        ``cacheable`` decorator or by a ``cache:`` entry in the role template,
+        are wrapped to be served from the shared action cache, so a cache hit
+        does not reach the pool.
+
+        Args:
+            role: The role to bind
+
+        Returns:
+            ActionTable: The table stored on the role
+
+        Raises:
+            ValueError: If any action of the role is not registered, has an
+                invalid cache config, or is cpu_bound but not a module level
+                function
+        """
+        started = time.perf_counter()
+        action_table: ActionTable = {}
+        missing = []
+        for state in role.states.values():
+            for event_name, event in state.event_actions.items():
+                bound = []
+                for action in event.actions:
+                    function = self.get_action(
+                        scope=event_name, action_name=action.name
+                    )
+                    if function is None:
+                        missing.append(f"{state.name}/{event_name}/{action.name}")
+                        continue
+                    policy = self._cache_policy(function, action)
+                    if action.cpu_bound:
+                        # The cache key slots are the slots the action reads
+                        function = self.action_pool.wrap(
+                            f"{event_name}/{action.name}",
+                            function,
+                            slots=policy.key_slots if policy is not None else None,
+                        )
+                    if policy is not None:
+                        function = self.action_cache.wrap(
+                            f"{event_name}/{action.name}", function, policy
+                        )
+                    bound.append(
+                        BoundAction(action.name, function, action, policy is not None)
+                    )
+                action_table[(state.name, event_name)] = tuple(bound)
+
+        if missing:
+            raise ValueError(
+                f"Role {role.name} uses unregistered actions: {', '.join(missing)}"
+            )
+
+        role.action_table = action_table
+        ROLE_BIND_SECONDS.observe(time.perf_counter() - started)
+        return action_table
+
+    @staticmethod
+    def _cache_policy(function: Callable, action: Action) -> Optional[CachePolicy]:
+        """Get the cache policy of an action, the role template taking precedence."""
+        if action.cache is not None:
+            return CachePolicy.from_config(action.cache)
+        return getattr(function, CACHE_POLICY_ATTR, None)
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get the hit rate and lookup counts of every cached action.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Statistics keyed by "event/action"
+        """
+        return self.action_cache.stats()
+
     def unregister(self, scope: str, action_name: str) -> None:
         """Remove an action from the registry.
 
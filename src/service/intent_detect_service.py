@@ -3,30 +3,337 @@
 This module provides functionality to detect user intents from natural language input
 by analyzing the raw query text and contextual information.
 """
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional, Tuple, Type
+
+from core.entity.role import Role
+from core.entity.slot_store import SlotDefinition
+from core.entity.state import Event, State
+from service.llm_scheduler import PRIORITY_NEW
 from service.llm_service import AdHocInference
+from service.local_intent_resolver import LocalIntent, LocalIntentResolver
+from service.semantic_intent_cache import SemanticIntentCache
+from utils.deadline import CACHED_INTENT, FALLBACK_INTENT, LOCAL_INTENT, Deadline
 from utils.logging import logging
+from utils.response_type import EventActions, constrained_event_model
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FALLBACK_EVENT = "default_fallback_event"
+
+# Role name, state name, events of the state, the slots it extracts and
+# whether it drafts the reply
+ResponseModelKey = Tuple[str, str, Tuple[str, ...], Tuple, bool]
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """Data class deciding when the local intent wins without the LLM."""
+
+    min_confidence: float = 0.5
+    # Events the local resolver may never decide on its own
+    llm_only_events: FrozenSet[str] = field(
+        default_factory=lambda: frozenset({DEFAULT_FALLBACK_EVENT})
+    )
+
+    def accepts(self, local_intent: Optional[LocalIntent], valid_events) -> bool:
+        """Check if a local intent is confident enough to skip the LLM answer.
+
+        Args:
+            local_intent: Event resolved by the local resolver, if any
+            valid_events: Events the current state can handle
+
+        Returns:
+            bool: True if the local intent wins outright
+        """
+        return (
+            local_intent is not None
+            and local_intent.name in valid_events
+            and local_intent.name not in self.llm_only_events
+            and local_intent.confidence >= self.min_confidence
+        )
+
 
-class IntentDetectService:
+class IntentDetectService:  # pylint:disable=too-many-instance-attributes
     """Intent detector class to detect intents from raw queries."""
 
-    def __init__(self, llm_service: AdHocInference, prompt_service):
-        """Initialize the intent detector module."""
+    def __init__(  # pylint:disable=too-many-arguments
+        self,
+        llm_service: AdHocInference,
+        prompt_service,
+        hedge_policy: Optional[HedgePolicy] = None,
+        local_resolver: Optional[LocalIntentResolver] = None,
+        semantic_cache: Optional[SemanticIntentCache] = None,
+        min_llm_seconds: float = 0.3,
+    ):
+        """Initialize the intent detector module.
+
+        Args:
+            llm_service: LLM backend detecting the intent
+            prompt_service: Service building the intent detection prompt
+            hedge_policy: Policy enabling hedged detection, None to only use the LLM
+            local_resolver: Resolver tried before the LLM in hedged mode
+            semantic_cache: Cache of intents of similar queries, None to disable
+            min_llm_seconds: Remaining budget below which turns with a deadline
+                degrade to a cached, local or fallback intent
+        """
         self.llm_service = llm_service
         self.prompt_service = prompt_service
+        self.hedge_policy = hedge_policy
+        self.local_resolver = local_resolver or LocalIntentResolver()
+        self.semantic_cache = semantic_cache
+        self._lock = threading.Lock()
+        self._hedge_stats = {"local": 0, "llm": 0, "local_fallback": 0}
+        self._response_models: Dict[ResponseModelKey, Type[EventActions]] = {}
+        # Budget below which turns with a deadline do not call the LLM
+        self.min_llm_seconds = min_llm_seconds
+
+    def prepare_role(
+        self, role: Role, slot_definitions: Optional[Dict[str, SlotDefinition]] = None
+    ) -> None:
+        """Build the response models of every state of a role.
+
+        Called when a role is loaded so that turns only look models up. Models
+        are keyed by the events and extracted slots of the state as well, so
+        reloaded role versions get their own models while unchanged ones are
+        shared.
+
+        Args:
+            role: The role about to be played
+            slot_definitions: Slots of the target, typing the extracted slots
+        """
+        for state in role.states.values():
+            if state.state_type != "end":
+                self.response_model(role, state, slot_definitions)
+
+    def response_model(
+        self,
+        role: Role,
+        state: State,
+        slot_definitions: Optional[Dict[str, SlotDefinition]] = None,
+    ) -> Type[EventActions]:
+        """Get the response model restricting detection to the events of a state.
+
+        States with ``extract_slots`` get an optional field per slot the
+        target defines, so the LLM extracts them in the same call, and states
+        with ``fused_reply`` get an optional reply field for the reply draft.
+
+        Args:
+            role: Role the state belongs to
+            state: State the intent is detected in
+            slot_definitions: Slots of the target, typing the extracted slots
+
+        Returns:
+            Type[EventActions]: Model whose name is one of the state's events or
+                the fallback event
+        """
+        events = tuple(state.event_actions)
+        slot_fields = tuple(
+            (name, definition.type, definition.description)
+            for name in state.extract_slots or ()
+            if (definition := (slot_definitions or {}).get(name)) is not None
+        )
+        key = (role.name, state.name, events, slot_fields, state.fused_reply)
+        model = self._response_models.get(key)
+        if model is None:
+            if DEFAULT_FALLBACK_EVENT not in events:
+                events += (DEFAULT_FALLBACK_EVENT,)
+            model = constrained_event_model(
+                events, slot_fields=slot_fields, reply=state.fused_reply
+            )
+            with self._lock:
+                model = self._response_models.setdefault(key, model)
+        return model
 
-    def detect_intent_with_args(self, response_format: type, **kwargs) -> type:
-        """Detect intent without a raw query"""
+    def detect_intent_with_args(  # pylint:disable=too-many-locals
+        self,
+        response_format: type,
+        prompt_snapshot=None,
+        candidate_events: Optional[Dict[str, Event]] = None,
+        priority: int = PRIORITY_NEW,
+        cache_key: Optional[Tuple[str, str]] = None,
+        deadline: Optional[Deadline] = None,
+        llm_only: bool = False,
+        **kwargs,
+    ) -> type:
+        """Detect intent without a raw query
+
+        Args:
+            response_format: The Pydantic model class the event is parsed into
+            prompt_snapshot: Pinned prompt templates, defaults to the current ones
+            candidate_events: Events of the current state; enables hedged
+                detection when a hedge policy is set
+            priority: Admission priority of the LLM call, see service.llm_scheduler
+            cache_key: Role and state name; enables the semantic cache when set
+            deadline: Deadline of the turn. With less than min_llm_seconds left,
+                or when the LLM call fails or runs out of time, the intent is
+                degraded to a cached, local or fallback one
+            llm_only: Skip the semantic cache and hedged detection, whose
+                answers only name the event, for states whose LLM call returns
+                more than the event. A deadline can still degrade the intent
+            **kwargs: Parameters of the intent detection prompt
+
+        Returns:
+            An instance of response_format naming the detected event
+        """
+        use_cache = bool(
+            self.semantic_cache is not None
+            and cache_key
+            and candidate_events
+            and not llm_only
+        )
+        valid_events = set(candidate_events or ()) | {DEFAULT_FALLBACK_EVENT}
+        query = kwargs.get("raw_query", "")
+        cached_event = None
+        if use_cache:
+            cached_event = self.semantic_cache.lookup(cache_key, query, valid_events)
+            if cached_event is not None and not self.semantic_cache.should_audit():
+                return response_format(name=cached_event)
+
+        if deadline is not None and deadline.remaining() < self.min_llm_seconds:
+            return self._degraded_intent(
+                response_format, candidate_events, query, cached_event, deadline
+            )
+        try:
+            if self.hedge_policy is not None and candidate_events and not llm_only:
+                result, labelled_by_llm = self._detect_hedged(
+                    response_format,
+                    prompt_snapshot,
+                    candidate_events,
+                    priority,
+                    deadline,
+                    **kwargs,
+                )
+            else:
+                result = self._detect_with_llm(
+                    response_format, prompt_snapshot, priority, deadline, **kwargs
+                )
+                labelled_by_llm = True
+        except Exception as e:  # pylint:disable=broad-exception-caught
+            if deadline is None:
+                raise
+            logger.warning("Intent detection failed within the deadline: %s", str(e))
+            return self._degraded_intent(
+                response_format, candidate_events, query, cached_event, deadline
+            )
+
+        # Only LLM answers label the cache, so it never learns from itself
+        if use_cache and labelled_by_llm and result.name in valid_events:
+            if cached_event is not None:
+                self.semantic_cache.record_audit(cached_event, result.name)
+            if cached_event != result.name:
+                self.semantic_cache.store(cache_key, query, result.name)
+        return result
+
+    def _degraded_intent(  # pylint:disable=too-many-arguments
+        self,
+        response_format: type,
+        candidate_events: Optional[Dict[str, Event]],
+        query: str,
+        cached_event: Optional[str],
+        deadline: Deadline,
+    ):
+        """Answer without the LLM when the deadline does not allow for it.
+
+        Prefers the semantic cache, then the local resolver, and falls back
+        to the fallback event, recording the degradation on the deadline.
+        """
+        if cached_event is not None:
+            deadline.degrade(CACHED_INTENT)
+            return response_format(name=cached_event)
+        valid_events = set(candidate_events or ()) | {DEFAULT_FALLBACK_EVENT}
+        local_intent = self.local_resolver.resolve(query, candidate_events or {})
+        if local_intent is not None and local_intent.name in valid_events:
+            deadline.degrade(LOCAL_INTENT)
+            return response_format(name=local_intent.name)
+        deadline.degrade(FALLBACK_INTENT)
+        return response_format(name=DEFAULT_FALLBACK_EVENT)
+
+    def _detect_with_llm(
+        self,
+        response_format: type,
+        prompt_snapshot,
+        priority: int,
+        deadline: Optional[Deadline] = None,
+        **kwargs,
+    ):
         prompt = self.prompt_service.build_prompt_from_template(
-            "intent_detection", **kwargs
+            "intent_detection", prompt_snapshot, **kwargs
         )
 
         result = self.llm_service.completion_with_object(
-            prompt=prompt, response_format=response_format
+            prompt=prompt,
+            response_format=response_format,
+            priority=priority,
+            deadline=deadline,
         )
         return result
 
+    def _detect_hedged(  # pylint:disable=too-many-arguments
+        self,
+        response_format: type,
+        prompt_snapshot,
+        candidate_events: Dict[str, Event],
+        priority: int,
+        deadline: Optional[Deadline] = None,
+        **kwargs,
+    ):
+        """Try the local resolver before the LLM.
+
+        The local resolver takes microseconds, so it runs first and the LLM is
+        only called when the policy does not accept the local answer. The LLM
+        answer is then used, falling back to the local answer when the LLM
+        fails or returns an event the state cannot handle.
+
+        Returns:
+            The detected event, and whether it is the answer of the LLM
+        """
+        valid_events = set(candidate_events) | {DEFAULT_FALLBACK_EVENT}
+        local_intent = self.local_resolver.resolve(
+            kwargs.get("raw_query", ""), candidate_events
+        )
+        if self.hedge_policy.accepts(local_intent, valid_events):
+            self._record("local")
+            logger.debug(
+                "Local intent %s won with confidence %.2f",
+                local_intent.name,
+                local_intent.confidence,
+            )
+            return response_format(name=local_intent.name), False
+
+        has_local_answer = (
+            local_intent is not None and local_intent.name in valid_events
+        )
+        try:
+            result = self._detect_with_llm(
+                response_format, prompt_snapshot, priority, deadline, **kwargs
+            )
+        except Exception as e:  # pylint:disable=broad-exception-caught
+            if not has_local_answer:
+                raise
+            logger.warning("LLM intent detection failed, using local: %s", str(e))
+            self._record("local_fallback")
+            return response_format(name=local_intent.name), False
+
+        if getattr(result, "name", None) not in valid_events and has_local_answer:
+            self._record("local_fallback")
+            return response_format(name=local_intent.name), False
+        self._record("llm")
+        return result, True
+
+    def _record(self, winner: str) -> None:
+        with self._lock:
+            self._hedge_stats[winner] += 1
+
+    def hedge_stats(self) -> Dict[str, int]:
+        """Get how often each side answered in hedged mode.
+
+        Returns:
+            Dict[str, int]: Counts of local wins, LLM wins and local fallbacks
+        """
+        with self._lock:
+            return dict(self._hedge_stats)
+
     def place_holder_function(self):
         """Place holder function for future implementation."""
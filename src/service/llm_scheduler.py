@@ -0,0 +1,344 @@
+"""Admission control for LLM calls.
+
+Every call waits for its turn in a per model priority queue before it is sent
+to the provider. A call is admitted when it is at the head of the queue, the
+adaptive concurrency limit has room, and the request and token buckets of the
+model can pay for it. Calls still queued at their deadline are shed with a
+LoadShedError instead of piling more load onto a saturated provider.
+"""
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import openai
+
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lower values are admitted first
+PRIORITY_ACTIVE = 0
+PRIORITY_NEW = 1
+
+
+class LoadShedError(Exception):
+    """Raised when an LLM call could not be admitted before its deadline."""
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    """Data class holding the provider rate limits of a model."""
+
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 200_000
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per minute rate."""
+
+    def __init__(
+        self,
+        per_minute: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize a full bucket.
+
+        Args:
+            per_minute: Tokens added per minute
+            capacity: Maximum tokens held, defaults to one minute's worth
+            clock: Time source, injectable for tests
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Get the seconds until the bucket holds the given amount.
+
+        Amounts above the capacity are capped, so they wait for a full bucket
+        instead of forever.
+
+        Args:
+            amount: Tokens needed
+
+        Returns:
+            float: Zero if the amount is available now
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self._tokens
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+    def consume(self, amount: float) -> None:
+        """Take tokens out of the bucket, which may go negative."""
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class AIMDLimiter:  # pylint:disable=too-many-instance-attributes
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Each fast success raises the limit by about one per window of ``limit``
+    calls. A rate limit response, a timed out call, or a call slower than the
+    latency target, cuts the limit by the backoff factor at most once per
+    cooldown.
+    """
+
+    def __init__(  # pylint:disable=too-many-arguments
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 5.0,
+        backoff: float = 0.5,
+        cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            initial: Starting concurrency limit
+            min_limit: Lowest limit the backoff can reach
+            max_limit: Highest limit the increase can reach
+            latency_target: Seconds above which a call counts as congestion
+            backoff: Factor applied to the limit on congestion
+            cooldown: Minimum seconds between two decreases
+            clock: Time source, injectable for tests
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self._clock = clock
+        self._limit = float(initial)
+        self._decreased_at = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    def on_success(self, latency: float) -> None:
+        """Adjust the limit after a successful call.
+
+        Args:
+            latency: Seconds the call took
+        """
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+    def on_rate_limited(self) -> None:
+        """Cut the limit after the provider rejected a call with a 429."""
+        self._decrease()
+
+    def on_timeout(self) -> None:
+        """Cut the limit after a call timed out, which is congestion as well."""
+        self._decrease()
+
+    def _decrease(self) -> None:
+        now = self._clock()
+        if now - self._decreased_at >= self.cooldown:
+            self._limit = max(self.min_limit, self._limit * self.backoff)
+            self._decreased_at = now
+
+
+class _ModelQueue:  # pylint:disable=too-few-public-methods
+    """Admission state of one model."""
+
+    def __init__(self, limits: ModelLimits, limiter: AIMDLimiter, clock):
+        self.requests = TokenBucket(limits.requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(limits.tokens_per_minute, clock=clock)
+        self.limiter = limiter
+        self.waiting: List[Tuple[int, int]] = []
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "shed": 0, "rate_limited": 0, "timed_out": 0}
+
+    def reserve(self, tokens: int) -> float:
+        """Pay for a call if both buckets allow it, else return the wait time."""
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait == 0:
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+        return wait
+
+
+class LLMScheduler:  # pylint:disable=too-many-instance-attributes
+    """Scheduler admitting LLM calls by priority within per model limits."""
+
+    def __init__(  # pylint:disable=too-many-arguments
+        self,
+        limits: Optional[Dict[str, ModelLimits]] = None,
+        default_limits: Optional[ModelLimits] = None,
+        max_queue_wait: float = 10.0,
+        max_queue_size: int = 256,
+        limiter_factory: Callable[[], AIMDLimiter] = AIMDLimiter,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            limits: Rate limits per model name
+            default_limits: Rate limits of models not listed in limits
+            max_queue_wait: Default seconds a call may wait for admission
+            max_queue_size: Calls queued per model before new ones are shed
+            limiter_factory: Creates the concurrency limiter of each model
+            clock: Time source of the token buckets, injectable for tests
+        """
+        self.limits = limits or {}
+        self.default_limits = default_limits or ModelLimits()
+        self.max_queue_wait = max_queue_wait
+        self.max_queue_size = max_queue_size
+        self._limiter_factory = limiter_factory
+        self._clock = clock
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        """Get the queue of a model; callers must hold the condition."""
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = _ModelQueue(
+                self.limits.get(model, self.default_limits),
+                self._limiter_factory(),
+                self._clock,
+            )
+            self._queues[model] = queue
+        return queue
+
+    def run(  # pylint:disable=too-many-arguments
+        self,
+        model: str,
+        call: Callable[[], T],
+        tokens: int = 0,
+        priority: int = PRIORITY_NEW,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """Run an LLM call once it is admitted.
+
+        Args:
+            model: Model the call is sent to
+            call: Function sending the request
+            tokens: Estimated prompt and completion tokens of the call
+            priority: PRIORITY_ACTIVE for engagements in progress, PRIORITY_NEW otherwise
+            deadline: Seconds the call may wait for admission, defaults to max_queue_wait
+
+        Returns:
+            The result of the call
+
+        Raises:
+            LoadShedError: If the queue is full or the deadline passes first
+        """
+        self._admit(model, tokens, priority, deadline)
+        started_at = time.monotonic()
+        try:
+            result = call()
+        except openai.RateLimitError:
+            with self._condition:
+                queue = self._queues[model]
+                queue.stats["rate_limited"] += 1
+                queue.limiter.on_rate_limited()
+                logger.warning(
+                    "Rate limited by %s, concurrency limit is now %d",
+                    model,
+                    queue.limiter.limit,
+                )
+            raise
+        except openai.APITimeoutError:
+            with self._condition:
+                queue = self._queues[model]
+                queue.stats["timed_out"] += 1
+                queue.limiter.on_timeout()
+                logger.warning(
+                    "Call to %s timed out, concurrency limit is now %d",
+                    model,
+                    queue.limiter.limit,
+                )
+            raise
+        else:
+            with self._condition:
+                self._queues[model].limiter.on_success(time.monotonic() - started_at)
+            return result
+        finally:
+            with self._condition:
+                self._queues[model].in_flight -= 1
+                self._condition.notify_all()
+
+    def _admit(
+        self, model: str, tokens: int, priority: int, deadline: Optional[float]
+    ) -> None:
+        """Block until the call may be sent, or shed it."""
+        expires_at = time.monotonic() + (
+            self.max_queue_wait if deadline is None else deadline
+        )
+        with self._condition:
+            queue = self._queue(model)
+            if len(queue.waiting) >= self.max_queue_size:
+                queue.stats["shed"] += 1
+                raise LoadShedError(f"Queue of {model} is full")
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(queue.waiting, ticket)
+            try:
+                while True:
+                    wait = None
+                    if (
+                        queue.waiting[0] == ticket
+                        and queue.in_flight < queue.limiter.limit
+                    ):
+                        wait = queue.reserve(tokens)
+                        if wait == 0:
+                            break
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        queue.stats["shed"] += 1
+                        raise LoadShedError(
+                            f"Call to {model} not admitted before its deadline"
+                        )
+                    self._condition.wait(min(remaining, wait) if wait else remaining)
+            except BaseException:
+                queue.waiting.remove(ticket)
+                heapq.heapify(queue.waiting)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(queue.waiting)
+            queue.in_flight += 1
+            queue.stats["admitted"] += 1
+            # The next call in line may fit as well
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the admission statistics of every model.
+
+        Returns:
+            Dict[str, Dict[str, int]]: Admitted, shed, rate limited and timed
+                out calls, the current limit, calls in flight and calls queued per model
+        """
+        with self._condition:
+            return {
+                model: {
+                    **queue.stats,
+                    "limit": queue.limiter.limit,
+                    "in_flight": queue.in_flight,
+                    "queued": len(queue.waiting),
+                }
+                for model, queue in self._queues.items()
+            }
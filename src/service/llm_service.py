@@ -1,19 +1,65 @@
 """LLM module for ad-hoc inference."""
-from typing import List, Dict
+import time
+from collections import deque
+from typing import List, Dict, Iterable, Optional
 
 from openai import OpenAI
 
+from service.llm_scheduler import PRIORITY_NEW, LLMScheduler
+from utils.deadline import Deadline
+from utils.metrics import metrics
+from utils.tokens import estimate_tokens
+
+# Completion tokens budgeted per structured call when admitting it
+COMPLETION_TOKEN_ESTIMATE = 64
+
+
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "llm_request_seconds",
+    "Latency of structured LLM requests, excluding admission waits",
+    ["model", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0),
+)
+
 
 class AdHocInference:
     """Ad-hoc inference module for generating completions from prompts."""
 
-    def __init__(self, api_key: str, config: dict):
-        """Initialize the ad-hoc inference module with the OpenAI API key and configuration."""
+    def __init__(
+        self, api_key: str, config: dict, scheduler: Optional[LLMScheduler] = None
+    ):
+        """Initialize the ad-hoc inference module with the OpenAI API key and configuration.
+
+        Args:
+            api_key: OpenAI API key
+            config: Extra keyword arguments of the OpenAI client
+            scheduler: Admission control for structured calls, None to send them
+                directly. The client then does not retry by default, so every
+                attempt is paced by the scheduler and 429s reach its limiter
+        """
+        if scheduler is not None:
+            config = {"max_retries": 0, **config}
         self.client = OpenAI(api_key=api_key, **config)
+        self.scheduler = scheduler
+
+    def _client(self, timeout: Optional[float]) -> OpenAI:
+        """Get the client sending a request bounded by a timeout.
 
-    def completions(self, prompt: str, model: str = "gpt-4o-mini") -> str:
+        The client retries failed requests with the timeout applying to each
+        attempt, so bounded requests are sent without retries.
+
+        Args:
+            timeout: Seconds the request may take, None for the client defaults
+        """
+        if timeout is None:
+            return self.client
+        return self.client.with_options(max_retries=0, timeout=timeout)
+
+    def completions(
+        self, prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None
+    ) -> str:
         """Generate completions from the given prompt."""
-        completions = self.client.chat.completions.create(
+        completions = self._client(timeout).chat.completions.create(
             model=model,
             messages=[
                 {
@@ -25,8 +71,13 @@ class AdHocInference:
         result = completions.choices[0].message.content
         return result
 
-    def completion_with_object(
-        self, prompt: str, response_format: type, model: str = "gpt-4o"
+    def completion_with_object(  # pylint:disable=too-many-arguments
+        self,
+        prompt: str,
+        response_format: type,
+        model: str = "gpt-4o",
+        priority: int = PRIORITY_NEW,
+        deadline: Optional[Deadline] = None,
     ):
         """Generate completions from the given prompt and parse into specified object type.
 
@@ -34,28 +85,147 @@ class AdHocInference:
             prompt: The input prompt text
             response_format: The Pydantic model class to parse the response into
             model: The LLM model to use
+            priority: Admission priority, see service.llm_scheduler
+            deadline: Deadline of the call, e.g. of the turn; admission and the
+                request, without retries, share what is left of it. None waits
+                for admission up to the scheduler's max_queue_wait and sends
+                the request with the client's timeout and retries
 
         Returns:
             An instance of the specified response_format type
+
+        Raises:
+            LoadShedError: If the scheduler sheds the call
+            TimeoutError: If the deadline passed during admission
         """
 
-        completions = self.client.beta.chat.completions.parse(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Return the information based on the prompt.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            response_format=response_format,
+        def parse():
+            # Measured once admitted, so the queue wait counts against the deadline
+            timeout = deadline.remaining() if deadline else None
+            if timeout == 0:
+                raise TimeoutError("Deadline passed before the request was sent")
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                completions = self._client(timeout).beta.chat.completions.parse(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "Return the information based on the prompt.",
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                    response_format=response_format,
+                )
+                outcome = "ok"
+                return completions.choices[0].message.parsed
+            finally:
+                LLM_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, model=model, outcome=outcome
+                )
+
+        if self.scheduler is None:
+            return parse()
+        return self.scheduler.run(
+            model,
+            parse,
+            tokens=estimate_tokens(prompt) + COMPLETION_TOKEN_ESTIMATE,
+            priority=priority,
+            deadline=deadline.remaining() if deadline else None,
         )
-        return completions.choices[0].message.parsed
 
     def completions_with_context(
-        self, context: List[Dict], model: str = "gpt-4o-mini"
+        self,
+        context: List[Dict],
+        model: str = "gpt-4o-mini",
+        timeout: Optional[float] = None,
     ) -> str:
-        """Generate completions from the given context."""
-        completions = self.client.chat.completions.create(model=model, messages=context)
+        """Generate completions from the given context.
+
+        Args:
+            context: Chat messages, e.g. ``InteractionHistory.render()`` which is
+                cached and bounded by the history's token budget
+            model: The LLM model to use
+            timeout: Seconds the request may take, the client default if None
+
+        Returns:
+            The content of the first completion choice
+        """
+        completions = self._client(timeout).chat.completions.create(
+            model=model, messages=context
+        )
         result = completions.choices[0].message.content
         return result
+
+
+class RecordedInference:
+    """Offline stand-in for AdHocInference that replays recorded responses.
+
+    Structured completions return the next recorded event name, falling back to
+    ``default_event`` once the recording is exhausted, so conversations can be
+    replayed without network access or API keys.
+    """
+
+    def __init__(
+        self,
+        events: Optional[Iterable[str]] = None,
+        default_event: str = "default_fallback_event",
+        latency: float = 0.0,
+    ):
+        """Initialize the recorded inference backend.
+
+        Args:
+            events: Recorded event names, returned in order
+            default_event: Event returned when no recording is left
+            latency: Seconds to sleep per call to simulate the provider
+        """
+        self.default_event = default_event
+        self.latency = latency
+        self._events = deque(events or [])
+
+    def load(self, events: Iterable[str]) -> None:
+        """Replace the recording with a new sequence of events."""
+        self._events = deque(events)
+
+    def _next_event(self, timeout: Optional[float] = None) -> str:
+        """Pop the next recorded event after the simulated latency.
+
+        Raises:
+            TimeoutError: If the latency exceeds the timeout, like a request
+                timing out at the provider
+        """
+        if self.latency:
+            if timeout is not None and self.latency > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"Recorded call timed out after {timeout:.3f}s")
+            time.sleep(self.latency)
+        return self._events.popleft() if self._events else self.default_event
+
+    # pylint:disable=unused-argument
+    def completions(
+        self, prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None
+    ) -> str:
+        """Return the next recorded event as plain text."""
+        return self._next_event(timeout)
+
+    def completion_with_object(  # pylint:disable=too-many-arguments
+        self,
+        prompt: str,
+        response_format: type,
+        model: str = "gpt-4o",
+        priority: int = PRIORITY_NEW,
+        deadline: Optional[Deadline] = None,
+    ):
+        """Return the next recorded event parsed into the response format."""
+        timeout = deadline.remaining() if deadline else None
+        return response_format(name=self._next_event(timeout))
+
+    def completions_with_context(
+        self,
+        context: List[Dict],
+        model: str = "gpt-4o-mini",
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Return the next recorded event as plain text."""
+        return self._next_event(timeout)
@@ -0,0 +1,61 @@
+"""Cheap keyword based intent resolver used to hedge the LLM intent call."""
+import functools
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Pattern, Tuple
+
+from core.entity.state import Event
+
+
+@dataclass(frozen=True)
+class LocalIntent:
+    """Data class representing an event resolved without the LLM."""
+
+    name: str
+    # Margin of the best event over the runner up, between 0 and 1
+    confidence: float
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_keywords(keywords: Tuple[str, ...]) -> Tuple[Pattern, ...]:
+    """Compile whole word patterns for the keywords of an event."""
+    return tuple(
+        re.compile(r"\b" + re.escape(keyword.lower()) + r"\b") for keyword in keywords
+    )
+
+
+class LocalIntentResolver:  # pylint:disable=too-few-public-methods
+    """Resolve the event of a query from the keywords of the candidate events.
+
+    Keywords are declared per event in the ``properties`` section of the role
+    template. The score of an event is the number of its keywords found in the
+    query, and the confidence is the margin of the best score over the runner
+    up, so a query matching several events is never confident.
+    """
+
+    def resolve(self, query: str, events: Dict[str, Event]) -> Optional[LocalIntent]:
+        """Resolve the most likely event for a query.
+
+        Args:
+            query: Raw query from the target
+            events: Candidate events of the current state, by name
+
+        Returns:
+            Optional[LocalIntent]: The best matching event, None if no keyword matched
+        """
+        lowered = query.lower()
+        scores = []
+        for name, event in events.items():
+            if not event.keywords:
+                continue
+            patterns = _compile_keywords(tuple(event.keywords))
+            score = sum(1 for pattern in patterns if pattern.search(lowered))
+            if score:
+                scores.append((score, name))
+
+        if not scores:
+            return None
+        scores.sort(reverse=True)
+        best, name = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0
+        return LocalIntent(name=name, confidence=(best - runner_up) / (best + 1))
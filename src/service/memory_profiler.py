@@ -0,0 +1,299 @@
+"""Memory accounting of engagements and the caches of the service center.
+
+The retained size of an engagement is the size of every object reachable from
+its context that no other sampled engagement reaches, split by the component
+that reaches it first: the interaction history, the target and its slots, and
+the agent itself. Roles and prompt snapshots are meant to be shared, so the
+walk stops at them and they are accounted per role instead, which shows roles
+that were built once per engagement. Objects reached by several engagements,
+like slot definitions, are reported once as shared bytes.
+
+Allocation sites come from tracemalloc when it is tracing, e.g. with
+``PYTHONTRACEMALLOC=25`` or ``tools/memory_profile.py``.
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+import types
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.entity.role import Role
+from core.entity.state import State
+from core.entity.unified_context import UnifiedContext
+from service import service_center
+from service.prompt_service import PromptSnapshot
+from utils.logging import logging
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+ADMIN_MEMORY_PATH = "/admin/memory"
+# Components of an engagement, in the order they claim shared objects
+COMPONENTS = ("interaction_history", "target", "agent")
+
+# Objects the walk does not enter: code, and the templates engagements share
+CODE_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+BOUNDARY_TYPES = CODE_TYPES + (Role, State, PromptSnapshot)
+
+
+def _walk(
+    root: object, seen: Set[int], boundary: Tuple[type, ...] = BOUNDARY_TYPES
+) -> Dict[int, int]:
+    """Get the sizes of the objects reachable from root by id.
+
+    Args:
+        root: Object to start from
+        seen: Ids of objects not to enter, extended with the ones visited
+        boundary: Types of the objects not to enter
+
+    Returns:
+        Dict[int, int]: Size in bytes of every object visited
+    """
+    sizes: Dict[int, int] = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, boundary):
+            continue
+        seen.add(id(obj))
+        sizes[id(obj)] = sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return sizes
+
+
+def deep_sizeof(obj: object) -> int:
+    """Get the bytes of an object and of everything it references.
+
+    The walk does not enter classes, modules, functions, roles, their states
+    and prompt snapshots.
+
+    Args:
+        obj: Object to measure
+
+    Returns:
+        int: Size in bytes
+    """
+    return sum(_walk(obj, set()).values())
+
+
+def _component_sizes(context: UnifiedContext) -> Dict[str, Dict[int, int]]:
+    """Get the objects each component of an engagement reaches first."""
+    seen: Set[int] = set()
+    return {
+        "interaction_history": _walk(context.interaction_his, seen),
+        "target": _walk(context.target, seen),
+        # The rest: the agent and the context holding it
+        "agent": _walk(context, seen),
+    }
+
+
+def engagement_memory(
+    contexts: Dict[str, UnifiedContext], top: int = 5
+) -> Dict[str, object]:
+    """Attribute the retained bytes of engagements to their components.
+
+    Args:
+        contexts: Contexts of the engagements to measure by engagement ID
+        top: Number of the largest engagements to list
+
+    Returns:
+        Dict[str, object]: Mean bytes per component, the largest engagements,
+            the bytes shared between them and the memory of their roles
+    """
+    walks = {
+        engagement_id: _component_sizes(context)
+        for engagement_id, context in contexts.items()
+    }
+    reached = Counter(
+        object_id
+        for components in walks.values()
+        for sizes in components.values()
+        for object_id in sizes
+    )
+    shared: Dict[int, int] = {}
+    retained: List[Tuple[str, Dict[str, int]]] = []
+    for engagement_id, components in walks.items():
+        usage = {}
+        for component, sizes in components.items():
+            usage[component] = 0
+            for object_id, size in sizes.items():
+                if reached[object_id] > 1:
+                    shared[object_id] = size
+                else:
+                    usage[component] += size
+        usage["total"] = sum(usage.values())
+        retained.append((engagement_id, usage))
+
+    count = len(retained)
+    retained.sort(key=lambda item: item[1]["total"], reverse=True)
+    return {
+        "mean_bytes": {
+            component: sum(usage[component] for _, usage in retained) / count
+            if count
+            else 0.0
+            for component in COMPONENTS + ("total",)
+        },
+        "largest": [
+            {"engagement_id": engagement_id, **usage}
+            for engagement_id, usage in retained[:top]
+        ],
+        "shared_bytes": sum(shared.values()),
+        "roles": role_memory(context.agent.role for context in contexts.values()),
+    }
+
+
+def role_memory(roles: Iterable[Role]) -> Dict[str, Dict[str, int]]:
+    """Count the role objects engagements hold by role name.
+
+    Engagements of the same role template share one role, so more than one
+    instance per name means role graphs are duplicated.
+
+    Args:
+        roles: Role of every engagement
+
+    Returns:
+        Dict[str, Dict[str, int]]: Per role name the engagements, the distinct
+            role objects and the bytes of each
+    """
+    result: Dict[str, Dict[str, int]] = {}
+    instances: Dict[int, Role] = {}
+    for role in roles:
+        usage = result.setdefault(
+            role.name, {"engagements": 0, "instances": 0, "bytes_per_instance": 0}
+        )
+        usage["engagements"] += 1
+        if id(role) not in instances:
+            instances[id(role)] = role
+            usage["instances"] += 1
+            usage["bytes_per_instance"] = sum(_walk(role, set(), CODE_TYPES).values())
+    return result
+
+
+def cache_memory() -> Dict[str, int]:
+    """Get the bytes held by the caches of the service center.
+
+    Returns:
+        Dict[str, int]: Bytes per cache
+    """
+    intent_detection = service_center.intent_detection_service
+    caches = {
+        "action_cache": service_center.event_action_registry.action_cache,
+        "semantic_intent_cache": intent_detection.semantic_cache,
+        # pylint:disable=protected-access
+        "intent_response_models": intent_detection._response_models,
+        "template_store": service_center.template_store,
+    }
+    return {
+        name: deep_sizeof(cache) for name, cache in caches.items() if cache is not None
+    }
+
+
+def allocation_diff(
+    before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int = 10
+) -> List[Dict[str, object]]:
+    """Get the source lines whose allocations grew the most between snapshots.
+
+    Args:
+        before: Snapshot taken first
+        after: Snapshot taken later
+        top: Number of source lines to list
+
+    Returns:
+        List[Dict[str, object]]: Location, bytes and blocks grown per line
+    """
+    stats = after.compare_to(before, "lineno")
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:top]
+        if stat.size_diff > 0
+    ]
+
+
+def allocation_sites(top: int = 10) -> List[Dict[str, object]]:
+    """Get the source lines holding the most memory while tracemalloc traces.
+
+    Args:
+        top: Number of source lines to list
+
+    Returns:
+        List[Dict[str, object]]: Location, bytes and blocks per line, empty
+            when tracemalloc is not tracing
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().statistics("lineno")
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "count": stat.count,
+        }
+        for stat in stats[:top]
+    ]
+
+
+def memory_report(
+    engagement_service, sample: Optional[int] = 1000, top: int = 5
+) -> Dict[str, object]:
+    """Report the memory of the engagements of a service and of the caches.
+
+    Args:
+        engagement_service: UserEngagementService holding the engagements
+        sample: Engagements to measure at most, picked at random; None to
+            measure all of them
+        top: Number of the largest engagements and allocation sites to list
+
+    Returns:
+        Dict[str, object]: Engagement, role, cache and allocation memory
+    """
+    engagement_ids = engagement_service.engagement_ids()
+    sampled = engagement_ids
+    if sample is not None and len(engagement_ids) > sample:
+        sampled = random.sample(engagement_ids, sample)
+    contexts = {
+        engagement_id: engagement_service.get_context(engagement_id)
+        for engagement_id in sampled
+    }
+    return {
+        "engagements": len(engagement_ids),
+        "sampled": len(contexts),
+        **engagement_memory(contexts, top),
+        "caches": cache_memory(),
+        "allocations": allocation_sites(top),
+    }
+
+
+def register_memory_route(
+    engagement_service,
+    registry: MetricsRegistry = metrics,
+    path: str = ADMIN_MEMORY_PATH,
+    sample: Optional[int] = 1000,
+) -> None:
+    """Serve the memory report of an engagement service as JSON.
+
+    Args:
+        engagement_service: UserEngagementService to report on
+        registry: Metrics registry whose HTTP server serves the route
+        path: URL path of the report
+        sample: Engagements to measure at most per request
+    """
+
+    def handler() -> Tuple[str, str]:
+        report = memory_report(engagement_service, sample=sample)
+        return "application/json", json.dumps(report, indent=2)
+
+    registry.register_route(path, handler)
+    logger.debug("Serving the memory report on %s", path)
@@ -4,9 +4,34 @@ This service handles the organization, formatting, and delivery of prompts
 for various models and functional components of the system.
 """
 import os
+import threading
+from dataclasses import dataclass
 from typing import Dict, Optional
 
-import yaml
+from utils.logging import logging
+from utils.metrics import metrics
+from utils.yaml_loader import safe_load
+
+logger = logging.getLogger(__name__)
+
+PROMPT_RENDER_SECONDS = metrics.histogram(
+    "prompt_render_seconds",
+    "Time spent rendering prompt templates",
+    ["template"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025),
+)
+
+
+@dataclass(frozen=True)
+class PromptSnapshot:
+    """Immutable version of the prompt templates.
+
+    Engagements hold on to the snapshot they started with, so reloading the
+    templates never changes the prompts of a conversation in flight.
+    """
+
+    version: int
+    templates: Dict[str, Dict]
 
 
 class PromptService:
@@ -27,28 +52,109 @@ class PromptService:
             prompt_template_dir: Directory containing prompt template YAML files
         """
         self.prompt_template_dir = prompt_template_dir
-        self.prompt_templates: Dict[str, Dict] = {}
+        self._write_lock = threading.Lock()
+        self._file_mtimes: Dict[str, int] = {}
+        self._snapshot = PromptSnapshot(version=0, templates={})
         self._load_prompt_templates()
 
-    def _load_prompt_templates(self) -> None:
-        """Load all prompt templates from YAML files in the template directory."""
+    @property
+    def prompt_templates(self) -> Dict[str, Dict]:
+        """Templates of the current snapshot."""
+        return self._snapshot.templates
+
+    def snapshot(self) -> PromptSnapshot:
+        """Get the current version of the prompt templates.
+
+        Returns:
+            PromptSnapshot: The snapshot new engagements should be pinned to
+        """
+        return self._snapshot
+
+    def _swap(self, templates: Dict[str, Dict]) -> PromptSnapshot:
+        """Publish a new snapshot; callers must hold the write lock."""
+        self._snapshot = PromptSnapshot(
+            version=self._snapshot.version + 1, templates=templates
+        )
+        return self._snapshot
+
+    def _scan_template_files(self) -> Dict[str, int]:
+        """Get the modification time of every template file in the directory."""
         if not os.path.exists(self.prompt_template_dir):
             raise FileNotFoundError(
                 f"Prompt template directory not found: {self.prompt_template_dir}"
             )
 
-        for filename in os.listdir(self.prompt_template_dir):
-            if filename.endswith(".yaml") or filename.endswith(".yml"):
-                template_path = os.path.join(self.prompt_template_dir, filename)
-                with open(template_path, "r", encoding="utf-8") as file:
-                    template_name = os.path.splitext(filename)[0]
-                    self.prompt_templates[template_name] = yaml.safe_load(file)
+        return {
+            filename: os.stat(
+                os.path.join(self.prompt_template_dir, filename)
+            ).st_mtime_ns
+            for filename in os.listdir(self.prompt_template_dir)
+            if filename.endswith(".yaml") or filename.endswith(".yml")
+        }
 
-    def get_prompt(self, template_name: str, **kwargs) -> str:
+    def _load_prompt_templates(self) -> None:
+        """Load all prompt templates from YAML files in the template directory."""
+        file_mtimes = self._scan_template_files()
+        templates = {}
+        for filename in file_mtimes:
+            template_path = os.path.join(self.prompt_template_dir, filename)
+            with open(template_path, "r", encoding="utf-8") as file:
+                template_name = os.path.splitext(filename)[0]
+                templates[template_name] = safe_load(file)
+
+        with self._write_lock:
+            self._file_mtimes = file_mtimes
+            self._swap({**self._snapshot.templates, **templates})
+
+    def reload(self) -> bool:
+        """Reload the template files that changed since they were last loaded.
+
+        Files are parsed before the new snapshot is published, and a file that
+        fails to parse keeps its previous version.
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        file_mtimes = self._scan_template_files()
+        changed = {
+            filename: mtime
+            for filename, mtime in file_mtimes.items()
+            if self._file_mtimes.get(filename) != mtime
+        }
+        if not changed:
+            return False
+
+        templates = {}
+        for filename in changed:
+            template_path = os.path.join(self.prompt_template_dir, filename)
+            try:
+                with open(template_path, "r", encoding="utf-8") as file:
+                    templates[os.path.splitext(filename)[0]] = safe_load(file)
+            except Exception as e:  # pylint:disable=broad-exception-caught
+                logger.error("Failed to reload prompt %s: %s", template_path, str(e))
+
+        with self._write_lock:
+            self._file_mtimes = {**self._file_mtimes, **changed}
+            if templates:
+                self._swap({**self._snapshot.templates, **templates})
+                logger.info(
+                    "Reloaded prompts %s as version %d",
+                    ", ".join(sorted(templates)),
+                    self._snapshot.version,
+                )
+        return bool(templates)
+
+    def get_prompt(
+        self,
+        template_name: str,
+        prompt_snapshot: Optional[PromptSnapshot] = None,
+        **kwargs,
+    ) -> str:
         """Get a formatted prompt using the specified template and parameters.
 
         Args:
             template_name: Name of the prompt template to use
+            prompt_snapshot: Pinned template version, defaults to the current one
             **kwargs: Key-value pairs to format the prompt template
 
         Returns:
@@ -57,10 +163,11 @@ class PromptService:
         Raises:
             KeyError: If template_name doesn't exist
         """
-        if template_name not in self.prompt_templates:
+        templates = (prompt_snapshot or self._snapshot).templates
+        if template_name not in templates:
             raise KeyError(f"Prompt template not found: {template_name}")
 
-        template = self.prompt_templates[template_name]
+        template = templates[template_name]
         prompt_template = template.get("prompt", "")
 
         try:
@@ -75,7 +182,8 @@ class PromptService:
             template_name: Name for the new template
             template: Template dictionary containing prompt format
         """
-        self.prompt_templates[template_name] = template
+        with self._write_lock:
+            self._swap({**self._snapshot.templates, template_name: template})
 
     def get_template_parameters(self, template_name: str) -> Optional[Dict]:
         """Get the required parameters for a prompt template.
@@ -100,16 +208,25 @@ class PromptService:
         Raises:
             KeyError: If template_name doesn't exist
         """
-        if template_name not in self.prompt_templates:
-            raise KeyError(f"Prompt template not found: {template_name}")
-
-        del self.prompt_templates[template_name]
-
-    def build_prompt_from_template(self, template_name: str, **kwargs) -> str:
+        with self._write_lock:
+            if template_name not in self._snapshot.templates:
+                raise KeyError(f"Prompt template not found: {template_name}")
+
+            templates = dict(self._snapshot.templates)
+            del templates[template_name]
+            self._swap(templates)
+
+    def build_prompt_from_template(
+        self,
+        template_name: str,
+        prompt_snapshot: Optional[PromptSnapshot] = None,
+        **kwargs,
+    ) -> str:
         """Build prompt using the specified template with unified context.
 
         Args:
             template_name: Name of the prompt template to use
+            prompt_snapshot: Pinned template version, defaults to the current one
             **kwargs: Additional parameters for template formatting
 
         Returns:
@@ -118,7 +235,8 @@ class PromptService:
         Raises:
             KeyError: If template not found or required parameters missing
         """
-        if template_name not in self.prompt_templates:
+        templates = (prompt_snapshot or self._snapshot).templates
+        if template_name not in templates:
             raise KeyError(f"Prompt template not found: {template_name}")
 
         # Default context parameters from unified_context
@@ -127,4 +245,5 @@ class PromptService:
         # Merge with additional kwargs, allowing kwargs to override defaults
         template_params = {**context_params, **kwargs}
 
-        return self.get_prompt(template_name, **template_params)
+        with PROMPT_RENDER_SECONDS.time(template=template_name):
+            return self.get_prompt(template_name, prompt_snapshot, **template_params)
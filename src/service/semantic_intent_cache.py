@@ -0,0 +1,280 @@
+"""Semantic cache of detected intents.
+
+Queries are embedded offline with a hashing vectorizer over character n-grams,
+so spelling variants and reworded queries that share most of their words land
+close together. Each (role, state) keeps a fixed size matrix of the embeddings
+of queries the LLM labelled, and a query is answered from the cache when its
+cosine similarity to a labelled query reaches the threshold. A sample of the
+hits is still sent to the LLM to measure the precision of the cache.
+"""
+import random
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+IndexKey = Tuple[str, str]
+
+
+class HashingVectorizer:
+    """Embed text as signed, hashed counts of character n-grams."""
+
+    def __init__(self, dim: int = 2048, ngram_range: Tuple[int, int] = (3, 5)):
+        """Initialize the vectorizer.
+
+        Args:
+            dim: Number of hash buckets, i.e. the embedding size
+            ngram_range: Smallest and largest n-gram length
+        """
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def transform(self, text: str) -> np.ndarray:
+        """Embed a text.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            np.ndarray: L2 normalized float32 vector, all zeros for empty text
+        """
+        normalized = f" {' '.join(_WORD.findall(text.lower()))} "
+        low, high = self.ngram_range
+        grams = [
+            normalized[i : i + n]
+            for n in range(low, high + 1)
+            for i in range(len(normalized) - n + 1)
+        ]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not grams:
+            return vector
+
+        hashes = np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+            dtype=np.uint32,
+            count=len(grams),
+        )
+        # The top bit picks the sign so that collisions cancel out on average
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dim, signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def transform_batch(self, texts: Iterable[str]) -> np.ndarray:
+        """Embed several texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: One normalized row per text
+        """
+        rows = [self.transform(text) for text in texts]
+        if not rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack(rows)
+
+
+class SemanticIntentIndex:
+    """Bounded matrix of labelled query embeddings with LRU eviction."""
+
+    def __init__(self, dim: int, capacity: int):
+        """Initialize an empty index.
+
+        Args:
+            dim: Embedding size
+            capacity: Number of queries kept before the least recently used is evicted
+        """
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.events: List[Optional[str]] = [None] * capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self._tick = 0
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float, int]:
+        """Find the most similar labelled query.
+
+        Args:
+            vector: Normalized query embedding
+
+        Returns:
+            Tuple[Optional[str], float, int]: Event, cosine similarity and row,
+                (None, 0.0, -1) if the index is empty
+        """
+        if not self.size:
+            return None, 0.0, -1
+        similarities = self.vectors[: self.size] @ vector
+        row = int(np.argmax(similarities))
+        return self.events[row], float(similarities[row]), row
+
+    def touch(self, row: int) -> None:
+        """Mark a row as recently used."""
+        self._tick += 1
+        self.last_used[row] = self._tick
+
+    def add(self, vector: np.ndarray, event: str) -> int:
+        """Store a labelled query, evicting the least recently used when full.
+
+        Args:
+            vector: Normalized query embedding
+            event: Event the LLM detected for the query
+
+        Returns:
+            int: Row the query was stored in
+        """
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            row = int(np.argmin(self.last_used))
+        self.vectors[row] = vector
+        self.events[row] = event
+        self.touch(row)
+        return row
+
+
+@dataclass
+class SemanticCacheStats:
+    """Data class counting cache lookups and audits."""
+
+    lookups: int = 0
+    hits: int = 0
+    audits: int = 0
+    audit_agreements: int = 0
+
+    @property
+    def precision(self) -> Optional[float]:
+        """Fraction of audited hits the LLM agreed with, None before any audit."""
+        return self.audit_agreements / self.audits if self.audits else None
+
+
+class SemanticIntentCache:  # pylint:disable=too-many-instance-attributes
+    """Cache serving intents of queries similar to ones the LLM labelled."""
+
+    def __init__(
+        self,
+        vectorizer: Optional[HashingVectorizer] = None,
+        threshold: float = 0.75,
+        capacity: int = 512,
+        audit_rate: float = 0.05,
+        rng: Optional[random.Random] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            vectorizer: Embeds queries, defaults to a HashingVectorizer
+            threshold: Minimum cosine similarity to serve a cached event
+            capacity: Labelled queries kept per (role, state)
+            audit_rate: Fraction of hits also sent to the LLM to measure precision
+            rng: Random source deciding audits, injectable for tests
+        """
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.threshold = threshold
+        self.capacity = capacity
+        self.audit_rate = audit_rate
+        self._rng = rng or random.Random()
+        self._indexes: Dict[IndexKey, SemanticIntentIndex] = {}
+        self._stats = SemanticCacheStats()
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, key: IndexKey, query: str, valid_events: Iterable[str]
+    ) -> Optional[str]:
+        """Get the cached event of the most similar labelled query.
+
+        Args:
+            key: Role and state name the query was asked in
+            query: Raw query from the target
+            valid_events: Events the current state can handle
+
+        Returns:
+            Optional[str]: The cached event, None on a miss
+        """
+        vector = self.vectorizer.transform(query)
+        with self._lock:
+            self._stats.lookups += 1
+            index = self._indexes.get(key)
+            if index is None:
+                return None
+            event, similarity, row = index.nearest(vector)
+            if event is None or similarity < self.threshold:
+                return None
+            if event not in valid_events:
+                return None
+            index.touch(row)
+            self._stats.hits += 1
+            return event
+
+    def should_audit(self) -> bool:
+        """Decide whether a hit is also sent to the LLM to check it."""
+        return self._rng.random() < self.audit_rate
+
+    def store(self, key: IndexKey, query: str, event: str) -> None:
+        """Remember the event the LLM detected for a query.
+
+        A query almost identical to a stored one replaces its label instead of
+        taking another row.
+
+        Args:
+            key: Role and state name the query was asked in
+            query: Raw query from the target
+            event: Event detected by the LLM
+        """
+        vector = self.vectorizer.transform(query)
+        if not vector.any():
+            return
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = SemanticIntentIndex(self.vectorizer.dim, self.capacity)
+                self._indexes[key] = index
+            _, similarity, row = index.nearest(vector)
+            if similarity >= 0.99:
+                index.events[row] = event
+                index.touch(row)
+            else:
+                index.add(vector, event)
+
+    def record_audit(self, cached_event: str, llm_event: str) -> None:
+        """Compare an audited hit with the event the LLM detected.
+
+        Args:
+            cached_event: Event served from the cache
+            llm_event: Event the LLM detected for the same query
+        """
+        with self._lock:
+            self._stats.audits += 1
+            if cached_event == llm_event:
+                self._stats.audit_agreements += 1
+            else:
+                logger.info(
+                    "Semantic cache served %s where the LLM detected %s",
+                    cached_event,
+                    llm_event,
+                )
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Get the hit rate and the audited precision of the cache.
+
+        Returns:
+            Dict[str, Optional[float]]: Lookups, hits, hit rate, audits and precision
+        """
+        with self._lock:
+            stats = self._stats
+            return {
+                "lookups": stats.lookups,
+                "hits": stats.hits,
+                "hit_rate": stats.hits / stats.lookups if stats.lookups else 0.0,
+                "audits": stats.audits,
+                "precision": stats.precision,
+            }
@@ -1,24 +1,55 @@
 """Service center will be accessible by the entire project"""
+import atexit
 import os
+import threading
 from dataclasses import dataclass
 from typing import Optional
 
 import dotenv
 
+from core.role_compiler import RoleTemplateCompiler
 from service.event_action_registry import EventActionRegistry
-from service.intent_detect_service import IntentDetectService
-from src.service.llm_service import AdHocInference
-from src.service.prompt_service import PromptService
+from service.intent_detect_service import HedgePolicy, IntentDetectService
+from service.llm_scheduler import LLMScheduler
+from service.llm_service import AdHocInference
+from service.prompt_service import PromptService
+from service.semantic_intent_cache import SemanticIntentCache
+from service.speculation_service import SpeculationService
+from service.template_reloader import TemplateReloader
+from service.template_store import TemplateStore
+from service.transition_counters import TransitionCounters
+from service.turn_log import TurnLog, open_turn_log
+from utils.metrics import MetricsRegistry, metrics
 
 
 @dataclass
-class ServiceCenter:
+class ServiceCenter:  # pylint:disable=too-many-instance-attributes
     """Represents the application with its initialized services."""
 
     _llm_service: AdHocInference
     _prompt_service: PromptService
     _intent_detect_service: IntentDetectService
     _event_action_registry: EventActionRegistry
+    _template_store: TemplateStore
+    _template_reloader: TemplateReloader
+    _speculation_service: SpeculationService
+    _transition_counters: TransitionCounters
+    _metrics: MetricsRegistry
+    _turn_log: Optional[TurnLog] = None
+
+    @property
+    def llm_service(self):
+        """Get the LLM service."""
+        return self._llm_service
+
+    def use_llm_service(self, llm_service) -> None:
+        """Swap the LLM backend, e.g. for a recorded one during offline replay.
+
+        Args:
+            llm_service: Object implementing the AdHocInference interface
+        """
+        self._llm_service = llm_service
+        self._intent_detect_service.llm_service = llm_service
 
     @property
     def intent_detection_service(self):
@@ -30,6 +61,49 @@ class ServiceCenter:
         """Get the event action registry."""
         return self._event_action_registry
 
+    @property
+    def prompt_service(self):
+        """Get the prompt service."""
+        return self._prompt_service
+
+    @property
+    def template_store(self):
+        """Get the versioned agent, role and target template store."""
+        return self._template_store
+
+    @property
+    def template_reloader(self):
+        """Get the template hot reloader, which is not started by default."""
+        return self._template_reloader
+
+    @property
+    def speculation_service(self):
+        """Get the service running likely actions during intent detection."""
+        return self._speculation_service
+
+    @property
+    def transition_counters(self):
+        """Get the runtime counters of transitions, dwell time and turn latency."""
+        return self._transition_counters
+
+    @property
+    def metrics(self):
+        """Get the registry the services record their metrics in."""
+        return self._metrics
+
+    @property
+    def turn_log(self) -> Optional[TurnLog]:
+        """Get the log engagements and turns are appended to, if enabled."""
+        return self._turn_log
+
+    def use_turn_log(self, turn_log: Optional[TurnLog]) -> None:
+        """Append engagements and turns to another log, or to none.
+
+        Args:
+            turn_log: The turn log, None to stop logging turns
+        """
+        self._turn_log = turn_log
+
 
 @dataclass
 class ServiceCenterInitializer:
@@ -52,16 +126,71 @@ class ServiceCenterInitializer:
         dotenv.load_dotenv(".env")
         api_key = openai_api_key or os.environ.get("OPENAI_API_KEY", "")
 
-        llm = AdHocInference(api_key=api_key, config={})
+        llm = AdHocInference(api_key=api_key, config={}, scheduler=LLMScheduler())
 
         prompts = PromptService()
 
-        intent_detect = IntentDetectService(llm_service=llm, prompt_service=prompts)
+        # Try a local keyword resolver before the LLM when INTENT_HEDGING is set
+        hedge_policy = HedgePolicy() if os.environ.get("INTENT_HEDGING") else None
+        # Serve intents of queries similar to labelled ones when SEMANTIC_INTENT_CACHE is set
+        semantic_cache = (
+            SemanticIntentCache() if os.environ.get("SEMANTIC_INTENT_CACHE") else None
+        )
+        intent_detect = IntentDetectService(
+            llm_service=llm,
+            prompt_service=prompts,
+            hedge_policy=hedge_policy,
+            semantic_cache=semantic_cache,
+        )
         event_action_registry = EventActionRegistry()
+        # Run cpu_bound actions on ACTION_POOL_WORKERS processes if set, started
+        # here before any request threads. The log listener thread already runs,
+        # forked workers restart it through os.register_at_fork in utils.logging
+        if os.environ.get("ACTION_POOL_WORKERS"):
+            action_pool = event_action_registry.action_pool
+            action_pool.configure(int(os.environ["ACTION_POOL_WORKERS"]))
+            action_pool.warm()
+            atexit.register(action_pool.shutdown)
+        template_store = TemplateStore(
+            compiler=RoleTemplateCompiler(registry=event_action_registry)
+        )
+        template_reloader = TemplateReloader(
+            template_store=template_store, prompt_service=prompts
+        )
+        # Poll the templates every TEMPLATE_RELOAD_INTERVAL seconds if set, and
+        # reload on SIGHUP when the service center is built on the main thread
+        if os.environ.get("TEMPLATE_RELOAD_INTERVAL"):
+            template_reloader.interval = float(os.environ["TEMPLATE_RELOAD_INTERVAL"])
+            template_reloader.start()
+            if threading.current_thread() is threading.main_thread():
+                template_reloader.install_signal_handler()
+            atexit.register(template_reloader.stop)
+
+        # Serve the metrics and transition counters on METRICS_PORT and dump
+        # them to METRICS_FILE and TRANSITION_COUNTERS_FILE if set
+        transition_counters = TransitionCounters()
+        transition_counters.register_route(metrics)
+        if os.environ.get("METRICS_PORT"):
+            metrics.start_http_server(int(os.environ["METRICS_PORT"]))
+        if os.environ.get("METRICS_FILE"):
+            metrics.start_file_dump(os.environ["METRICS_FILE"])
+        if os.environ.get("TRANSITION_COUNTERS_FILE"):
+            transition_counters.start_file_dump(os.environ["TRANSITION_COUNTERS_FILE"])
+
+        # Append engagements and turns to a binary log in TURN_LOG_DIR if set
+        turn_log = open_turn_log(os.environ.get("TURN_LOG_DIR"))
+        if turn_log is not None:
+            atexit.register(turn_log.close)
 
         return ServiceCenter(
             _llm_service=llm,
             _prompt_service=prompts,
             _intent_detect_service=intent_detect,
             _event_action_registry=event_action_registry,
+            _template_store=template_store,
+            _template_reloader=template_reloader,
+            _speculation_service=SpeculationService(),
+            _transition_counters=transition_counters,
+            _metrics=metrics,
+            _turn_log=turn_log,
         )
@@ -0,0 +1,237 @@
+"""Speculative execution of actions while intent detection is in flight.
+
+For the current state, the events seen most often before are the likeliest
+next ones. Their actions are started on a thread pool as soon as a turn
+begins, and the results are used if intent detection picks one of them.
+Only events whose actions are all cacheable are speculated on: those actions
+are declared free of side effects, so a discarded run only warms the cache.
+States extracting slots are not speculated on, as their actions read the slots
+detection extracts from the query.
+"""
+import contextvars
+import dataclasses
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from core.entity.action_context import ActionContext
+from core.entity.role import Role
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class SpeculationStats:
+    """Data class counting the outcome of speculative runs."""
+
+    turns: int = 0
+    hits: int = 0
+    misses: int = 0
+    discarded: int = 0
+    latency_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of speculated turns whose detected event was speculated on."""
+        return self.hits / self.turns if self.turns else 0.0
+
+
+class Speculation:
+    """Speculative runs of one turn, keyed by candidate event."""
+
+    def __init__(
+        self,
+        service: "SpeculationService",
+        role_name: str,
+        context: ActionContext,
+        runs: Dict[str, Future],
+    ):
+        """Initialize the speculation of a turn.
+
+        Args:
+            service: Service recording the outcome
+            role_name: Name of the role the agent plays
+            context: Context the turn started with
+            runs: Future of the responses per candidate event
+        """
+        self._service = service
+        self.role_name = role_name
+        self.context = context
+        self.runs = runs
+        self.slot_version = context.slots.version if context.slots else None
+
+    def cancel(self) -> None:
+        """Cancel the runs that have not started, e.g. when detection failed."""
+        for run in self.runs.values():
+            run.cancel()
+
+    def commit(self, event_name: str) -> Optional[List[str]]:
+        """Get the speculative responses for the detected event.
+
+        Runs for other events are discarded. Responses are only returned if the
+        target's slots did not change since the speculation started.
+
+        Args:
+            event_name: Event detected for the turn
+
+        Returns:
+            Optional[List]: Response of every bound action of the event in
+                order, or None if the actions still have to be executed
+        """
+        committed_at = time.perf_counter()
+        future = self.runs.get(event_name)
+        for name, run in self.runs.items():
+            if name != event_name:
+                run.cancel()
+
+        responses = None
+        saved = 0.0
+        slots = self.context.slots
+        if future is not None and (slots.version if slots else None) == (
+            self.slot_version
+        ):
+            try:
+                responses, started_at, finished_at = future.result()
+                # Only the part of the run that overlapped detection is saved
+                saved = max(0.0, min(finished_at, committed_at) - started_at)
+            except Exception as e:  # pylint:disable=broad-exception-caught
+                logger.warning("Speculative run of %s failed: %s", event_name, str(e))
+
+        self._service.record(
+            self.role_name,
+            self.context.state,
+            event_name,
+            hit=responses is not None,
+            discarded=len(self.runs) - (responses is not None),
+            latency_saved=saved,
+        )
+        return responses
+
+
+class SpeculationService:
+    """Service learning event priors and running the likeliest actions early."""
+
+    def __init__(self, max_candidates: int = 2, max_workers: int = 4):
+        """Initialize the speculation service.
+
+        Args:
+            max_candidates: Number of candidate events speculated on per turn
+            max_workers: Threads running speculative actions
+        """
+        self.max_candidates = max_candidates
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="speculation"
+        )
+        # (role name, state name) -> event name -> times detected
+        self._priors: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._stats = SpeculationStats()
+        self._lock = threading.Lock()
+
+    def candidates(self, role: Role, state_name: str) -> List[str]:
+        """Get the events worth speculating on, most likely first.
+
+        Args:
+            role: Role bound to the event action registry
+            state_name: Name of the current state
+
+        Returns:
+            List[str]: Events whose actions are all cacheable, by descending
+                prior; none in states extracting slots
+        """
+        state = role.get_state(state_name)
+        if state is None or state.extract_slots:
+            return []
+        priors = self._priors.get((role.name, state_name), {})
+        speculable = []
+        for event_name in state.event_actions:
+            bound_actions = role.get_bound_actions(state_name, event_name)
+            if bound_actions and all(action.cacheable for action in bound_actions):
+                speculable.append(event_name)
+        # sorted is stable, so unseen events keep their template order
+        speculable.sort(key=lambda name: -priors.get(name, 0))
+        return speculable[: self.max_candidates]
+
+    def start(self, role: Role, context: ActionContext) -> Optional[Speculation]:
+        """Start the actions of the likeliest events for a turn.
+
+        Args:
+            role: Role bound to the event action registry
+            context: Context of the turn; its event is replaced per candidate
+
+        Returns:
+            Optional[Speculation]: Runs to commit once the event is detected,
+                None if no event of the state can be speculated on
+        """
+        candidates = self.candidates(role, context.state)
+        if not candidates:
+            return None
+
+        runs = {}
+        for event_name in candidates:
+            bound_actions = role.get_bound_actions(context.state, event_name)
+            event_context = dataclasses.replace(context, event=event_name)
+            runs[event_name] = self._executor.submit(
+                contextvars.copy_context().run, self._run, bound_actions, event_context
+            )
+        return Speculation(self, role.name, context, runs)
+
+    @staticmethod
+    def _run(bound_actions: Tuple, context: ActionContext):
+        started_at = time.perf_counter()
+        # One response per action, so the agent can drop the ones it skips
+        responses = [bound_action.function(context) for bound_action in bound_actions]
+        return responses, started_at, time.perf_counter()
+
+    def record(
+        self,
+        role_name: str,
+        state_name: str,
+        event_name: str,
+        hit: bool,
+        discarded: int = 0,
+        latency_saved: float = 0.0,
+    ) -> None:
+        """Record the detected event of a turn and the outcome of its speculation.
+
+        Args:
+            role_name: Name of the role the agent plays
+            state_name: State the event was detected in
+            event_name: Detected event
+            hit: Whether speculative responses were used
+            discarded: Number of speculative runs thrown away
+            latency_saved: Seconds of action time overlapped with detection
+        """
+        with self._lock:
+            priors = self._priors.setdefault((role_name, state_name), {})
+            priors[event_name] = priors.get(event_name, 0) + 1
+            self._stats.turns += 1
+            self._stats.discarded += discarded
+            if hit:
+                self._stats.hits += 1
+                self._stats.latency_saved += latency_saved
+            else:
+                self._stats.misses += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Get the speculation hit rate and the latency it saved.
+
+        Returns:
+            Dict[str, float]: Turns, hits, misses, discarded runs, hit rate and
+                total latency saved in milliseconds
+        """
+        with self._lock:
+            stats = self._stats
+            return {
+                "turns": stats.turns,
+                "hits": stats.hits,
+                "misses": stats.misses,
+                "discarded": stats.discarded,
+                "hit_rate": stats.hit_rate,
+                "latency_saved_ms": stats.latency_saved * 1000,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the speculation threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
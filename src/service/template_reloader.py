@@ -0,0 +1,93 @@
+"""Background hot reload of templates on file change or signal."""
+import signal
+import threading
+from typing import Optional
+
+from service.prompt_service import PromptService
+from service.template_store import TemplateStore
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateReloader:
+    """Watch template files and reload them on a background thread.
+
+    Files are polled for modification time changes every ``interval`` seconds,
+    and a reload can also be triggered immediately, e.g. from a SIGHUP handler.
+    Parsing and validation happen on the reloader thread; request threads only
+    ever read the published versions.
+    """
+
+    def __init__(
+        self,
+        template_store: TemplateStore,
+        prompt_service: PromptService,
+        interval: float = 2.0,
+    ):
+        """Initialize the reloader.
+
+        Args:
+            template_store: Store holding the agent, role and target templates
+            prompt_service: Service holding the prompt templates
+            interval: Seconds between polls of the template files
+        """
+        self.template_store = template_store
+        self.prompt_service = prompt_service
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start polling the template files on a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="template-reloader", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the polling thread."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def trigger(self) -> None:
+        """Ask the polling thread to reload now instead of at the next poll."""
+        self._wakeup.set()
+
+    def install_signal_handler(self, signum: int = signal.SIGHUP) -> None:
+        """Trigger a reload when the process receives the given signal.
+
+        Must be called from the main thread.
+
+        Args:
+            signum: Signal number, SIGHUP by default
+        """
+        signal.signal(signum, lambda *_: self.trigger())
+
+    def reload_now(self) -> bool:
+        """Reload changed templates on the calling thread.
+
+        Returns:
+            bool: True if any template got a new version
+        """
+        reloaded = False
+        try:
+            reloaded = bool(self.template_store.reload())
+            reloaded = self.prompt_service.reload() or reloaded
+        except Exception as e:  # pylint:disable=broad-exception-caught
+            logger.error("Template reload failed: %s", str(e))
+        return reloaded
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if not self._stopped.is_set():
+                self.reload_now()
@@ -0,0 +1,160 @@
+"""Versioned store of agent, role and target templates.
+
+Templates are parsed (and role templates compiled) once per version. Reloading
+builds the new versions first and then publishes them with a single reference
+swap, so readers never take a lock and never see a half-loaded template.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.role_compiler import COMPILED_SUFFIX, RoleTemplateCompiler, load_compiled
+from utils.logging import logging
+from utils.yaml_loader import load_file
+
+logger = logging.getLogger(__name__)
+
+AGENT = "agent"
+ROLE = "role"
+TARGET = "target"
+
+
+@dataclass(frozen=True)
+class TemplateVersion:
+    """Data class representing one loaded version of a template file."""
+
+    kind: str
+    path: str
+    version: int
+    mtime_ns: int
+    data: Dict
+
+
+class TemplateStore:
+    """Store serving the current version of each template file."""
+
+    def __init__(self, compiler: Optional[RoleTemplateCompiler] = None):
+        """Initialize an empty template store.
+
+        Args:
+            compiler: Compiler validating role templates before they are served
+        """
+        self.compiler = compiler or RoleTemplateCompiler()
+        self._current: Dict[Tuple[str, str], TemplateVersion] = {}
+        self._write_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Modification times of file versions that failed to load
+        self._failed_mtimes: Dict[Tuple[str, str], int] = {}
+
+    def get(self, kind: str, path: str) -> TemplateVersion:
+        """Get the current version of a template, loading it on first use.
+
+        Args:
+            kind: One of "agent", "role" or "target"
+            path: Path to the template file
+
+        Returns:
+            TemplateVersion: The current version of the template
+
+        Raises:
+            ValueError: If a role template fails validation
+        """
+        current = self._current.get((kind, path))
+        if current is not None:
+            return current
+
+        with self._write_lock:
+            current = self._current.get((kind, path))
+            if current is None:
+                current = self._load(kind, path, version=1)
+                self._current = {**self._current, (kind, path): current}
+        return current
+
+    def get_agent(self, path: str) -> TemplateVersion:
+        """Get the current version of an agent template."""
+        return self.get(AGENT, path)
+
+    def get_role(self, path: str) -> TemplateVersion:
+        """Get the current version of a role template."""
+        return self.get(ROLE, path)
+
+    def get_target(self, path: str) -> TemplateVersion:
+        """Get the current version of a target template."""
+        return self.get(TARGET, path)
+
+    def _load(self, kind: str, path: str, version: int) -> TemplateVersion:
+        """Parse a template file into a new version."""
+        mtime_ns = os.stat(path).st_mtime_ns
+        if kind != ROLE:
+            data = load_file(path)
+        else:
+            compiled = (
+                load_compiled(path)
+                if path.endswith(COMPILED_SUFFIX)
+                else self.compiler.compile(path)
+            )
+            if compiled.errors:
+                raise ValueError(
+                    f"Role template {path} is invalid: "
+                    + "; ".join(str(error) for error in compiled.errors)
+                )
+            data = compiled.template
+
+        return TemplateVersion(
+            kind=kind, path=path, version=version, mtime_ns=mtime_ns, data=data
+        )
+
+    def reload(self) -> List[TemplateVersion]:
+        """Load every template whose file changed and publish the new versions.
+
+        A template that fails to load or validate keeps serving its previous
+        version.
+
+        Returns:
+            List[TemplateVersion]: The newly published versions
+        """
+        with self._reload_lock:
+            changed = []
+            for key, current in self._current.items():
+                try:
+                    mtime_ns = os.stat(current.path).st_mtime_ns
+                except OSError as e:
+                    logger.error("Cannot stat template %s: %s", current.path, str(e))
+                    continue
+                if mtime_ns in (current.mtime_ns, self._failed_mtimes.get(key)):
+                    continue
+
+                try:
+                    changed.append(
+                        self._load(current.kind, current.path, current.version + 1)
+                    )
+                except Exception as e:  # pylint:disable=broad-exception-caught
+                    self._failed_mtimes[key] = mtime_ns
+                    logger.error(
+                        "Keeping version %d of %s: %s",
+                        current.version,
+                        current.path,
+                        str(e),
+                    )
+
+            if changed:
+                with self._write_lock:
+                    updated = dict(self._current)
+                    for template in changed:
+                        updated[(template.kind, template.path)] = template
+                    self._current = updated
+                for template in changed:
+                    logger.info(
+                        "Reloaded %s template %s as version %d",
+                        template.kind,
+                        template.path,
+                        template.version,
+                    )
+            return changed
+
+    def versions(self) -> Dict[str, int]:
+        """Get the current version of every loaded template, keyed by kind:path."""
+        return {
+            f"{kind}:{path}": t.version for (kind, path), t in self._current.items()
+        }
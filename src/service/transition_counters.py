@@ -0,0 +1,224 @@
+"""Runtime counters of state transitions, dwell time and turn latency.
+
+Agents record every turn and transition here. Updates go to a per-thread
+shard without taking a lock, and snapshots combine the shards into a JSON
+document that ``tools/viz.py`` renders as a heatmap over the role's graph.
+The service center serves snapshots on ``/admin/transitions`` of the metrics
+server and dumps them to ``TRANSITION_COUNTERS_FILE`` when it is set.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.logging import logging
+from utils.metrics import DEFAULT_BUCKETS, MetricsRegistry, metrics
+from utils.thread_shards import ThreadShards
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TRANSITIONS_PATH = "/admin/transitions"
+
+# Upper bounds in seconds of the turn latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = DEFAULT_BUCKETS + (30.0,)
+
+
+class _CounterShard:  # pylint:disable=too-few-public-methods
+    """Counters updated by a single thread."""
+
+    def __init__(self):
+        # (role, from state, to state) -> transitions taken
+        self.transitions: Dict[Tuple[str, str, str], int] = {}
+        # (role, state) -> turn count per latency bucket, plus one overflow bucket
+        self.turns: Dict[Tuple[str, str], List[int]] = {}
+        # (role, state) -> [seconds of turn latency, seconds of dwell, visits ended]
+        self.totals: Dict[Tuple[str, str], List[float]] = {}
+
+
+def histogram_percentile(
+    counts: Sequence[int], percentile: float, buckets: Sequence[float] = LATENCY_BUCKETS
+) -> Optional[float]:
+    """Estimate a percentile from histogram counts by interpolating in its bucket.
+
+    Args:
+        counts: Count per bucket, the last one counting values above every bound
+        percentile: Percentile between 0 and 100
+        buckets: Upper bounds of the buckets
+
+    Returns:
+        Optional[float]: The estimate, None for an empty histogram
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = total * percentile / 100.0
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            if index >= len(buckets):
+                return buckets[-1]
+            lower = buckets[index - 1] if index else 0.0
+            return lower + (buckets[index] - lower) * (rank - seen) / count
+        seen += count
+    return buckets[-1]
+
+
+class TransitionCounters:
+    """Counters of the transitions, dwell time and turn latency of roles."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """Initialize empty counters.
+
+        Args:
+            buckets: Upper bounds in seconds of the turn latency buckets
+        """
+        self.buckets = buckets
+        self._shards: ThreadShards[_CounterShard] = ThreadShards(_CounterShard)
+
+    def _totals(self, shard: _CounterShard, key: Tuple[str, str]) -> List[float]:
+        totals = shard.totals.get(key)
+        if totals is None:
+            totals = shard.totals[key] = [0.0, 0.0, 0]
+        return totals
+
+    def record_turn(self, role: str, state: str, seconds: float) -> None:
+        """Record the latency of a turn handled in a state.
+
+        Args:
+            role: Name of the role
+            state: State the turn started in
+            seconds: Latency of the turn
+        """
+        shard = self._shards.local()
+        key = (role, state)
+        counts = shard.turns.get(key)
+        if counts is None:
+            counts = shard.turns[key] = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self._totals(shard, key)[0] += seconds
+
+    def record_transition(
+        self, role: str, from_state: str, to_state: str, dwell_seconds: float
+    ) -> None:
+        """Record a transition and the time spent in the state it leaves.
+
+        Args:
+            role: Name of the role
+            from_state: State left
+            to_state: State entered
+            dwell_seconds: Seconds since the agent entered from_state
+        """
+        shard = self._shards.local()
+        key = (role, from_state, to_state)
+        shard.transitions[key] = shard.transitions.get(key, 0) + 1
+        totals = self._totals(shard, (role, from_state))
+        totals[1] += dwell_seconds
+        totals[2] += 1
+
+    def _merge_shards(self) -> _CounterShard:
+        """Add up the counters of every shard."""
+        merged = _CounterShard()
+        for shard in self._shards.shards():
+            for key, count in shard.transitions.copy().items():
+                merged.transitions[key] = merged.transitions.get(key, 0) + count
+            for key, counts in shard.turns.copy().items():
+                turns = merged.turns.setdefault(key, [0] * len(counts))
+                for index, count in enumerate(list(counts)):
+                    turns[index] += count
+            for key, values in shard.totals.copy().items():
+                totals = self._totals(merged, key)
+                for index, value in enumerate(list(values)):
+                    totals[index] += value
+        return merged
+
+    def snapshot(self) -> Dict:
+        """Combine the shards into a JSON serializable snapshot.
+
+        Returns:
+            Dict: Per role, the states with their turn count, latency histogram,
+                mean and p95 latency and mean dwell time, and the transitions
+                with their count
+        """
+        merged = self._merge_shards()
+        roles: Dict[str, Dict] = {}
+        for role, state in set(merged.turns) | set(merged.totals):
+            counts = merged.turns.get((role, state), [0] * (len(self.buckets) + 1))
+            latency, dwell, visits = merged.totals.get((role, state), [0.0, 0.0, 0])
+            turn_count = sum(counts)
+            p95 = histogram_percentile(counts, 95, self.buckets)
+            roles.setdefault(role, {"states": {}, "transitions": []})["states"][
+                state
+            ] = {
+                "turns": turn_count,
+                "latency_counts": counts,
+                "latency_mean": latency / turn_count if turn_count else None,
+                "latency_p95": p95,
+                "dwell_mean": dwell / visits if visits else None,
+                "visits_ended": int(visits),
+            }
+        for (role, from_state, to_state), count in sorted(merged.transitions.items()):
+            roles.setdefault(role, {"states": {}, "transitions": []})[
+                "transitions"
+            ].append({"from": from_state, "to": to_state, "count": count})
+
+        return {"latency_buckets": list(self.buckets), "roles": roles}
+
+    def write_snapshot(self, path: str) -> None:
+        """Write a snapshot as JSON, replacing the file atomically.
+
+        Args:
+            path: Destination file
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f.name, path)
+
+    def start_file_dump(self, path: str, interval: float = 15.0) -> threading.Thread:
+        """Write snapshots to a file periodically on a daemon thread.
+
+        Args:
+            path: Destination file
+            interval: Seconds between snapshots
+
+        Returns:
+            threading.Thread: The started thread
+        """
+
+        def dump():
+            while True:
+                try:
+                    self.write_snapshot(path)
+                except OSError as e:
+                    logger.warning(
+                        "Failed to dump transition counters to %s: %s", path, str(e)
+                    )
+                time.sleep(interval)
+
+        thread = threading.Thread(
+            target=dump, name="transition-counters-dump", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def register_route(
+        self, registry: MetricsRegistry = metrics, path: str = ADMIN_TRANSITIONS_PATH
+    ) -> None:
+        """Serve snapshots as JSON from the metrics HTTP server.
+
+        Args:
+            registry: Metrics registry whose HTTP server serves the route
+            path: URL path of the snapshot
+        """
+        registry.register_route(
+            path, lambda: ("application/json", json.dumps(self.snapshot()))
+        )
+
+    def reset(self) -> None:
+        """Drop every counter."""
+        self._shards.reset()
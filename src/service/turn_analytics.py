@@ -0,0 +1,349 @@
+"""Vectorized analytics over the turns of a turn log.
+
+The fixed part of every TURN record is gathered into NumPy column arrays with
+one fancy-indexing pass per segment, so only the walk over the record frames
+runs in Python. Columns of sealed segments, every segment but the newest, are
+cached next to the log and reused while the segment is unchanged, so refreshing
+a large log only scans the segments written since. Strings are interned per
+segment in the log and remapped to one vocabulary when segments are merged.
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from service.turn_log import (
+    MAGIC,
+    OUTCOMES,
+    RECORD_DICT,
+    RECORD_TURN,
+    TURN_HEADER,
+    decode_string,
+    iter_frames,
+    map_segment,
+    segment_paths,
+)
+from utils.logging import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".analytics"
+FALLBACK_EVENT = "default_fallback_event"
+LATENCY_PERCENTILES = (50, 95, 99)
+
+# Fixed part of TURN records, see service.turn_log.TURN_HEADER
+TURN_DTYPE = np.dtype(
+    [
+        ("type", "u1"),
+        ("engagement", "<u4"),
+        ("state_before", "<u4"),
+        ("state_after", "<u4"),
+        ("event", "<u4"),
+        ("timestamp", "<f8"),
+        ("turn_seconds", "<f4"),
+        ("intent_seconds", "<f4"),
+        ("actions_seconds", "<f4"),
+        ("outcome", "u1"),
+        ("n_actions", "<u2"),
+    ]
+)
+if TURN_DTYPE.itemsize != TURN_HEADER.size:
+    raise ImportError("TURN_DTYPE does not match the turn log TURN_HEADER")
+
+# Columns holding ids into the strings of the segment
+STRING_COLUMNS = ("engagement", "state_before", "state_after", "event")
+COLUMNS = STRING_COLUMNS + (
+    "timestamp",
+    "turn_seconds",
+    "intent_seconds",
+    "actions_seconds",
+    "outcome",
+)
+
+
+@dataclass
+class SegmentScan:
+    """Columns of the turns of a segment read up to an offset.
+
+    The string columns index into the strings of the segment.
+    """
+
+    strings: List[str]
+    columns: Dict[str, np.ndarray]
+    # Offset after the last complete record read
+    offset: int = len(MAGIC)
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, TURN_DTYPE[name]) for name in COLUMNS}
+
+
+def scan_segment(path: str, resume: Optional[SegmentScan] = None) -> SegmentScan:
+    """Gather the fixed part of the turns of a segment into columns.
+
+    Args:
+        path: Path of the segment file
+        resume: Earlier scan of the segment to continue from its offset
+
+    Returns:
+        SegmentScan: Columns of every turn of the segment read so far
+    """
+    strings = list(resume.strings) if resume else []
+    offset = resume.offset if resume else len(MAGIC)
+    offsets: List[int] = []
+    with map_segment(path) as view:
+        if view is None:
+            return SegmentScan(strings, _empty_columns())
+        for record_type, start, end in iter_frames(view, path, offset):
+            if record_type == RECORD_TURN:
+                offsets.append(start)
+            elif record_type == RECORD_DICT:
+                decode_string(view, start, end, strings)
+            offset = end
+        data = np.frombuffer(view, dtype=np.uint8)
+        index = np.asarray(offsets, dtype=np.int64)[:, None] + np.arange(
+            TURN_DTYPE.itemsize
+        )
+        headers = data[index].view(TURN_DTYPE).reshape(len(offsets))
+        del data
+    columns = {name: headers[name].copy() for name in COLUMNS}
+    if resume is not None and len(resume):
+        columns = {
+            name: np.concatenate([resume.columns[name], columns[name]])
+            for name in COLUMNS
+        }
+    return SegmentScan(strings, columns, offset)
+
+
+def _cache_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR, name + ".npz")
+
+
+def load_segment(
+    path: str, sealed: bool, resume: Optional[SegmentScan] = None
+) -> SegmentScan:
+    """Get the columns of a segment, from its cache if it is sealed.
+
+    Args:
+        path: Path of the segment file
+        sealed: Whether no more records are appended to the segment, which
+            makes its columns cacheable
+        resume: Earlier scan of the segment to continue from
+
+    Returns:
+        SegmentScan: Columns of the turns of the segment
+    """
+    if not sealed:
+        return scan_segment(path, resume)
+    stat = os.stat(path)
+    signature = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    cache_path = _cache_path(path)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if np.array_equal(cached["signature"], signature):
+                return SegmentScan(
+                    list(cached["strings"]),
+                    {name: cached[name] for name in COLUMNS},
+                    int(stat.st_size),
+                )
+    scan = scan_segment(path, resume)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    partial_path = cache_path + ".partial.npz"
+    np.savez(
+        partial_path,
+        signature=signature,
+        strings=np.array(scan.strings, dtype=str),
+        **scan.columns,
+    )
+    os.replace(partial_path, cache_path)
+    return scan
+
+
+class TurnAnalytics:
+    """Aggregates over the turns of a turn log directory."""
+
+    def __init__(self, directory: str):
+        """Load the turns of every segment of the directory.
+
+        Args:
+            directory: Directory of the turn log segments
+        """
+        self.directory = directory
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        # Columns of each segment with ids into self.strings
+        self._segments: Dict[str, Dict[str, np.ndarray]] = {}
+        # Scans of the segments that may still grow
+        self._open_scans: Dict[str, SegmentScan] = {}
+        self.columns: Dict[str, np.ndarray] = _empty_columns()
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Load the turns written since the last refresh.
+
+        The newest segment may still be written to, so it is read again from
+        where the last refresh stopped until a newer segment exists.
+
+        Returns:
+            int: Number of segments read, from the log or the cache
+        """
+        paths = segment_paths(self.directory)
+        loaded = 0
+        for i, path in enumerate(paths):
+            if path in self._segments and path not in self._open_scans:
+                continue
+            sealed = i < len(paths) - 1
+            scan = load_segment(path, sealed, self._open_scans.pop(path, None))
+            if not sealed:
+                self._open_scans[path] = scan
+            self._segments[path] = self._remap(scan)
+            loaded += 1
+        if loaded:
+            self.columns = {
+                name: np.concatenate([self._segments[path][name] for path in paths])
+                for name in COLUMNS
+            }
+        return loaded
+
+    def _remap(self, scan: SegmentScan) -> Dict[str, np.ndarray]:
+        """Map the string columns of a segment to the shared vocabulary."""
+        mapping = np.empty(len(scan.strings), dtype=np.uint32)
+        for i, value in enumerate(scan.strings):
+            string_id = self._string_ids.get(value)
+            if string_id is None:
+                string_id = self._string_ids[value] = len(self.strings)
+                self.strings.append(value)
+            mapping[i] = string_id
+        columns = dict(scan.columns)
+        for name in STRING_COLUMNS:
+            columns[name] = mapping[columns[name]]
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def _id(self, value: str) -> int:
+        """Get the id of a string, -1 if no turn mentions it."""
+        return self._string_ids.get(value, -1)
+
+    def funnel(self, states: Sequence[str]) -> List[Dict]:
+        """Count the engagements reaching each step of a funnel of states.
+
+        Args:
+            states: States in funnel order, e.g. information_collection, success
+
+        Returns:
+            List[Dict]: Per step the state, the engagements that visited it
+                and every earlier step, and the conversion from the first step
+        """
+        before = self.columns["state_before"]
+        after = self.columns["state_after"]
+        engagements = self.columns["engagement"]
+        # Engagement ids index a bitmap, which avoids sorting them
+        reached = np.ones(len(self.strings), dtype=bool)
+        steps = []
+        for state in states:
+            state_id = self._id(state)
+            visited = np.zeros(len(self.strings), dtype=bool)
+            visited[engagements[(before == state_id) | (after == state_id)]] = True
+            reached &= visited
+            steps.append({"state": state, "engagements": int(reached.sum())})
+        first = steps[0]["engagements"] if steps else 0
+        for step in steps:
+            step["conversion"] = step["engagements"] / first if first else 0.0
+        return steps
+
+    def latency_percentiles(
+        self, percentiles: Sequence[float] = LATENCY_PERCENTILES
+    ) -> Dict[str, Dict]:
+        """Get the latency percentiles of the turns handled in each state.
+
+        Returns:
+            Dict[str, Dict]: Per state the turn count and the percentiles of
+                the turn, intent detection and action latencies in seconds
+        """
+        states = self.columns["state_before"]
+        counts = np.bincount(states, minlength=len(self.strings))
+        result = {}
+        for state_id in np.flatnonzero(counts):
+            rows = states == state_id
+            latencies = {"turns": int(counts[state_id])}
+            for name in ("turn_seconds", "intent_seconds", "actions_seconds"):
+                values = np.percentile(self.columns[name][rows], percentiles)
+                latencies[name] = {
+                    f"p{p:g}": round(float(v), 6) for p, v in zip(percentiles, values)
+                }
+            result[self.strings[state_id]] = latencies
+        return result
+
+    def event_distribution(self) -> Dict[str, Dict[str, int]]:
+        """Count the events detected in each state.
+
+        Returns:
+            Dict[str, Dict[str, int]]: Per state the turns per event, most
+                frequent first
+        """
+        width = np.uint64(max(len(self.strings), 1))
+        keys = self.columns["state_before"].astype(np.uint64) * width + self.columns[
+            "event"
+        ].astype(np.uint64)
+        pairs, counts = np.unique(keys, return_counts=True)
+        result: Dict[str, Dict[str, int]] = {}
+        for i in np.argsort(-counts, kind="stable"):
+            state = self.strings[int(pairs[i] // width)]
+            event = self.strings[int(pairs[i] % width)]
+            result.setdefault(state, {})[event] = int(counts[i])
+        return result
+
+    def fallback_rate(self, fallback_event: str = FALLBACK_EVENT) -> Dict:
+        """Get the share of turns that detected the fallback event.
+
+        Returns:
+            Dict: The overall rate and the rate per state
+        """
+        states = self.columns["state_before"]
+        fallback = self.columns["event"] == self._id(fallback_event)
+        state_ids, turns = np.unique(states, return_counts=True)
+        fallbacks = np.bincount(states[fallback], minlength=len(self.strings))
+        return {
+            "overall": float(fallback.mean()) if len(fallback) else 0.0,
+            "per_state": {
+                self.strings[state_id]: float(fallbacks[state_id] / count)
+                for state_id, count in zip(state_ids, turns)
+            },
+        }
+
+    def outcomes(self) -> Dict[str, int]:
+        """Count the turns by outcome."""
+        counts = np.bincount(self.columns["outcome"], minlength=len(OUTCOMES))
+        return {outcome: int(counts[i]) for i, outcome in enumerate(OUTCOMES)}
+
+    def report(self, funnel: Optional[Sequence[str]] = None) -> Dict:
+        """Compute every aggregate.
+
+        Args:
+            funnel: States of the funnel, information_collection to success
+                by default
+
+        Returns:
+            Dict: Turns, engagements, outcomes, funnel, latencies, events and
+                fallback rate
+        """
+        return {
+            "turns": len(self),
+            "engagements": int(
+                np.count_nonzero(
+                    np.bincount(self.columns["engagement"], minlength=len(self.strings))
+                )
+            ),
+            "outcomes": self.outcomes(),
+            "funnel": self.funnel(funnel or ("information_collection", "success")),
+            "latency_percentiles": self.latency_percentiles(),
+            "event_distribution": self.event_distribution(),
+            "fallback_rate": self.fallback_rate(),
+        }
@@ -0,0 +1,564 @@
+"""Append-only binary log of engagement turns.
+
+The log is a directory of segment files. Each segment starts with a magic
+header followed by records framed as::
+
+    u32 payload length | u32 CRC32 of the payload | payload
+
+The first payload byte is the record type. Strings that repeat across turns
+(engagement ids, state, event and action names, template paths) are written
+once per segment in DICT records and referenced by id, so segments can be read
+on their own. Records are written by the calling thread and made durable by a
+background thread that fsyncs every commit interval, letting concurrent turns
+share one fsync (group commit). A segment is closed and a new one started
+once it grows past the segment size.
+
+Segments are read through mmap. A torn or corrupted record at the end of a
+segment, as left by a crash, ends that segment.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from utils.logging import logging
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TURNLOG1"
+SEGMENT_SUFFIX = ".tlog"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+RECORD_DICT = 1
+RECORD_CREATE = 2
+RECORD_TURN = 3
+RECORD_DELETE = 4
+
+OUTCOMES = ("ok", "shed", "error")
+
+_FRAME = struct.Struct("<II")
+_DICT = struct.Struct("<BI")
+_CREATE = struct.Struct("<BIIIId")
+_DELETE = struct.Struct("<BId")
+# Fixed part of TURN records: type, engagement, state before, state after,
+# event, timestamp, turn, intent and action seconds, outcome and number of
+# actions, followed by the action ids and the query, reply and slots blobs
+TURN_HEADER = struct.Struct("<BIIIIdfffBH")
+_BLOB = struct.Struct("<I")
+
+TURN_LOG_BYTES = metrics.counter("turn_log_bytes", "Bytes appended to the turn log")
+TURN_LOG_FSYNC_SECONDS = metrics.histogram(
+    "turn_log_fsync_seconds", "Latency of turn log group commits"
+)
+
+
+class CreateRecord(NamedTuple):
+    """An engagement created from its agent, role and target templates."""
+
+    engagement_id: str
+    agent_template: str
+    role_template: str
+    target_template: str
+    timestamp: float
+
+
+class DeleteRecord(NamedTuple):
+    """An engagement deleted from its engagement service."""
+
+    engagement_id: str
+    timestamp: float
+
+
+class TurnRecord(NamedTuple):
+    """One turn of an engagement."""
+
+    engagement_id: str
+    state_before: str
+    state_after: str
+    event: str
+    actions: List[str]
+    timestamp: float
+    turn_seconds: float
+    intent_seconds: float
+    actions_seconds: float
+    outcome: str
+    query: str
+    reply: str
+    # Filled slots of the target after the turn
+    slots: Dict[str, Any]
+
+
+Record = Union[CreateRecord, DeleteRecord, TurnRecord]
+
+
+def segment_paths(directory: str) -> List[str]:
+    """Get the segment files of a turn log directory in write order."""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith(SEGMENT_SUFFIX)
+    ]
+
+
+class TurnLog:  # pylint:disable=too-many-instance-attributes
+    """Writer appending records to the segments of a turn log directory."""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        commit_interval: float = 0.002,
+        durable: bool = True,
+        commit_timeout: float = 5.0,
+    ):
+        """Open a new segment in the directory and start the commit thread.
+
+        Segments of earlier processes are never appended to.
+
+        Args:
+            directory: Directory of the segments, created if missing
+            segment_bytes: Size after which a new segment is started
+            commit_interval: Seconds between group commits
+            durable: Whether appends wait for the commit covering them
+            commit_timeout: Seconds an append waits for its commit
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.durable = durable
+        self.commit_timeout = commit_timeout
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._appended_seq = 0
+        self._committed_seq = 0
+        self._closed = False
+        # Failure that stopped the log, raised to every later append
+        self._error: Optional[OSError] = None
+        existing = segment_paths(directory)
+        self._segment_index = (
+            int(os.path.basename(existing[-1])[: -len(SEGMENT_SUFFIX)]) + 1
+            if existing
+            else 0
+        )
+        self._file = None
+        self._size = 0
+        self._ids: Dict[str, int] = {}
+        self._open_segment()
+        self._committer = threading.Thread(
+            target=self._commit_loop, name="turn-log-commit", daemon=True
+        )
+        self._committer.start()
+
+    @property
+    def segment_path(self) -> str:
+        """Path of the segment being written."""
+        return os.path.join(
+            self.directory, f"{self._segment_index:08d}{SEGMENT_SUFFIX}"
+        )
+
+    def append_create(
+        self,
+        engagement_ids: List[str],
+        agent_template: str,
+        role_template: str,
+        target_template: str,
+    ) -> None:
+        """Append the creation of engagements from the same templates."""
+        timestamp = time.time()
+
+        def encode(intern: Callable[[str], int]) -> List[bytes]:
+            templates = (
+                intern(agent_template),
+                intern(role_template),
+                intern(target_template),
+            )
+            return [
+                _CREATE.pack(
+                    RECORD_CREATE, intern(engagement_id), *templates, timestamp
+                )
+                for engagement_id in engagement_ids
+            ]
+
+        self._append(encode)
+
+    def append_delete(self, engagement_id: str) -> None:
+        """Append the deletion of an engagement."""
+        timestamp = time.time()
+        self._append(
+            lambda intern: [
+                _DELETE.pack(RECORD_DELETE, intern(engagement_id), timestamp)
+            ]
+        )
+
+    def append_turn(self, turn: TurnRecord) -> None:
+        """Append a turn.
+
+        Raises:
+            ValueError: If the outcome is not one of OUTCOMES
+        """
+        outcome = OUTCOMES.index(turn.outcome)
+        blobs = b"".join(
+            _BLOB.pack(len(data)) + data
+            for data in (
+                turn.query.encode("utf-8"),
+                turn.reply.encode("utf-8"),
+                json.dumps(turn.slots, default=str).encode("utf-8"),
+            )
+        )
+
+        def encode(intern: Callable[[str], int]) -> List[bytes]:
+            header = TURN_HEADER.pack(
+                RECORD_TURN,
+                intern(turn.engagement_id),
+                intern(turn.state_before),
+                intern(turn.state_after),
+                intern(turn.event),
+                turn.timestamp,
+                turn.turn_seconds,
+                turn.intent_seconds,
+                turn.actions_seconds,
+                outcome,
+                len(turn.actions),
+            )
+            actions = struct.pack(
+                f"<{len(turn.actions)}I", *(intern(name) for name in turn.actions)
+            )
+            return [header + actions + blobs]
+
+        self._append(encode)
+
+    def _append(self, encode: Callable[[Callable[[str], int]], List[bytes]]) -> None:
+        """Frame and write the payloads of encode, then wait for their commit.
+
+        Args:
+            encode: Builds the payloads, interning strings with the function
+                it is passed, which writes the DICT records they need first
+
+        Raises:
+            OSError: If writing or committing the log failed
+            TimeoutError: If the commit does not happen within commit_timeout
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("The turn log is closed")
+            self._raise_error()
+            frames = bytearray()
+
+            def intern(value: str) -> int:
+                string_id = self._ids.get(value)
+                if string_id is None:
+                    string_id = self._ids[value] = len(self._ids)
+                    _frame(
+                        frames,
+                        _DICT.pack(RECORD_DICT, string_id) + value.encode("utf-8"),
+                    )
+                return string_id
+
+            known = len(self._ids)
+            try:
+                for payload in encode(intern):
+                    _frame(frames, payload)
+            except Exception:
+                # Forget the strings whose DICT records are not written
+                for value in list(self._ids)[known:]:
+                    del self._ids[value]
+                raise
+            try:
+                self._file.write(frames)
+                self._size += len(frames)
+                self._appended_seq += 1
+                seq = self._appended_seq
+                TURN_LOG_BYTES.inc(len(frames))
+                if self._size >= self.segment_bytes:
+                    self._rotate()
+            except OSError as e:
+                self._fail(e)
+                raise
+            if self.durable:
+                committed = self._committed.wait_for(
+                    lambda: self._committed_seq >= seq or self._error is not None,
+                    timeout=self.commit_timeout,
+                )
+                if self._committed_seq < seq:
+                    self._raise_error()
+                    if not committed:
+                        raise TimeoutError(
+                            f"Turn log commit took over {self.commit_timeout}s"
+                        )
+
+    def _fail(self, error: OSError) -> None:
+        """Stop the log after a write failure and wake the appends waiting."""
+        logger.error("Turn log failed, no more records are written: %s", error)
+        self._error = error
+        self._committed.notify_all()
+
+    def _raise_error(self) -> None:
+        """Raise the failure that stopped the log, if any."""
+        if self._error is not None:
+            raise OSError(
+                self._error.errno, f"Turn log failed: {self._error}"
+            ) from self._error
+
+    def _open_segment(self) -> None:
+        self._file = open(self.segment_path, "xb")  # pylint:disable=consider-using-with
+        self._file.write(MAGIC)
+        self._size = len(MAGIC)
+        self._ids = {}
+
+    def _rotate(self) -> None:
+        """Seal the current segment and start the next one, holding the lock."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._committed_seq = self._appended_seq
+        self._committed.notify_all()
+        self._segment_index += 1
+        self._open_segment()
+        logger.info("Started turn log segment %s", self.segment_path)
+
+    def _commit_loop(self) -> None:
+        while True:
+            with self._lock:
+                self._committed.wait(self.commit_interval)
+                if self._closed:
+                    return
+                if self._committed_seq >= self._appended_seq:
+                    continue
+                if self._error is not None:
+                    return
+                seq = self._appended_seq
+                try:
+                    self._file.flush()
+                    # Rotation may close the file while the fsync runs
+                    fd = os.dup(self._file.fileno())
+                except OSError as e:
+                    self._fail(e)
+                    return
+            try:
+                with TURN_LOG_FSYNC_SECONDS.time():
+                    os.fsync(fd)
+            except OSError as e:
+                with self._lock:
+                    self._fail(e)
+                return
+            finally:
+                os.close(fd)
+            with self._lock:
+                self._committed_seq = max(self._committed_seq, seq)
+                self._committed.notify_all()
+
+    def close(self) -> None:
+        """Commit the appended records and close the segment."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                # Records appended after a failure are not committed
+                if self._error is None:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._committed_seq = self._appended_seq
+            finally:
+                self._file.close()
+                self._committed.notify_all()
+        self._committer.join()
+
+
+def _frame(buffer: bytearray, payload: bytes) -> None:
+    buffer += _FRAME.pack(len(payload), zlib.crc32(payload))
+    buffer += payload
+
+
+@contextmanager
+def map_segment(path: str) -> Iterator[Optional[memoryview]]:
+    """Map a segment into memory.
+
+    Args:
+        path: Path of the segment file
+
+    Yields:
+        Optional[memoryview]: View of the segment, None if it is empty
+
+    Raises:
+        ValueError: If the file is not a turn log segment
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < len(MAGIC):
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a turn log segment")
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def iter_frames(
+    view: memoryview, path: str, offset: int = len(MAGIC)
+) -> Iterator[Tuple[int, int, int]]:
+    """Walk the records of a mapped segment, stopping at an incomplete record.
+
+    The segment being written, or one left by a crash, may end with a record
+    that is only partly written.
+
+    Args:
+        view: View of the segment
+        path: Path of the segment, for messages
+        offset: Offset of the first record to read, after the magic header
+            by default
+
+    Yields:
+        Tuple[int, int, int]: Record type, start and end offset of each payload
+    """
+    size = len(view)
+    unpack_frame = _FRAME.unpack_from
+    frame_size = _FRAME.size
+    crc32 = zlib.crc32
+    while offset + frame_size <= size:
+        length, crc = unpack_frame(view, offset)
+        start = offset + frame_size
+        end = start + length
+        if end > size or crc32(view[start:end]) != crc:
+            logger.info(
+                "Turn log %s ends with an incomplete record at %d", path, offset
+            )
+            return
+        yield view[start], start, end
+        offset = end
+
+
+def decode_string(view: memoryview, start: int, end: int, strings: List[str]) -> None:
+    """Add the string of a DICT record to the strings of its segment.
+
+    Raises:
+        ValueError: If the record does not define the next string id
+    """
+    _, string_id = _DICT.unpack_from(view, start)
+    if string_id != len(strings):
+        raise ValueError(f"Turn log skips string {len(strings)}")
+    strings.append(str(view[start + _DICT.size : end], "utf-8"))
+
+
+def read_segment(path: str) -> Iterator[Record]:
+    """Read the records of a segment through mmap.
+
+    Args:
+        path: Path of the segment file
+
+    Yields:
+        Record: Create, delete and turn records in write order
+    """
+    with map_segment(path) as view:
+        if view is not None:
+            yield from _read_records(view, path)
+
+
+def _read_records(view: memoryview, path: str) -> Iterator[Record]:
+    strings: List[str] = []
+    for record_type, start, end in iter_frames(view, path):
+        if record_type == RECORD_DICT:
+            decode_string(view, start, end, strings)
+        elif record_type == RECORD_CREATE:
+            _, engagement, agent, role, target, timestamp = _CREATE.unpack_from(
+                view, start
+            )
+            yield CreateRecord(
+                strings[engagement],
+                strings[agent],
+                strings[role],
+                strings[target],
+                timestamp,
+            )
+        elif record_type == RECORD_DELETE:
+            _, engagement, timestamp = _DELETE.unpack_from(view, start)
+            yield DeleteRecord(strings[engagement], timestamp)
+        elif record_type == RECORD_TURN:
+            yield _decode_turn(view, start, strings)
+        else:
+            raise ValueError(f"Unknown record type {record_type} in {path}")
+
+
+def _decode_turn(  # pylint:disable=too-many-locals
+    view: memoryview, start: int, strings: List[str]
+) -> TurnRecord:
+    (
+        _,
+        engagement,
+        before,
+        after,
+        event,
+        timestamp,
+        turn_seconds,
+        intent_seconds,
+        actions_seconds,
+        outcome,
+        n_actions,
+    ) = TURN_HEADER.unpack_from(view, start)
+    offset = start + TURN_HEADER.size
+    actions = struct.unpack_from(f"<{n_actions}I", view, offset)
+    offset += 4 * n_actions
+    blobs = []
+    for _ in range(3):
+        (length,) = _BLOB.unpack_from(view, offset)
+        offset += _BLOB.size
+        blobs.append(str(view[offset : offset + length], "utf-8"))
+        offset += length
+    return TurnRecord(
+        engagement_id=strings[engagement],
+        state_before=strings[before],
+        state_after=strings[after],
+        event=strings[event],
+        actions=[strings[action] for action in actions],
+        timestamp=timestamp,
+        turn_seconds=turn_seconds,
+        intent_seconds=intent_seconds,
+        actions_seconds=actions_seconds,
+        outcome=OUTCOMES[outcome],
+        query=blobs[0],
+        reply=blobs[1],
+        slots=json.loads(blobs[2]),
+    )
+
+
+def read_turn_log(directory: str) -> Iterator[Record]:
+    """Read the records of every segment of a turn log directory in write order.
+
+    Args:
+        directory: Directory of the segments
+
+    Yields:
+        Record: Create, delete and turn records
+    """
+    for path in segment_paths(directory):
+        yield from read_segment(path)
+
+
+def open_turn_log(directory: Optional[str]) -> Optional[TurnLog]:
+    """Open a turn log in the directory, if one is given."""
+    if not directory:
+        return None
+    logger.info("Writing turns to %s", directory)
+    return TurnLog(directory)
@@ -1,18 +1,50 @@
 """Service for managing user engagement sessions with agents and targets."""
+import os
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from core.entity.agent import Agent
+from core.entity.role import Role
 from core.entity.target import Target
 from core.entity.unified_context import UnifiedContext
+from service import service_center
+from service.prompt_service import PromptService
+from service.template_store import TemplateStore, TemplateVersion
+from service.turn_log import CreateRecord, DeleteRecord, TurnRecord, read_turn_log
+from utils.logging import logging
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENTS_ACTIVE = metrics.gauge(
+    "engagements_active", "Engagements held by engagement services"
+)
+ENGAGEMENTS_CREATED = metrics.counter(
+    "engagements_created", "Engagements created", ["role"]
+)
 
 
 class UserEngagementService:
     """Service for managing user engagement sessions."""
 
-    def __init__(self):
-        """Initialize the engagement service with empty storage."""
+    def __init__(
+        self,
+        template_store: Optional[TemplateStore] = None,
+        prompt_service: Optional[PromptService] = None,
+    ):
+        """Initialize the engagement service with empty storage.
+
+        Args:
+            template_store: Store serving template versions, defaults to the
+                service center's store
+            prompt_service: Service serving prompt snapshots, defaults to the
+                service center's prompt service
+        """
         self._engagements: Dict[str, UnifiedContext] = {}
+        # Template path -> version the role was built from and the bound role
+        self._roles: Dict[str, Tuple[TemplateVersion, Role]] = {}
+        self._template_store = template_store or service_center.template_store
+        self._prompt_service = prompt_service or service_center.prompt_service
 
     def create_engagement(
         self,
@@ -22,6 +54,9 @@ class UserEngagementService:
     ) -> str:
         """Create a new engagement session.
 
+        The engagement is pinned to the current version of every template and
+        prompt, so later reloads only affect engagements created after them.
+
         Args:
             agent_template_path: Path to agent template file
             role_template_path: Path to role template file
@@ -30,35 +65,199 @@ class UserEngagementService:
         Returns:
             str: Unique engagement ID
         """
-        # Generate unique ID
-        engagement_id = str(uuid.uuid4())
+        return self.create_engagements(
+            1, agent_template_path, role_template_path, target_template_path
+        )[0]
 
-        # Create agent and target with engagement ID
-        agent = Agent.from_template(
-            agent_template_path=agent_template_path,
-            role_template_path=role_template_path,
-        )
-        agent.engagement_id = engagement_id
+    def create_engagements(
+        self,
+        n: int,
+        agent_template_path: str,
+        role_template_path: str,
+        target_template_path: str,
+    ) -> List[str]:
+        """Create a batch of engagement sessions from the same templates.
+
+        Templates and prompts are resolved once for the whole batch and every
+        engagement plays the same bound role, so only the agent, target and
+        context of each engagement are allocated. The batch is added to the
+        store, and to the turn log if one is enabled, at once.
 
-        target = Target.from_template(
-            target_template_path=target_template_path, engagement_id=engagement_id
+        Args:
+            n: Number of engagements to create
+            agent_template_path: Path to agent template file
+            role_template_path: Path to role template file
+            target_template_path: Path to target template file
+
+        Returns:
+            List[str]: Unique engagement IDs in creation order
+
+        Raises:
+            ValueError: If n is negative
+        """
+        if n < 0:
+            raise ValueError(f"Cannot create {n} engagements")
+        batch = self._build_engagements(
+            n, agent_template_path, role_template_path, target_template_path
         )
+        engagement_ids = list(batch)
+        if service_center.turn_log is not None and engagement_ids:
+            service_center.turn_log.append_create(
+                engagement_ids,
+                agent_template_path,
+                role_template_path,
+                target_template_path,
+            )
+        self._store(batch)
+        return engagement_ids
+
+    def _build_engagements(  # pylint:disable=too-many-locals
+        self,
+        n: int,
+        agent_template_path: str,
+        role_template_path: str,
+        target_template_path: str,
+        engagement_ids: Optional[List[str]] = None,
+    ) -> Dict[str, UnifiedContext]:
+        """Build the contexts of a batch of engagements without storing them.
 
-        # Initialize empty interaction history
-        interaction_history: List[Dict] = []
+        Args:
+            n: Number of engagements to build
+            agent_template_path: Path to agent template file
+            role_template_path: Path to role template file
+            target_template_path: Path to target template file
+            engagement_ids: IDs of the engagements, random ones by default
+
+        Returns:
+            Dict[str, UnifiedContext]: Contexts by engagement ID in build order
+        """
 
-        # Create unified context
-        context = UnifiedContext.from_config(
-            agent=agent,
-            target=target,
-            interaction_his=interaction_history,
-            engagement_id=engagement_id,
+        # Resolve the current template versions
+        agent_template = self._template_store.get_agent(agent_template_path)
+        role_template = self._template_store.get_role(role_template_path)
+        target_template = self._template_store.get_target(target_template_path)
+        prompt_snapshot = self._prompt_service.snapshot()
+
+        role = self._shared_role(role_template)
+        agent_data = agent_template.data["agent"]
+        target_prototype = Target.from_template_data(target_template.data)
+        slot_definitions = list(target_prototype.slots.get_definitions().values())
+        service_center.intent_detection_service.prepare_role(
+            role, target_prototype.slots.get_definitions()
         )
+        # Shared by the batch and never modified
+        template_versions = {
+            "agent": agent_template.version,
+            "role": role_template.version,
+            "target": target_template.version,
+            "prompts": prompt_snapshot.version,
+        }
+
+        batch: Dict[str, UnifiedContext] = {}
+        if engagement_ids is None:
+            random_bytes = os.urandom(16 * n)
+            engagement_ids = [
+                str(uuid.UUID(bytes=random_bytes[16 * i : 16 * i + 16], version=4))
+                for i in range(n)
+            ]
+        for engagement_id in engagement_ids:
+            target = Target(
+                name=target_prototype.name,
+                description=target_prototype.description,
+                slot_definitions=slot_definitions,
+                engagement_id=engagement_id,
+            )
+            agent = Agent(
+                goal=agent_data["goal"],
+                agent_name=agent_data["name"],
+                description=agent_data["description"],
+                role=role,
+                current_state=None,
+                engagement_id=engagement_id,
+                target=target,
+                prompt_snapshot=prompt_snapshot,
+                speculative=agent_data.get("speculative", False),
+            )
+            # The context shares the agent's interaction history
+            batch[engagement_id] = UnifiedContext(
+                agent,
+                target,
+                agent.interaction_history,
+                engagement_id,
+                template_versions,
+            )
+
+        return batch
+
+    def _store(self, batch: Dict[str, UnifiedContext]) -> None:
+        """Add a batch of engagements to the store at once."""
+        self._engagements.update(batch)
+        ENGAGEMENTS_ACTIVE.inc(len(batch))
+        if batch:
+            role_name = next(iter(batch.values())).agent.role.name
+            ENGAGEMENTS_CREATED.inc(len(batch), role=role_name)
+
+    def recover_from_turn_log(self, directory: str) -> List[str]:
+        """Rebuild the engagements of a turn log, e.g. after a crash.
+
+        Engagements are created from the current version of the templates
+        they were created from, and every successful turn is replayed: the
+        state the agent ended in, the completed states, the slots of the
+        target and the interaction history are restored. Deleted engagements
+        are skipped. Recovered engagements are not appended to the log again.
 
-        # Store context
-        self._engagements[engagement_id] = context
+        Args:
+            directory: Directory of the turn log segments
+
+        Returns:
+            List[str]: IDs of the recovered engagements
+        """
+        creates: Dict[str, CreateRecord] = {}
+        turns: Dict[str, List[TurnRecord]] = {}
+        for record in read_turn_log(directory):
+            if isinstance(record, CreateRecord):
+                creates[record.engagement_id] = record
+                turns[record.engagement_id] = []
+            elif isinstance(record, DeleteRecord):
+                creates.pop(record.engagement_id, None)
+                turns.pop(record.engagement_id, None)
+            elif record.engagement_id in turns and record.outcome == "ok":
+                turns[record.engagement_id].append(record)
 
-        return engagement_id
+        # Engagements created from the same templates are built in one batch
+        groups: Dict[Tuple[str, str, str], List[str]] = {}
+        for engagement_id, create in creates.items():
+            templates = (
+                create.agent_template,
+                create.role_template,
+                create.target_template,
+            )
+            groups.setdefault(templates, []).append(engagement_id)
+        for templates, engagement_ids in groups.items():
+            batch = self._build_engagements(
+                len(engagement_ids), *templates, engagement_ids=engagement_ids
+            )
+            for engagement_id, context in batch.items():
+                for turn in turns[engagement_id]:
+                    _replay_turn(context, turn)
+            self._store(batch)
+        logger.info("Recovered %d engagements from %s", len(creates), directory)
+        return list(creates)
+
+    def _shared_role(self, role_template: TemplateVersion) -> Role:
+        """Get the bound role of a role template version.
+
+        Roles hold no engagement state, so engagements pinned to the same
+        version share one role. Only the latest version of each template is
+        kept here, engagements pinned to older ones keep their role alive.
+        """
+        cached = self._roles.get(role_template.path)
+        if cached is not None and cached[0] is role_template:
+            return cached[1]
+        role = Role.from_template_data(role_template.data)
+        service_center.event_action_registry.bind_role(role)
+        self._roles[role_template.path] = (role_template, role)
+        return role
 
     def get_context(self, engagement_id: str) -> Optional[UnifiedContext]:
         """Get the unified context for an engagement.
@@ -71,6 +270,14 @@ class UserEngagementService:
         """
         return self._engagements.get(engagement_id)
 
+    def engagement_ids(self) -> List[str]:
+        """Get the IDs of the engagements held by the service.
+
+        Returns:
+            List[str]: Engagement IDs in creation order
+        """
+        return list(self._engagements)
+
     def update_interaction_history(self, engagement_id: str, interaction: Dict) -> None:
         """Update the interaction history for an engagement.
 
@@ -89,6 +296,9 @@ class UserEngagementService:
         """
         if engagement_id in self._engagements:
             del self._engagements[engagement_id]
+            ENGAGEMENTS_ACTIVE.dec()
+            if service_center.turn_log is not None:
+                service_center.turn_log.append_delete(engagement_id)
 
     def get_agent_with_engagement_id(self, engagement_id) -> Optional[Agent]:
         """Get the agent associated with an engagement ID.
@@ -102,3 +312,19 @@ class UserEngagementService:
         if context := self._engagements.get(engagement_id):
             return context.agent
         return None
+
+
+def _replay_turn(context: UnifiedContext, turn: TurnRecord) -> None:
+    """Restore the effects of a logged turn on a recovered engagement."""
+    agent = context.agent
+    agent.completed_states.add(turn.state_before)
+    state = agent.role.get_state(turn.state_after)
+    if state is not None:
+        agent.set_state(state)
+    slots = context.target.slots
+    for name in set(slots.filled()) - set(turn.slots):
+        slots.clear(name)
+    for name, value in turn.slots.items():
+        if slots.get_definition(name) is not None:
+            slots.set(name, value)
+    agent.interaction_history.record_turn(turn.query, turn.reply)
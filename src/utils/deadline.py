@@ -0,0 +1,66 @@
+"""Deadlines of agent turns.
+
+A deadline is created by the caller of ``Agent.interact`` and passed along to
+intent detection and the actions of the turn. Steps that cannot finish in the
+remaining budget fall back to cheaper answers and record the degradation on
+the deadline, so the response can tell which ones fired.
+"""
+import time
+from typing import Callable, List, Optional, Union
+
+# Degradations recorded by the engine
+CACHED_INTENT = "cached_intent"
+LOCAL_INTENT = "local_intent"
+FALLBACK_INTENT = "fallback_intent"
+SKIPPED_ACTION = "skipped_action"
+SKIPPED_TRANSITION = "skipped_transition"
+
+
+class Deadline:
+    """Point in time by which a turn should be answered."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        """Start a deadline.
+
+        Args:
+            seconds: Budget of the turn from now
+            clock: Monotonic clock, injectable for tests
+        """
+        self.budget = seconds
+        self._clock = clock
+        self.expires_at = clock() + seconds
+        self.degradations: List[str] = []
+
+    @classmethod
+    def of(cls, deadline: Union["Deadline", float, None]) -> Optional["Deadline"]:
+        """Get a deadline from a deadline or a budget in seconds.
+
+        Args:
+            deadline: A deadline, seconds from now, or None for no deadline
+
+        Returns:
+            Optional[Deadline]: The deadline, None without one
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(float(deadline))
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline, zero once it passed."""
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        """Check if the deadline passed."""
+        return self._clock() >= self.expires_at
+
+    def degrade(self, degradation: str, detail: Optional[str] = None) -> None:
+        """Record that a step was degraded to meet the deadline.
+
+        Args:
+            degradation: Kind of degradation, e.g. LOCAL_INTENT
+            detail: What was degraded, e.g. the name of a skipped action
+        """
+        self.degradations.append(f"{degradation}:{detail}" if detail else degradation)
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.3f})"
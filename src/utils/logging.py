@@ -1,10 +1,337 @@
-"""Logging configuration for the project."""
+"""Logging configuration for the project.
+
+Records are put on a bounded queue by the thread that logs them and written
+by a background listener, so request threads never block on stderr. When the
+queue is full records are dropped and counted instead of slowing callers down.
+Messages are only interpolated on the listener unless their arguments are
+mutable objects that could change in the meantime.
+
+Records carry the engagement_id, state and event bound with
+``bind_log_context``, and are written as text or, with ``LOG_FORMAT=json``, as
+one JSON object per line. Noisy loggers can be sampled and rate limited
+per logger name prefix.
+
+Environment variables read at import:
+    LOG_LEVEL: Root level, INFO by default
+    LOG_FORMAT: text or json
+    LOG_QUEUE_SIZE: Records buffered before dropping, 10000 by default
+    LOG_SAMPLE_RATES: e.g. ``ext=0.1,service.llm_scheduler=0.5``
+    LOG_RATE_LIMITS: Records per second, e.g. ``ext=50``
+"""
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Fields attached to every record, see bind_log_context
+CONTEXT_FIELDS = ("engagement_id", "state", "event")
+_CONTEXT_VARS: Dict[str, contextvars.ContextVar] = {
+    name: contextvars.ContextVar(f"log_{name}", default=None) for name in CONTEXT_FIELDS
+}
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# Attributes of every LogRecord, anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    *CONTEXT_FIELDS,
+}
+# Arguments that cannot change before the listener interpolates the message
+_IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+def bind_log_context(**fields) -> Dict[str, contextvars.Token]:
+    """Attach fields to the records logged from the current context.
+
+    Args:
+        **fields: Values of engagement_id, state or event
+
+    Returns:
+        Dict[str, contextvars.Token]: Tokens to pass to reset_log_context
+
+    Raises:
+        KeyError: If a field is not one of CONTEXT_FIELDS
+    """
+    return {name: _CONTEXT_VARS[name].set(value) for name, value in fields.items()}
+
+
+def reset_log_context(tokens: Dict[str, contextvars.Token]) -> None:
+    """Restore the fields bound before bind_log_context returned the tokens."""
+    for name, token in tokens.items():
+        _CONTEXT_VARS[name].reset(token)
+
+
+class ContextFilter(logging.Filter):  # pylint:disable=too-few-public-methods
+    """Copy the bound context fields onto records on the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT_VARS.items():
+            if not hasattr(record, name):
+                setattr(record, name, var.get())
+        return True
+
+
+def _prefix_match(name: str, prefixes: Dict[str, float]) -> Optional[float]:
+    """Get the value of the longest logger name prefix matching a logger."""
+    best = None
+    for prefix in prefixes:
+        if name == prefix or name.startswith(prefix + "."):
+            if best is None or len(prefix) > len(best):
+                best = prefix
+    return prefixes[best] if best is not None else None
+
+
+class SamplingFilter(logging.Filter):  # pylint:disable=too-few-public-methods
+    """Keep a fraction of the records below WARNING of some loggers."""
+
+    def __init__(self, rates: Dict[str, float], rng: Optional[random.Random] = None):
+        """Initialize the filter.
+
+        Args:
+            rates: Fraction of records kept per logger name prefix
+            rng: Random source, injectable for tests
+        """
+        super().__init__()
+        self.rates = rates
+        self._rng = rng or random.Random()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = _prefix_match(record.name, self.rates)
+        return rate is None or self._rng.random() < rate
+
+
+class RateLimitFilter(logging.Filter):  # pylint:disable=too-few-public-methods
+    """Limit the records per second of some loggers with token buckets.
+
+    Errors are never limited. The number of records suppressed since the last
+    one written is attached to the next record as its suppressed field.
+    """
+
+    def __init__(self, limits: Dict[str, float], clock=time.monotonic):
+        """Initialize the filter.
+
+        Args:
+            limits: Records per second allowed per logger name prefix, which is
+                also the burst size
+            clock: Monotonic clock, injectable for tests
+        """
+        super().__init__()
+        self.limits = limits
+        self._clock = clock
+        # logger name -> [tokens, last refill, suppressed records]
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        limit = _prefix_match(record.name, self.limits)
+        if limit is None:
+            return True
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.setdefault(record.name, [limit, now, 0])
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = int(suppressed)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking on a full queue."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Defer formatting to the listener where it is safe to.
+
+        Tracebacks are rendered here since they reference frames of this
+        thread, and messages with mutable arguments are interpolated now.
+        """
+        # Other handlers of the logger still get the original record
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        args = record.args
+        if args and not (
+            isinstance(args, tuple)
+            and all(isinstance(arg, _IMMUTABLE_TYPES) for arg in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class LogPipeline:
+    """Queue handler on the root logger and the listener writing its records."""
+
+    def __init__(self, handler: DroppingQueueHandler, outputs: List[logging.Handler]):
+        """Initialize the pipeline, the listener is started by start.
+
+        Args:
+            handler: Handler installed on the root logger
+            outputs: Handlers the listener writes the records to
+        """
+        self.handler = handler
+        self.outputs = outputs
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self) -> None:
+        """Start the background listener."""
+        self.listener = logging.handlers.QueueListener(
+            self.handler.queue, *self.outputs, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self) -> None:
+        """Give a forked child its own queue, as the listener thread is not forked."""
+        self.handler.queue = queue.Queue(maxsize=self.handler.queue.maxsize)
+        self.listener = None
+        self.start()
+
+    @property
+    def dropped(self) -> int:
+        """Number of records dropped because the queue was full."""
+        return self.handler.dropped
+
+
+_pipeline: Optional[LogPipeline] = None  # pylint:disable=invalid-name
+
+
+def _parse_mapping(value: Optional[str]) -> Dict[str, float]:
+    """Parse ``name=number`` pairs separated by commas."""
+    mapping = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            mapping[name.strip()] = float(number)
+    return mapping
+
+
+def configure_logging(  # pylint:disable=too-many-arguments
+    level: str = "INFO",
+    json_format: bool = False,
+    queue_size: int = 10000,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limits: Optional[Dict[str, float]] = None,
+    stream=None,
+) -> LogPipeline:
+    """Route the root logger through a queue to a background writer.
+
+    Replaces the pipeline of a previous call.
+
+    Args:
+        level: Level of the root logger
+        json_format: Write JSON lines instead of text
+        queue_size: Records buffered before new ones are dropped
+        sample_rates: Fraction of records below WARNING kept per logger prefix
+        rate_limits: Records per second allowed per logger prefix
+        stream: Stream written to, stderr by default
+
+    Returns:
+        LogPipeline: The running pipeline
+    """
+    global _pipeline  # pylint:disable=global-statement
+    root = logging.getLogger()
+    if _pipeline is not None:
+        root.removeHandler(_pipeline.handler)
+        _pipeline.stop()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(ContextFilter())
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+    if rate_limits:
+        handler.addFilter(RateLimitFilter(rate_limits))
+
+    root.setLevel(level)
+    root.addHandler(handler)
+    _pipeline = LogPipeline(handler, [output])
+    _pipeline.start()
+    return _pipeline
+
+
+def shutdown_logging() -> None:
+    """Write the queued records and stop the background writer."""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def _restart_after_fork() -> None:
+    if _pipeline is not None and _pipeline.listener is not None:
+        _pipeline.restart_after_fork()
+
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-    ],
+configure_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    json_format=os.environ.get("LOG_FORMAT", "text").lower() == "json",
+    queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000")),
+    sample_rates=_parse_mapping(os.environ.get("LOG_SAMPLE_RATES")),
+    rate_limits=_parse_mapping(os.environ.get("LOG_RATE_LIMITS")),
 )
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,439 @@
+"""In-process metrics with a Prometheus text exposition.
+
+Counters and histograms are updated on per-thread shards, so recording a
+sample takes no lock; gauges take a lock as they are set rather than added
+to. The registry renders every metric in the Prometheus text format, which
+can be scraped from a small HTTP server or dumped to a file.
+
+Metrics are usually declared at module level on the default registry:
+
+    TURNS = metrics.counter("agent_turns", "Turns handled", ["outcome"])
+    TURNS.inc(outcome="ok")
+"""
+import abc
+import bisect
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils.logging import logging
+from utils.thread_shards import ThreadShards
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[str, ...]
+# Suffix of the sample name, labels and value
+Sample = Tuple[str, Dict[str, str], float]
+# Returns the content type and body of an HTTP route
+RouteHandler = Callable[[], Tuple[str, str]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class Metric(abc.ABC):  # pylint:disable=too-few-public-methods
+    """Base class of metrics with optional labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize the metric.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels every sample must be given
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        """Get the label values in labelnames order.
+
+        Raises:
+            ValueError: If the labels do not match the label names
+        """
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as e:
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            ) from e
+
+    def _labels(self, key: LabelKey) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abc.abstractmethod
+    def samples(self) -> List[Sample]:
+        """Get the current samples of the metric."""
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards: ThreadShards[Dict[LabelKey, float]] = ThreadShards(dict)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increase the counter.
+
+        Args:
+            amount: Non negative increment
+            **labels: Value of every label
+
+        Raises:
+            ValueError: If the amount is negative or the labels do not match
+        """
+        if amount < 0:
+            raise ValueError(f"Counter {self.name} cannot decrease")
+        key = self._key(labels)
+        shard = self._shards.local()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Get the total of the counter for the given labels."""
+        key = self._key(labels)
+        return sum(shard.get(key, 0.0) for shard in self._shards.shards())
+
+    def samples(self) -> List[Sample]:
+        totals: Dict[LabelKey, float] = {}
+        for shard in self._shards.shards():
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0.0) + value
+        return [("_total", self._labels(key), value) for key, value in totals.items()]
+
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read from a function when collected."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increase the gauge, decrease it with a negative amount."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value of an unlabelled gauge from a function when collected."""
+        if self.labelnames:
+            raise ValueError(f"Gauge {self.name} has labels")
+        self._function = function
+
+    def value(self, **labels) -> float:
+        """Get the current value for the given labels."""
+        if self._function is not None:
+            return float(self._function())
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def samples(self) -> List[Sample]:
+        if self._function is not None:
+            return [("", {}, float(self._function()))]
+        with self._lock:
+            values = dict(self._values)
+        return [("", self._labels(key), value) for key, value in values.items()]
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Initialize the histogram.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels every observation must be given
+            buckets: Increasing upper bounds, +Inf is added implicitly
+        """
+        super().__init__(name, documentation, labelnames)
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError(f"Buckets of {name} must be non empty and increasing")
+        self.buckets = tuple(b for b in buckets if not math.isinf(b))
+        # label key -> count per bucket, the last one above every bound, then the sum
+        self._shards: ThreadShards[Dict[LabelKey, List[float]]] = ThreadShards(dict)
+
+    def observe(self, value: float, **labels) -> None:
+        """Record an observation."""
+        key = self._key(labels)
+        shard = self._shards.local()
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0.0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the seconds spent in the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _merged(self) -> Dict[LabelKey, List[float]]:
+        merged: Dict[LabelKey, List[float]] = {}
+        for shard in self._shards.shards():
+            for key, counts in shard.copy().items():
+                totals = merged.setdefault(key, [0.0] * len(counts))
+                for index, value in enumerate(list(counts)):
+                    totals[index] += value
+        return merged
+
+    def count(self, **labels) -> int:
+        """Get the number of observations for the given labels."""
+        counts = self._merged().get(self._key(labels))
+        return int(sum(counts[:-1])) if counts else 0
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, counts in self._merged().items():
+            labels = self._labels(key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(
+                    ("_bucket", {**labels, "le": _format_value(bound)}, cumulative)
+                )
+            samples.append(("_sum", labels, counts[-1]))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        """Initialize an empty registry serving /metrics once started."""
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._routes: Dict[str, RouteHandler] = {
+            "/metrics": lambda: (CONTENT_TYPE, self.exposition())
+        }
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.type_name}")
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """Get or create a gauge."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def get(self, name: str) -> Optional[Metric]:
+        """Get a registered metric by name."""
+        return self._metrics.get(name)
+
+    def exposition(self) -> str:
+        """Render every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition, ending with a newline
+        """
+        with self._lock:
+            registered = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for suffix, labels, value in metric.samples():
+                lines.append(
+                    f"{metric.name}{suffix}{_format_labels(labels)} "
+                    f"{_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_text(self, path: str) -> None:
+        """Dump the exposition to a file, replacing it atomically.
+
+        Args:
+            path: Destination file, e.g. for the node exporter textfile collector
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8"
+        ) as f:
+            f.write(self.exposition())
+        os.replace(f.name, path)
+
+    def start_file_dump(self, path: str, interval: float = 15.0) -> threading.Thread:
+        """Dump the exposition to a file periodically on a daemon thread.
+
+        Args:
+            path: Destination file
+            interval: Seconds between dumps
+
+        Returns:
+            threading.Thread: The started thread
+        """
+
+        def dump():
+            while True:
+                try:
+                    self.write_text(path)
+                except OSError as e:
+                    logger.warning("Failed to dump metrics to %s: %s", path, str(e))
+                time.sleep(interval)
+
+        thread = threading.Thread(target=dump, name="metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+    def register_route(self, path: str, handler: RouteHandler) -> None:
+        """Serve another page from the metrics HTTP server.
+
+        Args:
+            path: URL path, e.g. /admin/memory
+            handler: Returns the content type and body of the page
+        """
+        self._routes[path] = handler
+
+    def start_http_server(
+        self, port: int, host: str = "127.0.0.1"
+    ) -> ThreadingHTTPServer:
+        """Serve the registered routes on a daemon thread.
+
+        Args:
+            port: Port to listen on, 0 picks a free one
+            host: Interface to bind, local only by default
+
+        Returns:
+            ThreadingHTTPServer: The running server, started only once
+        """
+        if self._server is not None:
+            return self._server
+        routes = self._routes
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve the routes of the registry."""
+
+            def do_GET(self):  # pylint:disable=invalid-name
+                """Render the route of the request path."""
+                handler = routes.get(self.path.split("?", 1)[0])
+                if handler is None:
+                    self.send_error(404)
+                    return
+                content_type, body = handler()
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):  # pylint:disable=redefined-builtin
+                logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+        logger.info("Serving metrics on %s:%d", host, self._server.server_port)
+        return self._server
+
+    def stop_http_server(self) -> None:
+        """Stop the HTTP server if it runs."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Default registry the services declare their metrics on
+metrics = MetricsRegistry()
@@ -1,8 +1,68 @@
 """Response type for event-action detection."""
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional, Sequence, Tuple, Type, Union
+
+from pydantic import BaseModel, Field, create_model
 
 
 class EventActions(BaseModel):
     """Model for event-action detection response."""
 
     name: str
+
+
+# JSON friendly field types of the slot types, see core.entity.slot_store
+SLOT_FIELD_TYPES = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "list": List[Union[int, float, str]],
+}
+
+REPLY_DESCRIPTION = "Reply to send the target after the event is handled"
+
+
+def constrained_event_model(
+    events: Sequence[str],
+    model_name: str = "EventActions",
+    slot_fields: Optional[Sequence[Tuple[str, str, Optional[str]]]] = None,
+    reply: bool = False,
+) -> Type[EventActions]:
+    """Create a response model whose name can only be one of the given events.
+
+    The name becomes an enum in the JSON schema sent to the LLM, so strict
+    decoding cannot produce an event the state does not handle. Slot fields
+    are optional and let the same call extract slot values from the query,
+    and the optional reply field lets it draft the reply to the target.
+
+    Args:
+        events: Event names the response may name, in prompt order
+        model_name: Name of the generated model class
+        slot_fields: Name, slot type and description of each slot to extract
+        reply: Whether to add the reply field
+
+    Returns:
+        Type[EventActions]: Subclass of EventActions validating the name
+
+    Raises:
+        ValueError: If no event is given, a slot type is unknown or a slot
+            is named like a field of the model
+    """
+    if not events:
+        raise ValueError("A constrained event model needs at least one event")
+    fields: Dict[str, tuple] = {"name": (Literal[tuple(events)], ...)}
+    if reply:
+        fields["reply"] = (
+            Optional[str],
+            Field(default=None, description=REPLY_DESCRIPTION),
+        )
+    for slot_name, slot_type, description in slot_fields or ():
+        if slot_name in fields:
+            raise ValueError(f"Slot {slot_name} clashes with a response field")
+        if slot_type not in SLOT_FIELD_TYPES:
+            raise ValueError(f"Unsupported slot type '{slot_type}' for {slot_name}")
+        fields[slot_name] = (
+            Optional[SLOT_FIELD_TYPES[slot_type]],
+            Field(default=None, description=description),
+        )
+    return create_model(model_name, __base__=EventActions, **fields)
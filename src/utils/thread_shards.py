@@ -0,0 +1,47 @@
+"""Per-thread shards for cheap concurrent counters.
+
+Each thread updates only its own shard, so the hot path takes no lock; the
+lock is only taken when a thread creates its shard. Readers combine all the
+shards, copying each one, which is atomic for built-in containers under the
+GIL.
+"""
+import threading
+from typing import Callable, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+
+class ThreadShards(Generic[T]):
+    """Collection of one shard per thread."""
+
+    def __init__(self, factory: Callable[[], T]):
+        """Initialize the collection.
+
+        Args:
+            factory: Creates the empty shard of a thread
+        """
+        self._factory = factory
+        self._local = threading.local()
+        self._shards: List[T] = []
+        self._lock = threading.Lock()
+
+    def local(self) -> T:
+        """Get the shard of the calling thread, creating it on first use."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._factory()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def shards(self) -> List[T]:
+        """Get every shard created so far, including those of finished threads."""
+        with self._lock:
+            return list(self._shards)
+
+    def reset(self) -> None:
+        """Drop every shard; threads create new ones on their next update."""
+        with self._lock:
+            self._shards = []
+            self._local = threading.local()
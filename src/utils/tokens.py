@@ -0,0 +1,48 @@
+"""Token estimation helpers for budgeting prompts without a tokenizer dependency."""
+import re
+
+# Rough average for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text.
+
+    Args:
+        text: The text to estimate
+
+    Returns:
+        int: Estimated token count, at least 1 for non-empty text
+    """
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the tail of the text that fits into the given token budget.
+
+    The text is cut at the start of a line, or at the start of a word when not
+    even the last line fits, so the kept part never starts mid-word.
+
+    Args:
+        text: The text to truncate
+        max_tokens: Maximum number of tokens to keep
+
+    Returns:
+        str: The most recent part of the text within the budget, empty if
+            not even its last word fits
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:] if max_chars else ""
+    if text[-max_chars - 1] == "\n":
+        return tail
+    newline = tail.find("\n")
+    if newline != -1:
+        return tail[newline + 1 :]
+    if text[-max_chars - 1].isspace():
+        return tail.lstrip()
+    space = re.search(r"\s+", tail)
+    return tail[space.end() :] if space else ""
@@ -0,0 +1,31 @@
+"""YAML loading helpers preferring the LibYAML based C loader when available."""
+from typing import Any
+
+import yaml
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def safe_load(stream) -> Any:
+    """Parse a YAML document with the fastest available safe loader.
+
+    Args:
+        stream: YAML string or open file
+
+    Returns:
+        The parsed document
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_file(path: str) -> Any:
+    """Parse a YAML file with the fastest available safe loader.
+
+    Args:
+        path: Path to the YAML file
+
+    Returns:
+        The parsed document
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return safe_load(f)
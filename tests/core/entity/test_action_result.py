@@ -0,0 +1,22 @@
+from core.entity.action_result import ActionResult, compose_reply
+
+
+def test_action_messages_without_draft():
+    responses = ["What is your location?", ActionResult(message="Which card?")]
+
+    assert compose_reply(responses) == "What is your location?; Which card?"
+
+
+def test_draft_replaces_action_messages():
+    responses = ["What is your location?"]
+
+    assert compose_reply(responses, draft="Where are you?") == "Where are you?"
+
+
+def test_veto_and_override_of_the_draft():
+    vetoed = [ActionResult(veto_reply=True), "What is your location?"]
+    assert compose_reply(vetoed, draft="Where are you?") == "What is your location?"
+
+    overridden = [ActionResult(reply="Try Luigi's"), ActionResult(reply="Try Mario's")]
+    assert compose_reply(overridden, draft="Where are you?") == "Try Mario's"
+    assert compose_reply(overridden) == "Try Mario's"
@@ -1,9 +1,15 @@
+import time
 from unittest.mock import mock_open, patch
 
 import pytest
 import yaml
 
 from core.entity.state import State, StateStatus
+from core.entity.target import Target
+from service import service_center
+from service.intent_detect_service import HedgePolicy
+from service.llm_service import RecordedInference
+from service.semantic_intent_cache import SemanticIntentCache
 from src.core.entity.agent import Agent
 from src.core.entity.role import Role
 
@@ -175,3 +181,145 @@ def test_init_agent_invalid_state():
             role=invalid_role,
             current_state=invalid_role.get_init_state(),
         )
+
+
+@pytest.fixture
+def recorded_llm():
+    llm = service_center.llm_service
+    yield
+    service_center.use_llm_service(llm)
+
+
+def test_interact_degrades_to_meet_deadline(recorded_llm):
+    """Test a turn out of time skips optional actions and does not transition"""
+    service_center.use_llm_service(RecordedInference(["collect_info"], latency=2.0))
+    agent = Agent.from_template(
+        "./src/config/agent_template/restaurant_guide_agent.yaml",
+        "./src/config/role_template/restaurant_guide_role.yaml",
+    )
+    state = agent.get_current_state()
+    fallback = state.event_actions["default_fallback_event"].actions[0]
+    fallback.optional = True
+
+    response = agent.interact("hi", deadline=0.05)
+
+    assert response.is_success
+    assert response.degradations == [
+        "fallback_intent",
+        f"skipped_action:{fallback.name}",
+        "skipped_transition",
+    ]
+    assert agent.get_current_state() is state
+
+
+def test_slow_provider_does_not_outlast_the_deadline(recorded_llm):
+    """Test a provider slower than the budget ends the turn within the budget"""
+    service_center.use_llm_service(RecordedInference(["collect_info"], latency=2.0))
+    agent = Agent.from_template(
+        "./src/config/agent_template/restaurant_guide_agent.yaml",
+        "./src/config/role_template/restaurant_guide_role.yaml",
+    )
+
+    started = time.perf_counter()
+    response = agent.interact("hi", deadline=0.5)
+
+    assert time.perf_counter() - started < 0.7
+    assert response.degradations[0] == "fallback_intent"
+
+
+def test_speculative_responses_respect_skipped_actions(recorded_llm):
+    """Test a speculated optional action is dropped when the deadline skips it"""
+    # Detection leaves less than OPTIONAL_ACTION_MIN_SECONDS of the budget
+    service_center.use_llm_service(
+        RecordedInference(["make_recommendation"], latency=0.55)
+    )
+    agent = Agent.from_template(
+        "./src/config/agent_template/restaurant_guide_agent.yaml",
+        "./src/config/role_template/restaurant_guide_role.yaml",
+    )
+    agent.speculative = True
+    agent.transition_to("restaurant_recommendation")
+    state = agent.get_current_state()
+    action = state.event_actions["make_recommendation"].actions[0]
+    action.optional = True
+
+    response = agent.interact("recommend one", deadline=0.6)
+
+    assert response.is_success
+    assert f"skipped_action:{action.name}" in response.degradations
+    assert "True" not in response.message
+
+
+class SlotFillingLLM:
+    """LLM stand-in detecting collect_info with a rating range and a reply"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def completion_with_object(self, prompt, response_format, **_kwargs):
+        self.calls += 1
+        fields = {"rating_range": [4.0, 5.0], "reply": "Where are you?"}
+        properties = response_format.model_json_schema()["properties"]
+        return response_format(
+            name="collect_info",
+            **{name: value for name, value in fields.items() if name in properties},
+        )
+
+
+@pytest.fixture
+def intent_shortcuts(recorded_llm):
+    """Enable hedged detection and a semantic cache that is never audited"""
+    intent_detection = service_center.intent_detection_service
+    saved = intent_detection.hedge_policy, intent_detection.semantic_cache
+    intent_detection.hedge_policy = HedgePolicy()
+    intent_detection.semantic_cache = SemanticIntentCache(audit_rate=0.0)
+    yield intent_detection.semantic_cache
+    intent_detection.hedge_policy, intent_detection.semantic_cache = saved
+
+
+def _collecting_agent():
+    agent = Agent.from_template(
+        "./src/config/agent_template/restaurant_guide_agent.yaml",
+        "./src/config/role_template/restaurant_guide_role.yaml",
+    )
+    agent.target = Target.from_template("./src/config/target_template/user.yaml")
+    return agent
+
+
+def test_shortcuts_do_not_drop_extracted_slots(intent_shortcuts):
+    """Test cached and keyword intents do not answer states extracting slots"""
+    llm = SlotFillingLLM()
+    service_center.use_llm_service(llm)
+    query = "find a restaurant for 2 people"
+    intent_shortcuts.store(
+        ("wonderland_restaurant_guide", "information_collection"),
+        query,
+        "collect_info",
+    )
+
+    agent = _collecting_agent()
+    response = agent.interact(query)
+
+    assert response.is_success
+    assert llm.calls == 1
+    assert agent.target.slots.get("rating_range") == [4.0, 5.0]
+
+
+def test_shortcuts_do_not_drop_the_reply_draft(intent_shortcuts):
+    """Test cached and keyword intents do not answer fused reply states"""
+    llm = SlotFillingLLM()
+    service_center.use_llm_service(llm)
+    query = "find a restaurant for 2 people"
+    intent_shortcuts.store(
+        ("wonderland_restaurant_guide", "information_collection"),
+        query,
+        "collect_info",
+    )
+
+    agent = _collecting_agent()
+    # Only the fused reply asks for the LLM call now
+    agent.get_current_state().extract_slots = None
+    response = agent.interact(query)
+
+    assert llm.calls == 1
+    assert response.message == "Where are you?"
@@ -0,0 +1,75 @@
+import pytest
+
+from core.entity.interaction_history import InteractionHistory
+
+
+def test_append_and_render():
+    """Test messages are rendered in order while under budget"""
+    history = InteractionHistory(token_budget=100)
+    history.record_turn("hello", "hi there")
+
+    rendered = history.render()
+    assert [m["role"] for m in rendered] == ["user", "assistant"]
+    assert history.render_text() == "user: hello\nassistant: hi there"
+    assert len(history) == 2
+    assert history.get_summary() == ""
+
+
+def test_render_is_cached_until_append():
+    """Test the rendered context is reused until a new message arrives"""
+    history = InteractionHistory()
+    history.append({"role": "user", "content": "hello"})
+
+    first = history.render()
+    assert history.render() is first
+
+    history.append({"role": "assistant", "content": "hi"})
+    assert history.render() is not first
+
+
+def test_budget_folds_old_turns_into_summary():
+    """Test older turns are summarized and the window stays within budget"""
+    history = InteractionHistory(token_budget=40, summary_token_budget=20)
+    for i in range(50):
+        history.record_turn(f"query number {i} " * 3, f"answer number {i}")
+
+    assert len(history) == 100
+    assert history.token_count <= 40 + 21
+    assert history.get_summary()
+
+    rendered = history.render()
+    assert rendered[0]["role"] == "system"
+    assert rendered[-1]["content"] == "answer number 49"
+
+
+def test_summary_keeps_whole_messages():
+    """Test the summary is cut between messages and the window starts at a turn"""
+    history = InteractionHistory(token_budget=40, summary_token_budget=20)
+    for i in range(50):
+        history.record_turn(f"query number {i}\nwith a second line", f"answer {i}")
+
+        assert next(iter(history))["role"] == "user"
+        for line in history.get_summary().splitlines():
+            assert line.startswith(("user: query number", "assistant: answer"))
+
+
+def test_custom_summarizer():
+    """Test a custom summarizer receives evicted messages"""
+    calls = []
+
+    def summarizer(summary, evicted):
+        calls.append(len(evicted))
+        return f"{len(evicted)} messages"
+
+    history = InteractionHistory(token_budget=10, summarizer=summarizer)
+    for i in range(10):
+        history.append({"role": "user", "content": f"message {i} with padding"})
+
+    assert calls
+    assert history.get_summary().endswith("messages")
+
+
+def test_append_requires_role_and_content():
+    history = InteractionHistory()
+    with pytest.raises(ValueError):
+        history.append({"content": "missing role"})
@@ -0,0 +1,75 @@
+import pytest
+
+from core.entity.slot_store import SlotDefinition, SlotStore
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+
+    def _clock():
+        return now[0]
+
+    _clock.now = now
+    return _clock
+
+
+@pytest.fixture
+def slot_store(clock):
+    return SlotStore(
+        [
+            SlotDefinition(name="geo_location", type="list", ttl=10),
+            SlotDefinition(name="credit_card_issuer"),
+            SlotDefinition(name="min_rating", type="float"),
+        ],
+        clock=clock,
+    )
+
+
+def test_set_and_get(slot_store):
+    """Test slots are set and read by name"""
+    assert slot_store.get("credit_card_issuer") is None
+    assert slot_store.set("credit_card_issuer", "visa") == 1
+    assert slot_store.get("credit_card_issuer") == "visa"
+    assert slot_store.is_filled("credit_card_issuer")
+
+
+def test_versions(slot_store):
+    """Test slot and store versions increase on every change"""
+    slot_store.set("credit_card_issuer", "visa")
+    assert slot_store.set("credit_card_issuer", "amex") == 2
+    assert slot_store.get_slot("credit_card_issuer").version == 2
+
+    version = slot_store.version
+    slot_store.clear("credit_card_issuer")
+    assert slot_store.version == version + 1
+
+
+def test_ttl_expiry(slot_store, clock):
+    """Test slots expire after their TTL"""
+    slot_store.set("geo_location", (1.0, 2.0))
+    assert slot_store.get("geo_location") == [1.0, 2.0]
+
+    clock.now[0] = 11.0
+    assert slot_store.get("geo_location") is None
+    assert "geo_location" in slot_store.missing()
+
+
+def test_type_checks(slot_store):
+    """Test values are checked against the slot type"""
+    slot_store.set("min_rating", 4)
+    assert slot_store.get("min_rating") == 4.0
+
+    with pytest.raises(TypeError):
+        slot_store.set("credit_card_issuer", 42)
+    with pytest.raises(KeyError):
+        slot_store.set("unknown", "value")
+    with pytest.raises(ValueError):
+        SlotDefinition(name="bad", type="complex")
+
+
+def test_render(slot_store):
+    """Test filled slots are rendered for prompts"""
+    assert slot_store.render() == "None"
+    slot_store.set("credit_card_issuer", "visa")
+    assert slot_store.render() == "credit_card_issuer: visa"
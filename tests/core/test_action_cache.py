@@ -0,0 +1,94 @@
+import pytest
+
+from core.action_cache import ActionCache, CachePolicy, cacheable
+from core.entity.action_context import ActionContext
+from core.entity.slot_store import SlotDefinition
+from core.entity.target import Target
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+
+    def _clock():
+        return now[0]
+
+    _clock.now = now
+    return _clock
+
+
+def _context(query="any", **slots):
+    target = Target(
+        name="user",
+        description="",
+        slot_definitions=[
+            SlotDefinition(name="price_range", type="list"),
+            SlotDefinition(name="credit_card_issuer"),
+        ],
+    )
+    for name, value in slots.items():
+        target.slots.set(name, value)
+    return ActionContext(user_query=query, event="e", state="s", target=target)
+
+
+def test_repeated_calls_served_from_cache(clock):
+    """Test equal slot values share a result across targets"""
+    calls = []
+    cache = ActionCache(clock=clock)
+    action = cache.wrap(
+        "e/recommend",
+        lambda context: calls.append(context) or f"result {len(calls)}",
+        CachePolicy(ttl=10, key_slots=("price_range",)),
+    )
+
+    assert action(_context(price_range=[1, 2])) == "result 1"
+    assert (
+        action(_context("other", price_range=[1, 2], credit_card_issuer="visa"))
+        == "result 1"
+    )
+    assert action(_context(price_range=[2, 3])) == "result 2"
+
+    clock.now[0] = 11
+    assert action(_context(price_range=[1, 2])) == "result 3"
+    assert cache.stats()["e/recommend"] == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 0,
+        "hit_rate": 0.25,
+    }
+
+
+def test_key_includes_query_and_all_filled_slots():
+    policy = CachePolicy(include_query=True)
+    key = ActionCache.make_key("e/a", policy, _context("hi", price_range=[1, 2]))
+
+    assert key == ("e/a", (("price_range", (1, 2)),), "hi")
+    assert key != ActionCache.make_key(
+        "e/a", policy, _context("ho", price_range=[1, 2])
+    )
+
+
+def test_lru_eviction():
+    """Test the least recently used result is evicted when the cache is full"""
+    cache = ActionCache(max_entries=2)
+    cache.put(("a/x", (), None), 1)
+    cache.put(("a/x", (), "b"), 2)
+    cache.get("a/x", ("a/x", (), None))
+    cache.put(("a/x", (), "c"), 3)
+
+    assert len(cache) == 2
+    assert cache.get("a/x", ("a/x", (), "b")) == (False, None)
+    assert cache.get("a/x", ("a/x", (), None)) == (True, 1)
+    assert cache.stats()["a/x"]["evictions"] == 1
+
+
+def test_cache_policy_config():
+    @cacheable(ttl=5, key_slots=["price_range"])
+    def action(_context):
+        return ""
+
+    assert action.cache_policy == CachePolicy(ttl=5, key_slots=("price_range",))
+    with pytest.raises(ValueError):
+        CachePolicy.from_config({"tll": 5})
+    with pytest.raises(ValueError):
+        CachePolicy.from_config({"ttl": 0})
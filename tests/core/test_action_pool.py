@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from core.action_cache import ActionCache, CachePolicy
+from core.action_pool import ActionPool
+from core.entity.action_context import ActionContext
+from core.entity.slot_store import SlotDefinition
+from core.entity.target import Target
+from utils.deadline import Deadline
+
+PARENT_PID = os.getpid()
+
+
+def count_primes(context):
+    """CPU-bound action answering with the process it ran in"""
+    limit = context.target.slots.get("limit")
+    primes = sum(
+        all(n % d for d in range(2, int(n**0.5) + 1)) for n in range(2, limit)
+    )
+    return {"pid": os.getpid(), "primes": primes, "deadline": context.deadline}
+
+
+def read_inputs(context):
+    """Action answering with what the worker received"""
+    return {
+        "query": context.user_query,
+        "slots": context.slots.filled(),
+        "description": context.target.description,
+    }
+
+
+def crash_in_worker(_context):
+    if os.getpid() != PARENT_PID:
+        os._exit(1)
+    return "inline"
+
+
+def _context(limit=1000):
+    target = Target(
+        name="user",
+        description="A user with a long history",
+        slot_definitions=[
+            SlotDefinition(name="limit", type="int"),
+            SlotDefinition(name="notes"),
+        ],
+    )
+    target.slots.set("limit", limit)
+    target.slots.set("notes", "x" * 10_000)
+    return ActionContext(
+        user_query="q", event="e", state="s", target=target, deadline=Deadline(5)
+    )
+
+
+@pytest.fixture
+def pool():
+    pool = ActionPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_actions_run_in_workers(pool):
+    """Test pooled actions run in another process without the deadline"""
+    pool.warm()
+    action = pool.wrap("e/count_primes", count_primes)
+
+    result = action(_context())
+
+    assert result["pid"] != os.getpid()
+    assert result["primes"] == 168
+    assert result["deadline"] is None
+    stats = pool.stats()
+    assert (stats["workers"], stats["tasks"], stats["in_flight"]) == (2, 1, 0)
+    assert 0 < stats["utilization"] <= 1
+
+
+def test_workers_only_receive_the_slots_they_read(pool):
+    """Test the worker context holds the read slots, not the whole target"""
+    action = pool.wrap("e/read_inputs", read_inputs, slots=("limit", "unknown"))
+
+    assert action(_context()) == {
+        "query": "q",
+        "slots": {"limit": 1000},
+        "description": "",
+    }
+    assert pool.wrap("e/read_inputs", read_inputs)(_context())["slots"].keys() == {
+        "limit",
+        "notes",
+    }
+
+
+def test_disabled_pool_runs_inline():
+    action = ActionPool().wrap("e/count_primes", count_primes)
+
+    assert action(_context())["pid"] == os.getpid()
+
+
+def test_only_module_level_functions_are_pooled(pool):
+    with pytest.raises(ValueError, match="module level"):
+        pool.wrap("e/lambda", lambda context: None)
+
+
+def test_cache_hits_skip_the_pool(pool):
+    """Test the cache wraps the pool so hits do not reach the workers"""
+    cache = ActionCache()
+    action = cache.wrap(
+        "e/count_primes",
+        pool.wrap("e/count_primes", count_primes),
+        CachePolicy(key_slots=("limit",)),
+    )
+
+    first = action(_context())
+    assert action(_context()) == first
+    assert pool.stats()["tasks"] == 1
+
+
+def test_broken_pool_falls_back_inline(pool):
+    action = pool.wrap("e/crash_in_worker", crash_in_worker)
+
+    assert action(_context()) == "inline"
+    assert pool.wrap("e/count_primes", count_primes)(_context())["primes"] == 168
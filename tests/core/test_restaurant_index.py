@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import pytest
+
+from core.restaurant_index import (
+    DEFAULT_ISSUERS,
+    RestaurantColumns,
+    RestaurantIndex,
+    haversine_km,
+    synthetic_restaurants,
+)
+
+
+def brute_force(columns, latitude, longitude, radius_km, price_range, issuer):
+    distances = haversine_km(latitude, longitude, columns.latitude, columns.longitude)
+    bit = 1 << DEFAULT_ISSUERS.index(issuer)
+    mask = (
+        (distances <= radius_km)
+        & (columns.price >= price_range[0])
+        & (columns.price <= price_range[1])
+        & ((columns.issuers & bit) != 0)
+    )
+    return {columns.names[i] for i in np.flatnonzero(mask)}
+
+
+def test_query_matches_brute_force(tmp_path):
+    """Test grid queries find exactly the restaurants a full scan finds"""
+    columns = synthetic_restaurants(20_000, seed=7, cities=5, spread_km=5.0)
+    index = RestaurantIndex.build(str(tmp_path), columns, cell_size=0.02)
+
+    for row in range(0, 2000, 200):
+        latitude, longitude = columns.latitude[row], columns.longitude[row]
+        found = index.query(
+            latitude,
+            longitude,
+            radius_km=3.0,
+            price_range=[2, 3],
+            issuer="visa",
+            limit=100_000,
+        )
+        expected = brute_force(columns, latitude, longitude, 3.0, [2, 3], "visa")
+        assert {r.name for r in found} == expected
+        scores = [r.rating * (1 - 0.5 * r.distance_km / 3.0) for r in found]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_query_across_the_antimeridian(tmp_path):
+    """Test the grid wraps around at longitude 180"""
+    columns = RestaurantColumns(
+        names=["East", "West", "Far"],
+        latitude=np.array([-17.0, -17.0, -17.0]),
+        longitude=np.array([179.99, -179.99, 170.0]),
+        price=np.array([1, 2, 3]),
+        rating=np.array([4.0, 5.0, 5.0]),
+        issuers=np.array([1, 1, 1]),
+    )
+    index = RestaurantIndex.build(str(tmp_path), columns)
+
+    found = index.query(-17.0, 179.995, radius_km=5.0)
+    assert [r.name for r in found] == ["West", "East"]
+    rated = index.query(-17.0, 179.995, radius_km=5.0, rating_range=[0, 4.5])
+    assert [r.name for r in rated] == ["East"]
+    assert index.query(-17.0, 179.995, issuer="unknown") == []
+
+
+def test_load_rejects_other_versions(tmp_path):
+    """Test an index written by another format version is not loaded"""
+    RestaurantIndex.build(str(tmp_path), synthetic_restaurants(10, seed=1))
+    meta_path = tmp_path / "meta.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["version"] = 0
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        RestaurantIndex.load(str(tmp_path))
@@ -0,0 +1,211 @@
+import pytest
+import yaml
+
+from core.entity.role import Role
+from core.role_compiler import (
+    ERROR,
+    RoleTemplateCompiler,
+    load_compiled,
+    write_compiled,
+)
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+
+
+class FakeRegistry:
+    def __init__(self, actions):
+        self.actions = actions
+
+    def get_action(self, scope, action_name):
+        return self.actions.get((scope, action_name))
+
+
+def _codes(diagnostics):
+    return [(d.code, d.state) for d in diagnostics]
+
+
+def test_shipped_template_dead_transitions():
+    """Test transitions on conditions no state emits are reported"""
+    compiled = RoleTemplateCompiler().compile(ROLE_TEMPLATE)
+
+    assert not compiled.errors
+    dead = [d.message for d in compiled.diagnostics if d.code == "dead-transition"]
+    assert any("recommendation_failed" in message for message in dead)
+    assert any("details_retrieved" in message for message in dead)
+    assert any("retrieval_failed" in message for message in dead)
+    assert ("dead-end-state", "restaurant_detail_retrieval") in _codes(
+        compiled.diagnostics
+    )
+
+
+def test_unknown_action_and_unreachable_state():
+    """Test unregistered actions are errors and orphan states are reported"""
+    template = {
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "transitions": [{"to": "ask", "priority": 1}],
+            },
+            {
+                "name": "ask",
+                "state_type": "action",
+                "event_actions": {"greet": [{"name": "say_hi"}, {"name": "wave"}]},
+                "transitions": [
+                    {"to": "done", "condition": "greet", "priority": 2},
+                    {"to": "missing", "condition": "greet", "priority": 1},
+                ],
+            },
+            {"name": "done", "state_type": "end"},
+            {"name": "orphan", "state_type": "end"},
+        ],
+        "properties": {
+            name: {"description": name}
+            for name in ["start", "ask", "done", "orphan", "greet"]
+        },
+    }
+    compiler = RoleTemplateCompiler(registry=FakeRegistry({("greet", "say_hi"): print}))
+    diagnostics = compiler.analyze(template)
+    codes = _codes(diagnostics)
+
+    assert diagnostics[0].severity == ERROR
+    assert ("unknown-action", "ask") in codes
+    assert ("unknown-state", "ask") in codes
+    assert ("dead-transition", "ask") in codes
+    assert ("unreachable-state", "orphan") in codes
+    assert not any(code == "missing-description" for code, _ in codes)
+
+
+def test_compiled_artifact_round_trip(tmp_path):
+    """Test a compiled artifact builds the same role as the YAML source"""
+    compiled = RoleTemplateCompiler().compile(ROLE_TEMPLATE)
+    artifact = tmp_path / "role.rolec"
+    write_compiled(compiled, str(artifact))
+
+    loaded = load_compiled(str(artifact))
+    assert loaded.sha256 == compiled.sha256
+    assert loaded.template == compiled.template
+    assert _codes(loaded.diagnostics) == _codes(compiled.diagnostics)
+
+    from_source = Role.from_template(ROLE_TEMPLATE)
+    from_artifact = Role.from_template(str(artifact))
+    assert from_artifact.name == from_source.name
+    assert list(from_artifact.states) == list(from_source.states)
+    assert from_artifact.get_init_state().name == "initial"
+
+
+def test_stale_artifact_is_rejected(tmp_path):
+    """Test an artifact is not loaded once its source template changed"""
+    source = tmp_path / "role.yaml"
+    with open(ROLE_TEMPLATE, "r", encoding="utf-8") as f:
+        source.write_text(f.read(), encoding="utf-8")
+    artifact = tmp_path / "role.rolec"
+    write_compiled(RoleTemplateCompiler().compile(str(source)), str(artifact))
+    assert load_compiled(str(artifact)).source == str(source)
+
+    with open(source, "a", encoding="utf-8") as f:
+        f.write("# edited\n")
+    with pytest.raises(ValueError, match="stale"):
+        load_compiled(str(artifact))
+
+    # Artifacts deployed without their source still load
+    source.unlink()
+    assert load_compiled(str(artifact)).template["role"]
+
+
+def test_stale_check_does_not_depend_on_cwd(tmp_path, monkeypatch):
+    """Test an artifact compiled from a relative path is checked from elsewhere"""
+    with open(ROLE_TEMPLATE, "r", encoding="utf-8") as f:
+        (tmp_path / "role.yaml").write_text(f.read(), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    write_compiled(RoleTemplateCompiler().compile("role.yaml"), "role.rolec")
+    with open("role.yaml", "a", encoding="utf-8") as f:
+        f.write("# edited\n")
+
+    monkeypatch.chdir(tmp_path.parent)
+    with pytest.raises(ValueError, match="stale"):
+        load_compiled(str(tmp_path / "role.rolec"))
+
+
+def test_missing_states():
+    diagnostics = RoleTemplateCompiler().analyze(yaml.safe_load("role: {name: x}"))
+    assert _codes(diagnostics) == [("no-states", None)]
+
+
+def test_invalid_cache_config():
+    template = {
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "event_actions": {
+                    "go": [{"name": "act", "cache": {"ttl": -1}}],
+                },
+                "transitions": [{"to": "end", "priority": 1}],
+            },
+            {"name": "end", "state_type": "end"},
+        ]
+    }
+
+    diagnostics = RoleTemplateCompiler().analyze(template)
+
+    assert ("invalid-cache", "start") in _codes(diagnostics)
+
+
+def test_invalid_action_flags():
+    template = {
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "event_actions": {
+                    "go": [{"name": "act", "optional": "yes", "cpu_bound": 1}]
+                },
+                "transitions": [{"to": "end", "priority": 1}],
+            },
+            {"name": "end", "state_type": "end"},
+        ]
+    }
+
+    diagnostics = RoleTemplateCompiler().analyze(template)
+
+    assert ("invalid-optional", "start") in _codes(diagnostics)
+    assert ("invalid-cpu-bound", "start") in _codes(diagnostics)
+
+
+def test_invalid_extract_slots():
+    template = {
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "extract_slots": "geo_location",
+                "transitions": [{"to": "end", "priority": 1}],
+            },
+            {"name": "end", "state_type": "end", "extract_slots": ["geo_location"]},
+        ]
+    }
+
+    diagnostics = RoleTemplateCompiler().analyze(template)
+
+    assert ("invalid-extract-slots", "start") in _codes(diagnostics)
+    assert ("unused-extract-slots", "end") in _codes(diagnostics)
+
+
+def test_invalid_fused_reply():
+    template = {
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "fused_reply": "yes",
+                "transitions": [{"to": "end", "priority": 1}],
+            },
+            {"name": "end", "state_type": "end", "fused_reply": True},
+        ]
+    }
+
+    diagnostics = RoleTemplateCompiler().analyze(template)
+
+    assert ("invalid-fused-reply", "start") in _codes(diagnostics)
+    assert ("unused-fused-reply", "end") in _codes(diagnostics)
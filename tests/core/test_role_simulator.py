@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from core.entity.role import Role
+from core.role_simulator import RoleSimulator
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+PRIORS = {
+    "information_collection": {"collect_info": 8, "default_fallback_event": 1},
+    "restaurant_recommendation": {
+        "make_recommendation": 6,
+        "modify_preferences": 2,
+        "default_fallback_event": 1,
+    },
+    "restaurant_detail_retrieval": {
+        "details_retrieved": 5,
+        "request_to_update_filter_criteria": 1,
+    },
+}
+
+
+@pytest.fixture
+def role():
+    return Role.from_template(ROLE_TEMPLATE)
+
+
+def test_transition_matrix_follows_priorities(role):
+    """Test required slots pass the event to lower priority transitions"""
+    compiled = RoleSimulator(role, PRIORS, requirement_probability=0.5).compiled
+    row = compiled.transitions[compiled.index("information_collection")]
+
+    assert np.allclose(compiled.transitions.sum(axis=1), 1.0)
+    assert compiled.state_names[compiled.start] == "information_collection"
+    # collect_info moves on half the time and stays otherwise
+    assert row[compiled.index("restaurant_recommendation")] == pytest.approx(4 / 9)
+    assert row[compiled.index("information_collection")] == pytest.approx(4 / 9)
+    assert row[compiled.index("error")] == pytest.approx(1 / 9)
+
+
+def test_simulation_matches_exact_solution(role):
+    """Test simulated outcomes and turns converge to the fundamental matrix"""
+    simulator = RoleSimulator(role, PRIORS, requirement_probability=0.4)
+    report = simulator.simulate(200_000, batch_size=50_000, seed=7)
+
+    assert report.unfinished == 0
+    assert report.mean_turns == pytest.approx(report.expected_turns, rel=0.02)
+    for state, expected in report.expected_outcomes.items():
+        assert report.outcomes[state] == pytest.approx(expected, abs=0.01)
+    assert report.mean_llm_calls == pytest.approx(report.mean_turns)
+    assert sum(report.occupancy.values()) == pytest.approx(report.mean_turns)
+
+
+def test_stuck_states_have_no_exact_solution(role):
+    """Test engagements trapped in a state without exits are reported unfinished"""
+    report = RoleSimulator(role).simulate(10_000, max_turns=20, seed=1)
+
+    assert report.expected_turns is None
+    assert report.unfinished > 0.2
+    assert max(report.occupancy, key=report.occupancy.get) == (
+        "restaurant_detail_retrieval"
+    )
+
+
+@pytest.mark.parametrize("engagements", [0, -1])
+def test_simulate_requires_engagements(role, engagements):
+    with pytest.raises(ValueError, match="engagements"):
+        RoleSimulator(role, PRIORS).simulate(engagements)
@@ -0,0 +1,103 @@
+import pytest
+
+from core.entity.action_context import ActionContext
+from core.entity.target import Target
+from ext.collect_info import (
+    _parse_geo_location,
+    _parse_price_range,
+    ask_price_range,
+    ask_rating_range,
+)
+from ext.modify_preferences import transit_to_information_collection
+
+TARGET_TEMPLATE = "./src/config/target_template/user.yaml"
+
+
+def _context(query, state="information_collection", **kwargs):
+    target = Target.from_template(TARGET_TEMPLATE)
+    target.slots.set("price_range", [3, 4])
+    target.slots.set("rating_range", [4.0, 5.0])
+    return ActionContext(
+        user_query=query, event="", state=state, target=target, **kwargs
+    )
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("near 37.77, -122.41", [37.77, -122.41]),
+        ("lat 37, lon -122", [37.0, -122.0]),
+        ("Latitude: 48.85 longitude: 2.35", [48.85, 2.35]),
+        ("my coordinates are 51, 0", [51.0, 0.0]),
+    ],
+)
+def test_geo_location(query, expected):
+    assert _parse_geo_location(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "a table for 2, 3 people at most",
+        "we are 10, 12 with the kids",
+        "open 9.5, closes at 23",
+        "version 1.2.3, 4.5",
+        "lat 95.1, lon 10",
+    ],
+)
+def test_numbers_are_not_coordinates(query):
+    """Test counts and other numbers are not read as a location"""
+    assert _parse_geo_location(query) is None
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("somewhere $$ or $$$", [2, 3]),
+        ("$ please", [1, 1]),
+        ("something cheap", [1, 1]),
+    ],
+)
+def test_price_range(query, expected):
+    assert _parse_price_range(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query", ["around $20 per person", "$$30 tops", "under $ 15", "no idea"]
+)
+def test_amounts_are_not_price_levels(query):
+    """Test dollar amounts are not read as price levels"""
+    assert _parse_price_range(query) is None
+
+
+def test_revised_preferences_replace_stored_values():
+    """Test a price level or rating the target revises replaces the stored one"""
+    context = _context("actually something cheap, 3 stars is fine")
+
+    assert ask_price_range(context) == ""
+    assert ask_rating_range(context) == ""
+    assert context.slots.get("price_range") == [1, 1]
+    assert context.slots.get("rating_range") == [3.0, 5.0]
+
+    # Queries not mentioning the slot keep it
+    context.user_query = "sounds good"
+    assert ask_price_range(context) == ""
+    assert context.slots.get("price_range") == [1, 1]
+
+
+def test_extracted_slots_are_not_overwritten():
+    """Test the LLM's extraction from the same query wins over the regex"""
+    context = _context("something cheap", extracted_slots={"price_range": [1, 2]})
+    context.slots.set("price_range", [1, 2])
+
+    assert ask_price_range(context) == ""
+    assert context.slots.get("price_range") == [1, 2]
+
+
+def test_modify_preferences_revises_mentioned_slots():
+    context = _context("make it $$ instead", state="restaurant_recommendation")
+
+    transit_to_information_collection(context)
+
+    assert context.slots.get("price_range") == [2, 2]
+    assert context.slots.get("rating_range") == [4.0, 5.0]
@@ -0,0 +1,70 @@
+import pytest
+
+from core.entity.action_context import ActionContext
+from core.entity.role import Role
+from service.event_action_registry import EventActionRegistry
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+
+
+def test_bind_role_resolves_actions_in_order():
+    """Test every (state, event) pair resolves to its ordered functions"""
+    registry = EventActionRegistry()
+    role = Role.from_template(ROLE_TEMPLATE)
+
+    table = registry.bind_role(role)
+
+    assert role.action_table is table
+    names = [
+        a.name for a in role.get_bound_actions("information_collection", "collect_info")
+    ]
+    assert names == [
+        "extract_mentioned_slots",
+        "ask_geo_location",
+        "ask_credit_card_type_issuer",
+        "ask_price_range",
+        "ask_rating_range",
+    ]
+    bound = role.get_bound_actions("restaurant_recommendation", "make_recommendation")
+    # Served from the action cache, run on the action pool on a miss
+    assert bound[0].function.__wrapped__.__wrapped__ is registry.get_action(
+        "make_recommendation", "generate_recommendation"
+    )
+    assert role.get_bound_actions("information_collection", "unknown_event") == ()
+
+
+def test_bind_role_rejects_unknown_actions(mock_role):
+    """Test unregistered actions fail when the role is bound"""
+    with pytest.raises(ValueError, match="start/completed/complete_action"):
+        EventActionRegistry().bind_role(mock_role)
+    assert mock_role.action_table is None
+
+
+def test_unbound_role_lookup(mock_role):
+    with pytest.raises(ValueError, match="not bound"):
+        mock_role.get_bound_actions("start", "completed")
+
+
+def test_registry_skips_imported_names():
+    """Test only functions defined in ext modules are registered"""
+    registry = EventActionRegistry()
+    assert registry.get_action("collect_info", "ActionContext") is None
+    assert registry.get_action("collect_info", "ask_geo_location") is not None
+
+
+def test_role_template_cache_config_wraps_action(mock_role):
+    """Test a cache entry in the role template makes an action cacheable"""
+    registry = EventActionRegistry()
+    registry.register("completed", "complete_action", lambda context: "done")
+    mock_role.states["start"].event_actions["completed"].actions[0].cache = {"ttl": 60}
+
+    try:
+        registry.bind_role(mock_role)
+        (bound,) = mock_role.get_bound_actions("start", "completed")
+        context = ActionContext(user_query="done", event="completed", state="start")
+        bound.function(context)
+        bound.function(context)
+    finally:
+        registry.unregister("completed", "complete_action")
+
+    assert registry.get_cache_stats()["completed/complete_action"]["hits"] == 1
@@ -0,0 +1,289 @@
+import time
+
+import pytest
+
+from core.entity.role import Role
+from core.entity.slot_store import SlotDefinition
+from service.intent_detect_service import HedgePolicy, IntentDetectService
+from service.llm_scheduler import LoadShedError
+from service.local_intent_resolver import LocalIntentResolver
+from utils.deadline import Deadline
+from utils.response_type import EventActions
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+
+
+class FakePromptService:
+    def build_prompt_from_template(self, template_name, prompt_snapshot, **kwargs):
+        return kwargs["raw_query"]
+
+
+class FakeLLM:
+    def __init__(self, event, latency=0.0, error=None):
+        self.event = event
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    def completion_with_object(self, prompt, response_format, deadline=None, **_kwargs):
+        self.calls += 1
+        timeout = deadline.remaining() if deadline else None
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Request timed out")
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return response_format(name=self.event)
+
+
+@pytest.fixture
+def events():
+    role = Role.from_template(ROLE_TEMPLATE)
+    return role.get_state("restaurant_recommendation").event_actions
+
+
+def _service(llm, **kwargs):
+    return IntentDetectService(
+        llm_service=llm,
+        prompt_service=FakePromptService(),
+        hedge_policy=HedgePolicy(**kwargs),
+    )
+
+
+def test_local_resolver_confidence(events):
+    """Test the confidence is the margin over the runner up event"""
+    resolver = LocalIntentResolver()
+
+    intent = resolver.resolve("Can you recommend one? Suggest anything", events)
+    assert intent.name == "make_recommendation"
+    assert intent.confidence == pytest.approx(2 / 3)
+
+    ambiguous = resolver.resolve("recommend a different one", events)
+    assert ambiguous.confidence == 0
+    assert resolver.resolve("hello there", events) is None
+
+
+def test_confident_local_intent_wins(events):
+    """Test a confident local answer returns without waiting for the LLM"""
+    llm = FakeLLM("modify_preferences", latency=0.5)
+    service = _service(llm)
+
+    started = time.perf_counter()
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="please recommend one"
+    )
+
+    assert result.name == "make_recommendation"
+    assert time.perf_counter() - started < 0.4
+    assert service.hedge_stats()["local"] == 1
+
+
+def test_local_win_does_not_call_llm(events):
+    """Test no LLM request is sent for turns the local resolver answers"""
+    llm = FakeLLM("modify_preferences", latency=0.01)
+    service = _service(llm)
+
+    for _ in range(20):
+        result = service.detect_intent_with_args(
+            EventActions, candidate_events=events, raw_query="please recommend one"
+        )
+        assert result.name == "make_recommendation"
+
+    assert llm.calls == 0
+    assert service.hedge_stats()["local"] == 20
+
+
+def test_llm_only_skips_the_local_resolver(events):
+    """Test states whose LLM call returns more than the event skip hedging"""
+    llm = FakeLLM("modify_preferences")
+    service = _service(llm)
+
+    result = service.detect_intent_with_args(
+        EventActions,
+        candidate_events=events,
+        raw_query="please recommend one",
+        llm_only=True,
+    )
+
+    assert result.name == "modify_preferences"
+    assert llm.calls == 1
+    assert service.hedge_stats()["local"] == 0
+
+
+def test_llm_answers_when_local_not_confident(events):
+    llm = FakeLLM("modify_preferences")
+    service = _service(llm, min_confidence=0.9)
+
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="please recommend one"
+    )
+
+    assert result.name == "modify_preferences"
+    assert service.hedge_stats()["llm"] == 1
+
+
+def test_local_fallback_on_invalid_llm_event(events):
+    """Test the local answer replaces LLM errors and events invalid for the state"""
+    service = _service(FakeLLM("collect_info"), min_confidence=0.9)
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="recommend one"
+    )
+    assert result.name == "make_recommendation"
+
+    service = _service(FakeLLM("", error=RuntimeError("down")), min_confidence=0.9)
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="recommend one"
+    )
+    assert result.name == "make_recommendation"
+    assert service.hedge_stats()["local_fallback"] == 1
+
+    with pytest.raises(RuntimeError):
+        service.detect_intent_with_args(
+            EventActions, candidate_events=events, raw_query="hello"
+        )
+
+
+def test_without_policy_only_llm_is_used(events):
+    llm = FakeLLM("modify_preferences")
+    service = IntentDetectService(llm_service=llm, prompt_service=FakePromptService())
+
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="recommend one"
+    )
+
+    assert result.name == "modify_preferences"
+
+
+def test_response_model_is_constrained_to_state_events():
+    """Test the response model only accepts the events of the state"""
+    role = Role.from_template(ROLE_TEMPLATE)
+    state = role.get_state("restaurant_recommendation")
+    service = IntentDetectService(llm_service=None, prompt_service=None)
+
+    model = service.response_model(role, state)
+    schema = model.model_json_schema()["properties"]["name"]
+    assert set(schema["enum"]) == {*state.event_actions, "default_fallback_event"}
+    assert isinstance(model(name="make_recommendation"), EventActions)
+    with pytest.raises(ValueError):
+        model(name="collect_info")
+
+
+def test_prepare_role_builds_models_once():
+    """Test models are built at role load and shared by roles with the same events"""
+    service = IntentDetectService(llm_service=None, prompt_service=None)
+    role = Role.from_template(ROLE_TEMPLATE)
+    service.prepare_role(role)
+    state = role.get_state("information_collection")
+    model = service.response_model(role, state)
+
+    reloaded = Role.from_template(ROLE_TEMPLATE)
+    assert service.response_model(reloaded, reloaded.get_state(state.name)) is model
+    assert service.response_model(role, role.get_state("success")) is not model
+
+    # A reloaded version with other events gets its own model
+    reloaded.get_state(state.name).event_actions.pop("collect_info")
+    changed = service.response_model(reloaded, reloaded.get_state(state.name))
+    assert changed is not model
+    with pytest.raises(ValueError):
+        changed(name="collect_info")
+
+
+def test_response_model_extracts_state_slots():
+    """Test states with extract_slots get an optional field per target slot"""
+    role = Role.from_template(ROLE_TEMPLATE)
+    state = role.get_state("information_collection")
+    definitions = {
+        "geo_location": SlotDefinition("geo_location", "list", "Latitude, longitude"),
+        "credit_card_issuer": SlotDefinition("credit_card_issuer", "str"),
+    }
+    service = IntentDetectService(llm_service=None, prompt_service=None)
+
+    model = service.response_model(role, state, definitions)
+    properties = model.model_json_schema()["properties"]
+    assert {"geo_location", "credit_card_issuer"} <= set(properties)
+    assert "price_range" not in properties
+    response = model(name="collect_info", credit_card_issuer="visa")
+    assert response.geo_location is None
+    assert response.credit_card_issuer == "visa"
+
+    # States without extract_slots keep the plain event model
+    other = role.get_state("restaurant_recommendation")
+    plain = service.response_model(role, other, definitions)
+    assert set(plain.model_json_schema()["properties"]) == {"name"}
+
+
+def test_response_model_drafts_reply_in_fused_states():
+    """Test only fused reply states get the optional reply field"""
+    role = Role.from_template(ROLE_TEMPLATE)
+    service = IntentDetectService(llm_service=None, prompt_service=None)
+
+    fused = service.response_model(role, role.get_state("information_collection"))
+    assert "reply" in fused.model_json_schema()["properties"]
+    assert fused(name="collect_info").reply is None
+    assert fused(name="collect_info", reply="Where are you?").reply == "Where are you?"
+
+    plain = service.response_model(role, role.get_state("restaurant_recommendation"))
+    assert "reply" not in plain.model_json_schema()["properties"]
+
+
+def test_short_deadline_skips_the_llm(events):
+    """Test turns without time for the LLM use the local or fallback intent"""
+    llm = FakeLLM("modify_preferences")
+    service = IntentDetectService(llm_service=llm, prompt_service=FakePromptService())
+
+    deadline = Deadline(0.1)
+    result = service.detect_intent_with_args(
+        EventActions,
+        candidate_events=events,
+        raw_query="please recommend one",
+        deadline=deadline,
+    )
+    assert result.name == "make_recommendation"
+    assert deadline.degradations == ["local_intent"]
+
+    deadline = Deadline(0.1)
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="hello", deadline=deadline
+    )
+    assert result.name == "default_fallback_event"
+    assert deadline.degradations == ["fallback_intent"]
+    assert llm.calls == 0
+
+
+def test_llm_timeout_degrades_within_deadline(events):
+    """Test an LLM call running past the deadline degrades instead of failing"""
+    llm = FakeLLM("modify_preferences", latency=2.0)
+    service = IntentDetectService(
+        llm_service=llm, prompt_service=FakePromptService(), min_llm_seconds=0.1
+    )
+
+    deadline = Deadline(0.3)
+    started = time.perf_counter()
+    result = service.detect_intent_with_args(
+        EventActions, candidate_events=events, raw_query="hello", deadline=deadline
+    )
+
+    assert time.perf_counter() - started < 1.0
+    assert result.name == "default_fallback_event"
+    assert deadline.degradations == ["fallback_intent"]
+
+
+def test_llm_errors_raise_without_deadline(events):
+    llm = FakeLLM("modify_preferences", error=LoadShedError("Queue is full"))
+    service = IntentDetectService(llm_service=llm, prompt_service=FakePromptService())
+
+    with pytest.raises(LoadShedError):
+        service.detect_intent_with_args(
+            EventActions, candidate_events=events, raw_query="hello"
+        )
+
+    deadline = Deadline(5.0)
+    result = service.detect_intent_with_args(
+        EventActions,
+        candidate_events=events,
+        raw_query="please recommend one",
+        deadline=deadline,
+    )
+    assert result.name == "make_recommendation"
+    assert deadline.degradations == ["local_intent"]
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import openai
+import pytest
+
+from service.llm_scheduler import (
+    PRIORITY_ACTIVE,
+    PRIORITY_NEW,
+    AIMDLimiter,
+    LLMScheduler,
+    LoadShedError,
+    ModelLimits,
+    TokenBucket,
+)
+
+
+def test_token_bucket_refill():
+    now = [0.0]
+    bucket = TokenBucket(per_minute=60, clock=lambda: now[0])
+
+    bucket.consume(60)
+    assert bucket.wait_time(2) == pytest.approx(2.0)
+    now[0] = 2.0
+    assert bucket.wait_time(2) == 0
+    # Amounts above the capacity wait for a full bucket
+    assert bucket.wait_time(600) == pytest.approx(58.0)
+
+
+def test_aimd_limiter():
+    """Test the limit grows additively and halves at most once per cooldown"""
+    now = [0.0]
+    limiter = AIMDLimiter(initial=4, latency_target=1.0, clock=lambda: now[0])
+
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert limiter.limit == 4
+    limiter.on_success(0.1)
+    assert limiter.limit == 5
+
+    limiter.on_rate_limited()
+    limiter.on_success(2.0)
+    assert limiter.limit == 2
+    now[0] = 1.0
+    limiter.on_success(2.0)
+    assert limiter.limit == 1
+
+
+def _blocked_call(scheduler, release):
+    def first():
+        release.wait(1)
+        return "first"
+
+    holder = threading.Thread(target=scheduler.run, args=("gpt", first))
+    holder.start()
+    while scheduler.stats().get("gpt", {}).get("in_flight") != 1:
+        time.sleep(0.001)
+    return holder
+
+
+def test_active_engagements_admitted_first():
+    """Test queued calls of engagements in progress go before new ones"""
+    scheduler = LLMScheduler(limiter_factory=lambda: AIMDLimiter(initial=1))
+    order, release = [], threading.Event()
+    holder = _blocked_call(scheduler, release)
+
+    threads = []
+    for name, priority in [("new", PRIORITY_NEW), ("active", PRIORITY_ACTIVE)]:
+        thread = threading.Thread(
+            target=scheduler.run,
+            args=("gpt", lambda name=name: order.append(name)),
+            kwargs={"priority": priority},
+        )
+        thread.start()
+        threads.append(thread)
+    while scheduler.stats()["gpt"]["queued"] != 2:
+        time.sleep(0.001)
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join()
+    assert order == ["active", "new"]
+
+
+def test_load_shedding():
+    """Test calls that cannot be admitted in time are shed"""
+    scheduler = LLMScheduler(
+        default_limits=ModelLimits(requests_per_minute=1), max_queue_wait=0.05
+    )
+
+    assert scheduler.run("gpt", lambda: "ok") == "ok"
+    with pytest.raises(LoadShedError):
+        scheduler.run("gpt", lambda: "late")
+
+    stats = scheduler.stats()["gpt"]
+    assert (stats["admitted"], stats["shed"], stats["queued"]) == (1, 1, 0)
+
+
+def test_rate_limit_response_cuts_concurrency():
+    scheduler = LLMScheduler(limiter_factory=lambda: AIMDLimiter(initial=8))
+
+    def rejected():
+        # Skip the constructor, which needs a full HTTP response
+        raise openai.RateLimitError.__new__(openai.RateLimitError)
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.run("gpt", rejected)
+
+    stats = scheduler.stats()["gpt"]
+    assert (stats["limit"], stats["rate_limited"], stats["in_flight"]) == (4, 1, 0)
+
+
+def test_timeout_cuts_concurrency():
+    scheduler = LLMScheduler(limiter_factory=lambda: AIMDLimiter(initial=8))
+
+    def timed_out():
+        raise openai.APITimeoutError.__new__(openai.APITimeoutError)
+
+    with pytest.raises(openai.APITimeoutError):
+        scheduler.run("gpt", timed_out)
+
+    stats = scheduler.stats()["gpt"]
+    assert (stats["limit"], stats["timed_out"], stats["in_flight"]) == (4, 1, 0)
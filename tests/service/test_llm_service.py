@@ -0,0 +1,89 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from service.llm_scheduler import AIMDLimiter, LLMScheduler
+from service.llm_service import AdHocInference
+from utils.deadline import Deadline
+from utils.response_type import EventActions
+
+
+class FakeClient:
+    """OpenAI client stand-in whose requests take a fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.options = []
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self._parse))
+        )
+        self._timeout = None
+
+    def with_options(self, **options):
+        self.options.append(options)
+        client = FakeClient(self.latency)
+        client.options = self.options
+        client._timeout = options.get("timeout")
+        return client
+
+    def _parse(self, response_format, **_kwargs):
+        if self._timeout is not None and self.latency > self._timeout:
+            time.sleep(self._timeout)
+            raise TimeoutError("Request timed out")
+        time.sleep(self.latency)
+        parsed = response_format(name="collect_info")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(parsed=parsed))]
+        )
+
+
+def _inference(latency):
+    scheduler = LLMScheduler(limiter_factory=lambda: AIMDLimiter(initial=1))
+    inference = AdHocInference(api_key="offline", config={}, scheduler=scheduler)
+    inference.client = FakeClient(latency)
+    return inference
+
+
+def test_turn_deadline_bounds_admission_and_request():
+    """Test the queue wait counts against the request timeout of the turn"""
+    inference = _inference(latency=2.0)
+
+    def hold_slot():
+        # Holds the only slot of the model for 0.3s
+        with pytest.raises(TimeoutError):
+            inference.completion_with_object(
+                "busy", EventActions, deadline=Deadline(0.3)
+            )
+
+    busy = threading.Thread(target=hold_slot)
+    busy.start()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        inference.completion_with_object("hello", EventActions, deadline=Deadline(0.5))
+    busy.join()
+
+    assert time.perf_counter() - started < 0.65
+    assert all(options["max_retries"] == 0 for options in inference.client.options)
+    assert inference.client.options[-1]["timeout"] < 0.35
+
+
+def test_requests_without_deadline_use_client_defaults():
+    inference = _inference(latency=0.0)
+
+    result = inference.completion_with_object("hello", EventActions)
+
+    assert result.name == "collect_info"
+    assert inference.client.options == []
+
+
+def test_scheduled_client_does_not_retry():
+    """Test 429s are not retried by the client behind the scheduler's back"""
+    scheduled = AdHocInference(api_key="offline", config={}, scheduler=LLMScheduler())
+    direct = AdHocInference(api_key="offline", config={})
+
+    assert scheduled.client.max_retries == 0
+    assert direct.client.max_retries > 0
@@ -0,0 +1,90 @@
+import json
+import urllib.request
+
+from service.memory_profiler import (
+    deep_sizeof,
+    engagement_memory,
+    memory_report,
+    register_memory_route,
+)
+from service.template_store import TemplateStore
+from service.user_engagement_service import UserEngagementService
+from utils.metrics import MetricsRegistry
+
+AGENT_TEMPLATE = "./src/config/agent_template/restaurant_guide_agent.yaml"
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+TARGET_TEMPLATE = "./src/config/target_template/user.yaml"
+
+
+def _engagements(n):
+    service = UserEngagementService(template_store=TemplateStore())
+    service.create_engagements(n, AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE)
+    return service
+
+
+def test_deep_sizeof_follows_containers():
+    assert deep_sizeof(["x" * 1000]) > 1000
+    assert deep_sizeof({"key": list(range(100))}) > deep_sizeof({"key": []})
+
+
+def test_growth_is_attributed_to_the_component():
+    """Test history growth is retained by the engagement that grew"""
+    service = _engagements(3)
+    grown, *_ = service.engagement_ids()
+    history = service.get_context(grown).interaction_his
+    for i in range(10):
+        history.record_turn(f"query {i} " * 20, f"reply {i} " * 20)
+
+    report = engagement_memory(
+        {
+            engagement_id: service.get_context(engagement_id)
+            for engagement_id in service.engagement_ids()
+        }
+    )
+
+    largest = report["largest"][0]
+    assert largest["engagement_id"] == grown
+    assert (
+        largest["interaction_history"]
+        > report["largest"][1]["interaction_history"] + 10 * 200
+    )
+    assert largest["target"] == report["largest"][1]["target"]
+    # Slot definitions are shared by the targets of the batch
+    assert report["shared_bytes"] > 0
+    role = report["roles"]["wonderland_restaurant_guide"]
+    assert (role["engagements"], role["instances"]) == (3, 1)
+    assert role["bytes_per_instance"] > 0
+
+
+def test_duplicated_roles_are_counted():
+    """Test engagements holding their own copy of a role show up"""
+    first, second = _engagements(2), _engagements(2)
+    contexts = {
+        engagement_id: service.get_context(engagement_id)
+        for service in (first, second)
+        for engagement_id in service.engagement_ids()
+    }
+
+    roles = engagement_memory(contexts)["roles"]
+
+    assert roles["wonderland_restaurant_guide"]["engagements"] == 4
+    assert roles["wonderland_restaurant_guide"]["instances"] == 2
+
+
+def test_memory_report_samples_and_serves_route():
+    service = _engagements(20)
+
+    report = memory_report(service, sample=5)
+    assert report["engagements"] == 20
+    assert report["sampled"] == 5
+    assert "template_store" in report["caches"]
+
+    registry = MetricsRegistry()
+    register_memory_route(service, registry=registry)
+    server = registry.start_http_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/admin/memory"
+        with urllib.request.urlopen(url) as response:
+            assert json.loads(response.read())["engagements"] == 20
+    finally:
+        registry.stop_http_server()
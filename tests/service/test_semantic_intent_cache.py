@@ -0,0 +1,102 @@
+import random
+
+import numpy as np
+
+from service.intent_detect_service import IntentDetectService
+from service.semantic_intent_cache import (
+    HashingVectorizer,
+    SemanticIntentCache,
+    SemanticIntentIndex,
+)
+from utils.response_type import EventActions
+
+KEY = ("wonderland_restaurant_guide", "restaurant_recommendation")
+EVENTS = {"make_recommendation", "modify_preferences"}
+
+
+class CountingLLM:
+    def __init__(self, event):
+        self.event = event
+        self.calls = 0
+
+    def completion_with_object(self, prompt, response_format, **_kwargs):
+        self.calls += 1
+        return response_format(name=self.event)
+
+
+class FakePromptService:
+    def build_prompt_from_template(self, template_name, prompt_snapshot, **kwargs):
+        return kwargs["raw_query"]
+
+
+def test_vectorizer_similarity():
+    """Test reworded queries embed closer than unrelated ones"""
+    vectors = HashingVectorizer().transform_batch(
+        ["looking for a restaurant", "looking for restaurants", "change my price"]
+    )
+
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    similarities = vectors @ vectors[0]
+    assert similarities[1] > 0.75 > similarities[2]
+
+
+def test_index_evicts_least_recently_used():
+    index = SemanticIntentIndex(dim=2, capacity=2)
+    first = index.add(np.array([1.0, 0.0], dtype=np.float32), "a")
+    index.add(np.array([0.0, 1.0], dtype=np.float32), "b")
+    index.touch(first)
+
+    index.add(np.array([-1.0, 0.0], dtype=np.float32), "c")
+
+    assert sorted(index.events) == ["a", "c"]
+
+
+def test_lookup_and_store():
+    """Test similar queries hit, unless the state cannot handle the event"""
+    cache = SemanticIntentCache(threshold=0.75)
+    cache.store(KEY, "looking for a restaurant", "make_recommendation")
+
+    assert cache.lookup(KEY, "looking for restaurants", EVENTS) == (
+        "make_recommendation"
+    )
+    assert cache.lookup(KEY, "change my price range", EVENTS) is None
+    assert cache.lookup(KEY, "looking for restaurants", {"other"}) is None
+    assert (
+        cache.lookup(("role", "other_state"), "looking for a restaurant", EVENTS)
+        is None
+    )
+    assert cache.stats()["hits"] == 1
+
+
+def test_service_serves_hits_and_audits():
+    """Test hits skip the LLM and audited hits measure precision"""
+    llm = CountingLLM("make_recommendation")
+    cache = SemanticIntentCache(audit_rate=0.5, rng=random.Random(0))
+    service = IntentDetectService(
+        llm_service=llm, prompt_service=FakePromptService(), semantic_cache=cache
+    )
+    candidates = {name: None for name in EVENTS}
+
+    def detect(query):
+        return service.detect_intent_with_args(
+            EventActions,
+            candidate_events=candidates,
+            cache_key=KEY,
+            raw_query=query,
+        ).name
+
+    assert detect("looking for a restaurant") == "make_recommendation"
+    assert llm.calls == 1
+    for _ in range(20):
+        assert detect("looking for restaurants") == "make_recommendation"
+
+    stats = cache.stats()
+    assert stats["hits"] == 20
+    assert 0 < stats["audits"] == llm.calls - 1 < 20
+    assert stats["precision"] == 1.0
+
+    llm.event = "modify_preferences"
+    while cache.stats()["precision"] == 1.0:
+        detect("looking for restaurants")
+    # The disagreeing LLM label replaces the cached one
+    assert detect("looking for restaurants") == "modify_preferences"
@@ -0,0 +1,20 @@
+import signal
+
+from service.service_center import ServiceCenterInitializer
+
+
+def test_template_reload_interval_starts_the_reloader(monkeypatch):
+    """Test TEMPLATE_RELOAD_INTERVAL starts polling and the SIGHUP handler"""
+    monkeypatch.setenv("TEMPLATE_RELOAD_INTERVAL", "0.05")
+    handler = signal.getsignal(signal.SIGHUP)
+    try:
+        center = ServiceCenterInitializer.initialize("offline")
+        reloader = center.template_reloader
+        try:
+            assert reloader.interval == 0.05
+            assert reloader._thread.is_alive()
+            assert signal.getsignal(signal.SIGHUP) is not handler
+        finally:
+            reloader.stop()
+    finally:
+        signal.signal(signal.SIGHUP, handler)
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from core.entity.action_context import ActionContext
+from core.entity.role import Role
+from core.entity.slot_store import SlotDefinition
+from core.entity.target import Target
+from service.event_action_registry import EventActionRegistry
+from service.speculation_service import SpeculationService
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+STATE = "restaurant_recommendation"
+
+
+@pytest.fixture
+def role():
+    role = Role.from_template(ROLE_TEMPLATE)
+    EventActionRegistry().bind_role(role)
+    return role
+
+
+@pytest.fixture
+def context():
+    target = Target(
+        name="user",
+        description="",
+        slot_definitions=[SlotDefinition(name="price_range", type="list")],
+    )
+    return ActionContext(user_query="hi", event="", state=STATE, target=target)
+
+
+def test_only_cacheable_events_are_candidates(role):
+    """Test events with side effects are never speculated on"""
+    service = SpeculationService()
+
+    assert service.candidates(role, STATE) == ["make_recommendation"]
+    assert service.candidates(role, "information_collection") == []
+
+
+def test_commit_matching_event(role, context):
+    """Test speculative responses are used when the event matches"""
+    service = SpeculationService()
+
+    speculation = service.start(role, context)
+    assert speculation.commit("make_recommendation") == ["True"]
+
+    speculation = service.start(role, context)
+    assert speculation.commit("modify_preferences") is None
+
+    stats = service.stats()
+    assert (stats["turns"], stats["hits"], stats["misses"]) == (2, 1, 1)
+    assert stats["discarded"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_states_extracting_slots_are_not_speculated(role, context):
+    """Test actions reading the extracted slots do not run before detection"""
+    service = SpeculationService()
+    state = role.get_state(STATE)
+    state.extract_slots = ["price_range"]
+
+    assert service.candidates(role, STATE) == []
+    assert service.start(role, context) is None
+
+
+def test_changed_slots_discard_speculation(role, context):
+    """Test responses computed from stale slots are not used"""
+    service = SpeculationService()
+
+    speculation = service.start(role, context)
+    context.slots.set("price_range", [1, 2])
+
+    assert speculation.commit("make_recommendation") is None
+
+
+def test_priors_order_candidates(role):
+    service = SpeculationService(max_candidates=1)
+    calls = []
+    bound = role.get_bound_actions(STATE, "make_recommendation")[0]
+    slow = bound._replace(
+        function=lambda context: calls.append(context.event) or time.sleep(0.01)
+    )
+    role.action_table[(STATE, "modify_preferences")] = (slow,)
+    role.action_table[(STATE, "make_recommendation")] = (slow,)
+
+    for _ in range(2):
+        service.record(role.name, STATE, "modify_preferences", hit=False)
+    assert service.candidates(role, STATE) == ["modify_preferences"]
+
+    context = ActionContext(user_query="hi", event="", state=STATE)
+    speculation = service.start(role, context)
+    speculation.commit("modify_preferences")
+
+    assert calls == ["modify_preferences"]
+    assert service.stats()["latency_saved_ms"] > 0
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+import yaml
+
+from core.entity.role import Role
+from service.prompt_service import PromptService
+from service.template_store import TemplateStore
+
+
+def _write_role(path, next_state):
+    template = {
+        "role": {"name": f"role_to_{next_state}"},
+        "states": [
+            {
+                "name": "start",
+                "state_type": "start",
+                "transitions": [{"to": next_state, "priority": 1}],
+            },
+            {"name": next_state, "state_type": "end"},
+        ],
+    }
+    path.write_text(yaml.safe_dump(template))
+    # Make sure the modification time changes between writes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_reload_publishes_new_version(tmp_path):
+    """Test a changed template is reloaded while old versions stay intact"""
+    role_path = tmp_path / "role.yaml"
+    _write_role(role_path, "first")
+    store = TemplateStore()
+
+    pinned = store.get_role(str(role_path))
+    assert pinned.version == 1
+    assert store.reload() == []
+
+    _write_role(role_path, "second")
+    reloaded = store.reload()
+
+    assert [t.version for t in reloaded] == [2]
+    assert store.get_role(str(role_path)).version == 2
+    assert Role.from_template_data(pinned.data).name == "role_to_first"
+    assert Role.from_template_data(reloaded[0].data).name == "role_to_second"
+
+
+def test_invalid_reload_keeps_previous_version(tmp_path):
+    """Test a template failing validation does not replace the served version"""
+    role_path = tmp_path / "role.yaml"
+    _write_role(role_path, "first")
+    store = TemplateStore()
+    store.get_role(str(role_path))
+
+    role_path.write_text(yaml.safe_dump({"states": [{"name": "orphan"}]}))
+    stat = os.stat(role_path)
+    os.utime(role_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+
+    assert store.reload() == []
+    assert store.get_role(str(role_path)).version == 1
+
+
+def test_invalid_template_rejected_on_first_load(tmp_path):
+    role_path = tmp_path / "role.yaml"
+    role_path.write_text(yaml.safe_dump({"states": []}))
+
+    with pytest.raises(ValueError):
+        TemplateStore().get_role(str(role_path))
+
+
+def test_prompt_snapshot_pinning():
+    """Test a pinned prompt snapshot keeps rendering its own version"""
+    prompt_service = PromptService()
+    prompt_service.add_template("pinned_template", {"prompt": "v1 {name}"})
+    pinned = prompt_service.snapshot()
+
+    prompt_service.add_template("pinned_template", {"prompt": "v2 {name}"})
+
+    assert prompt_service.snapshot().version == pinned.version + 1
+    assert (
+        prompt_service.build_prompt_from_template("pinned_template", pinned, name="a")
+        == "v1 a"
+    )
+    assert (
+        prompt_service.build_prompt_from_template("pinned_template", name="a") == "v2 a"
+    )
+
+    prompt_service.remove_template("pinned_template")
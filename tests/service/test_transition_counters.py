@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from core.entity.agent import Agent
+from service import service_center
+from service.transition_counters import TransitionCounters, histogram_percentile
+from utils.metrics import MetricsRegistry
+from utils.thread_shards import ThreadShards
+
+ROLE = "wonderland_restaurant_guide"
+
+
+def test_thread_shards_are_per_thread():
+    """Test each thread updates its own shard and readers see all of them"""
+    shards = ThreadShards(list)
+
+    def work():
+        shards.local().append(1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shards.local().append(1)
+
+    assert len(shards.shards()) == 5
+    assert sum(len(shard) for shard in shards.shards()) == 5
+
+    shards.reset()
+    assert shards.shards() == []
+
+
+def test_histogram_percentile():
+    """Test percentiles interpolate inside the bucket holding the rank"""
+    buckets = (0.1, 0.2, 0.4)
+
+    assert histogram_percentile([0, 0, 0, 0], 95, buckets) is None
+    assert histogram_percentile([10, 0, 0, 0], 50, buckets) == pytest.approx(0.05)
+    assert histogram_percentile([0, 10, 0, 0], 100, buckets) == pytest.approx(0.2)
+    # Values above the last bound are reported as the last bound
+    assert histogram_percentile([1, 0, 0, 9], 95, buckets) == 0.4
+
+
+def test_snapshot_merges_threads():
+    """Test counters recorded on several threads add up in the snapshot"""
+    counters = TransitionCounters(buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(100):
+            counters.record_turn(ROLE, "collect", 0.05)
+            counters.record_transition(ROLE, "collect", "recommend", 2.0)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counters.record_turn(ROLE, "recommend", 0.5)
+
+    snapshot = counters.snapshot()
+    role = snapshot["roles"][ROLE]
+    assert snapshot["latency_buckets"] == [0.1, 1.0]
+    assert role["transitions"] == [{"from": "collect", "to": "recommend", "count": 400}]
+
+    collect = role["states"]["collect"]
+    assert collect["turns"] == 400
+    assert collect["latency_counts"] == [400, 0, 0]
+    assert collect["latency_mean"] == pytest.approx(0.05)
+    assert collect["dwell_mean"] == pytest.approx(2.0)
+    assert collect["visits_ended"] == 400
+
+    recommend = role["states"]["recommend"]
+    assert recommend["turns"] == 1
+    assert 0.1 < recommend["latency_p95"] <= 1.0
+    assert recommend["dwell_mean"] is None
+
+
+def test_write_snapshot(tmp_path):
+    """Test the snapshot is written as JSON and counters can be reset"""
+    counters = TransitionCounters()
+    counters.record_turn(ROLE, "collect", 0.2)
+    path = tmp_path / "counters.json"
+
+    counters.write_snapshot(str(path))
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)["roles"][ROLE]["states"]["collect"]["turns"] == 1
+
+    counters.reset()
+    assert counters.snapshot()["roles"] == {}
+
+
+def test_snapshots_are_served_and_dumped(tmp_path):
+    """Test snapshots reach the admin route and the periodic dump"""
+    counters = TransitionCounters()
+    counters.record_transition(ROLE, "collect", "recommend", 1.0)
+    registry = MetricsRegistry()
+    counters.register_route(registry)
+    server = registry.start_http_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/admin/transitions"
+        with urllib.request.urlopen(url) as response:
+            transitions = json.loads(response.read())["roles"][ROLE]["transitions"]
+        assert transitions == [{"from": "collect", "to": "recommend", "count": 1}]
+    finally:
+        registry.stop_http_server()
+
+    path = tmp_path / "counters.json"
+    counters.start_file_dump(str(path), interval=0.05)
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.01)
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)["roles"][ROLE]["transitions"][0]["count"] == 1
+
+
+def test_agent_records_transitions(mock_role):
+    """Test agents count their transitions and the time spent in the state left"""
+    counters = service_center.transition_counters
+    counters.reset()
+    agent = Agent(
+        goal="test goal",
+        agent_name="test agent",
+        description="test description",
+        role=mock_role,
+        current_state=mock_role.get_init_state(),
+    )
+
+    assert agent.transition_to("next")
+    role = counters.snapshot()["roles"][mock_role.name]
+    assert role["transitions"] == [{"from": "start", "to": "next", "count": 1}]
+    assert role["states"]["start"]["dwell_mean"] >= 0.0
+    counters.reset()
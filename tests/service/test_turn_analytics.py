@@ -0,0 +1,127 @@
+import pytest
+
+from service import turn_analytics
+from service.turn_analytics import TurnAnalytics
+from service.turn_log import TurnLog, TurnRecord
+
+
+def _turn(engagement_id, before, after, event, seconds=1.0, outcome="ok"):
+    return TurnRecord(
+        engagement_id=engagement_id,
+        state_before=before,
+        state_after=after,
+        event=event,
+        actions=[],
+        timestamp=0.0,
+        turn_seconds=seconds,
+        intent_seconds=seconds / 2,
+        actions_seconds=seconds / 4,
+        outcome=outcome,
+        query="",
+        reply="",
+        slots={},
+    )
+
+
+@pytest.fixture
+def turn_log(tmp_path):
+    log = TurnLog(str(tmp_path), segment_bytes=256)
+    for i in range(4):
+        engagement = f"e{i}"
+        log.append_turn(
+            _turn(
+                engagement,
+                "information_collection",
+                "information_collection",
+                "collect_info",
+                1.0,
+            )
+        )
+        if i < 3:
+            log.append_turn(
+                _turn(
+                    engagement,
+                    "information_collection",
+                    "restaurant_recommendation",
+                    "collect_info",
+                    2.0,
+                )
+            )
+        if i < 2:
+            log.append_turn(
+                _turn(
+                    engagement,
+                    "restaurant_recommendation",
+                    "success",
+                    "make_recommendation",
+                    3.0,
+                )
+            )
+    log.append_turn(
+        _turn(
+            "e3",
+            "information_collection",
+            "error",
+            "default_fallback_event",
+            4.0,
+            "error",
+        )
+    )
+    yield log
+    log.close()
+
+
+def test_report(tmp_path, turn_log):
+    """Test the aggregates over turns spread across segments"""
+    analytics = TurnAnalytics(str(tmp_path))
+    report = analytics.report(
+        funnel=["information_collection", "restaurant_recommendation", "success"]
+    )
+
+    assert report["turns"] == 10
+    assert report["engagements"] == 4
+    assert report["outcomes"] == {"ok": 9, "shed": 0, "error": 1}
+    assert [(s["state"], s["engagements"]) for s in report["funnel"]] == [
+        ("information_collection", 4),
+        ("restaurant_recommendation", 3),
+        ("success", 2),
+    ]
+    assert report["funnel"][-1]["conversion"] == 0.5
+    latencies = report["latency_percentiles"]["information_collection"]
+    assert latencies["turns"] == 8
+    assert latencies["turn_seconds"]["p50"] == 1.5
+    assert latencies["intent_seconds"]["p99"] == pytest.approx(2.0, abs=0.1)
+    assert report["event_distribution"]["information_collection"] == {
+        "collect_info": 7,
+        "default_fallback_event": 1,
+    }
+    assert report["fallback_rate"]["overall"] == 0.1
+    assert report["fallback_rate"]["per_state"]["restaurant_recommendation"] == 0.0
+
+
+def test_incremental_refresh(tmp_path, turn_log, monkeypatch):
+    """Test sealed segments come from the cache and refreshes only read new turns"""
+    TurnAnalytics(str(tmp_path))
+    scanned = []
+    scan_segment = turn_analytics.scan_segment
+
+    def counting_scan(path, resume=None):
+        scanned.append((path, resume.offset if resume else None))
+        return scan_segment(path, resume)
+
+    monkeypatch.setattr(turn_analytics, "scan_segment", counting_scan)
+    analytics = TurnAnalytics(str(tmp_path))
+    # Only the open segment is read, the sealed ones are cached
+    assert scanned == [(turn_log.segment_path, None)]
+    assert len(analytics) == 10
+
+    turn_log.append_turn(
+        _turn("e4", "information_collection", "success", "collect_info")
+    )
+    scanned.clear()
+    assert analytics.refresh() >= 1
+    assert len(analytics) == 11
+    assert scanned[0][1] is not None
+    assert (
+        analytics.funnel(["information_collection", "success"])[1]["engagements"] == 3
+    )
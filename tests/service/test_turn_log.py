@@ -0,0 +1,155 @@
+import errno
+import os
+import threading
+import time
+
+import pytest
+
+from service import service_center
+from service.llm_service import RecordedInference
+from service.template_store import TemplateStore
+from service.turn_log import (
+    TURN_LOG_FSYNC_SECONDS,
+    CreateRecord,
+    DeleteRecord,
+    TurnLog,
+    TurnRecord,
+    read_turn_log,
+    segment_paths,
+)
+from service.user_engagement_service import UserEngagementService
+
+AGENT_TEMPLATE = "./src/config/agent_template/restaurant_guide_agent.yaml"
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+TARGET_TEMPLATE = "./src/config/target_template/user.yaml"
+
+
+def _turn(engagement_id, i=0):
+    return TurnRecord(
+        engagement_id=engagement_id,
+        state_before="information_collection",
+        state_after="restaurant_recommendation",
+        event="collect_info",
+        actions=["extract_mentioned_slots", "ask_geo_location"],
+        timestamp=1700000000.0 + i,
+        turn_seconds=0.5,
+        intent_seconds=0.25,
+        actions_seconds=0.125,
+        outcome="ok",
+        query=f"query {i}",
+        reply=f"reply {i} ✓",
+        slots={"price_range": [1, 2]},
+    )
+
+
+def test_round_trip_across_segments(tmp_path):
+    """Test records survive segment rotation and read back in order"""
+    log = TurnLog(str(tmp_path), segment_bytes=512)
+    log.append_create(["e1", "e2"], AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE)
+    for i in range(20):
+        log.append_turn(_turn("e1", i))
+    log.append_delete("e2")
+    log.close()
+
+    assert len(segment_paths(str(tmp_path))) > 1
+    records = list(read_turn_log(str(tmp_path)))
+    assert [type(r) for r in records[:2]] == [CreateRecord, CreateRecord]
+    assert records[1].engagement_id == "e2"
+    assert records[1].role_template == ROLE_TEMPLATE
+    assert records[2:22] == [_turn("e1", i) for i in range(20)]
+    assert isinstance(records[-1], DeleteRecord)
+
+    # A new writer starts a new segment instead of appending
+    segments = len(segment_paths(str(tmp_path)))
+    TurnLog(str(tmp_path)).close()
+    assert len(segment_paths(str(tmp_path))) == segments + 1
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    log = TurnLog(str(tmp_path))
+    for i in range(3):
+        log.append_turn(_turn("e1", i))
+    log.close()
+    path = segment_paths(str(tmp_path))[-1]
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    assert list(read_turn_log(str(tmp_path))) == [_turn("e1", 0), _turn("e1", 1)]
+
+
+def test_concurrent_appends_share_commits(tmp_path):
+    """Test durable appends from many threads are committed in groups"""
+    log = TurnLog(str(tmp_path), commit_interval=0.005)
+    commits = TURN_LOG_FSYNC_SECONDS.count()
+
+    def append(thread):
+        for i in range(25):
+            log.append_turn(_turn(f"e{thread}", i))
+
+    threads = [threading.Thread(target=append, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.close()
+
+    assert len(list(read_turn_log(str(tmp_path)))) == 200
+    assert TURN_LOG_FSYNC_SECONDS.count() - commits < 200
+
+
+def test_failed_fsync_fails_appends(tmp_path, monkeypatch):
+    """Test appends raise the commit failure instead of waiting forever"""
+    log = TurnLog(str(tmp_path), commit_timeout=2.0)
+    log.append_turn(_turn("e1"))
+
+    def full_disk(_fd):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "fsync", full_disk)
+    started = time.perf_counter()
+    with pytest.raises(OSError) as failure:
+        log.append_turn(_turn("e1", 1))
+    assert failure.value.errno == errno.ENOSPC
+    assert time.perf_counter() - started < 1.0
+    with pytest.raises(OSError):
+        log.append_turn(_turn("e1", 2))
+    monkeypatch.undo()
+    log.close()
+
+
+@pytest.fixture
+def logged_services(tmp_path):
+    llm, turn_log = service_center.llm_service, service_center.turn_log
+    log = TurnLog(str(tmp_path))
+    service_center.use_turn_log(log)
+    yield log
+    log.close()
+    service_center.use_turn_log(turn_log)
+    service_center.use_llm_service(llm)
+
+
+def test_recover_engagements(tmp_path, logged_services):
+    """Test engagements are rebuilt from the log after a restart"""
+    service_center.use_llm_service(
+        RecordedInference(["collect_info", "collect_info", "collect_info"])
+    )
+    engagements = UserEngagementService(template_store=TemplateStore())
+    kept, deleted = engagements.create_engagements(
+        2, AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE
+    )
+    agent = engagements.get_agent_with_engagement_id(kept)
+    agent.interact("Food near 37.77, -122.41, I pay with visa")
+    agent.interact("$$ please, 4 stars or more")
+    engagements.get_agent_with_engagement_id(deleted).interact("hi")
+    engagements.delete_engagement(deleted)
+    logged_services.close()
+
+    recovered = UserEngagementService(template_store=TemplateStore())
+    assert recovered.recover_from_turn_log(str(tmp_path)) == [kept]
+    context = recovered.get_context(kept)
+    assert context.agent.current_state.name == agent.current_state.name
+    assert context.agent.completed_states == agent.completed_states
+    assert agent.target.slots.filled()
+    assert context.target.slots.filled() == agent.target.slots.filled()
+    assert list(context.interaction_his) == list(agent.interaction_history)
+    assert recovered.get_context(deleted) is None
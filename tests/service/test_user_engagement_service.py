@@ -0,0 +1,71 @@
+import pytest
+
+from core.entity.state import StateStatus
+from service.template_store import TemplateStore
+from service.user_engagement_service import UserEngagementService
+
+AGENT_TEMPLATE = "./src/config/agent_template/restaurant_guide_agent.yaml"
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+TARGET_TEMPLATE = "./src/config/target_template/user.yaml"
+
+
+@pytest.fixture
+def engagements():
+    return UserEngagementService(template_store=TemplateStore())
+
+
+def test_create_engagements_batch(engagements):
+    """Test a batch creates independent engagements playing one shared role"""
+    ids = engagements.create_engagements(
+        100, AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE
+    )
+
+    assert len(set(ids)) == 100
+    contexts = [engagements.get_context(engagement_id) for engagement_id in ids]
+    first, second = contexts[0], contexts[1]
+    assert first.agent.role is second.agent.role
+    assert first.agent.role.action_table is not None
+    assert first.target is not second.target
+    assert first.agent.target is first.target
+    assert first.target.engagement_id == ids[0]
+    assert first.interaction_his is first.agent.interaction_history
+    assert first.interaction_his is not second.interaction_his
+    assert first.template_versions == {
+        "agent": 1,
+        "role": 1,
+        "target": 1,
+        "prompts": first.agent.prompt_snapshot.version,
+    }
+
+    first.target.slots.set("credit_card_issuer", "visa")
+    assert not second.target.slots.is_filled("credit_card_issuer")
+
+
+def test_single_engagements_share_the_role(engagements):
+    """Test state status is tracked per engagement, not on the shared role"""
+    first = engagements.get_agent_with_engagement_id(
+        engagements.create_engagement(AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE)
+    )
+    second = engagements.get_agent_with_engagement_id(
+        engagements.create_engagement(AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE)
+    )
+    assert first.role is second.role
+
+    state = first.current_state.name
+    first.completed_states.add(state)
+    assert first.get_state_status(state) == StateStatus.COMPLETED
+    assert second.get_state_status(state) == StateStatus.IN_PROGRESS
+    assert second.get_state_status("success") == StateStatus.NOT_STARTED
+
+
+def test_create_no_engagements(engagements):
+    assert (
+        engagements.create_engagements(
+            0, AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE
+        )
+        == []
+    )
+    with pytest.raises(ValueError):
+        engagements.create_engagements(
+            -1, AGENT_TEMPLATE, ROLE_TEMPLATE, TARGET_TEMPLATE
+        )
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tools are scripts run with src on the Python path, import them by file name
+tools_dir = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "tools",
+)
+sys.path.insert(0, tools_dir)
@@ -0,0 +1,10 @@
+from compile_role import main
+
+ROLE_TEMPLATE = "./src/config/role_template/restaurant_guide_role.yaml"
+
+
+def test_out_dir_is_created(tmp_path):
+    out_dir = tmp_path / "artifacts" / "roles"
+
+    assert main(["--out-dir", str(out_dir), ROLE_TEMPLATE]) == 0
+    assert (out_dir / "restaurant_guide_role.rolec").is_file()
@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+from service import service_center
+from replay import DEFAULT_TEMPLATES, replay
+from utils.logging import logging
+
+CONVERSATION = {
+    "id": "conv-1",
+    "turns": [
+        {"query": "near 37.77, -122.41", "event": "collect_info"},
+        {"query": "no idea", "event": "default_fallback_event"},
+    ],
+}
+
+
+@pytest.fixture
+def replay_in_process():
+    """Restore what the in-process replay worker replaces"""
+    llm = service_center.llm_service
+    level = logging.getLogger().level
+    yield
+    service_center.use_llm_service(llm)
+    logging.getLogger().setLevel(level)
+
+
+def _replay(lines, workers=0):
+    output = io.StringIO()
+    summary = replay(
+        lines,
+        output,
+        workers=workers,
+        max_in_flight=2,
+        default_templates=DEFAULT_TEMPLATES,
+    )
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    return summary, results
+
+
+def test_replay_records_state_path(replay_in_process):
+    summary, results = _replay([json.dumps(CONVERSATION)])
+
+    assert results[0]["id"] == "conv-1"
+    assert results[0]["state_path"][0] == "information_collection"
+    assert [turn["event"] for turn in results[0]["turns"]] == [
+        "collect_info",
+        "default_fallback_event",
+    ]
+    assert (summary["conversations"], summary["failed_conversations"]) == (1, 0)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_bad_conversations_do_not_abort_the_replay(replay_in_process, workers):
+    """Test malformed lines and unknown templates are reported as failures"""
+    lines = [
+        json.dumps(CONVERSATION),
+        '{"id": "truncated", "turns": [',
+        json.dumps({"id": "missing", "templates": {"role": "missing.yaml"}}),
+        json.dumps({**CONVERSATION, "id": "conv-2"}),
+    ]
+
+    summary, results = _replay(lines, workers=workers)
+
+    by_id = {result["id"]: result for result in results}
+    assert len(results) == 4
+    assert by_id[None]["error"].startswith("JSONDecodeError")
+    assert "missing.yaml" in by_id["missing"]["error"]
+    assert "error" not in by_id["conv-1"] and "error" not in by_id["conv-2"]
+    assert (summary["conversations"], summary["failed_conversations"]) == (4, 2)
+    assert summary["turns"] == 4
@@ -0,0 +1,44 @@
+from utils.deadline import SKIPPED_ACTION, Deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_counts_down():
+    """Test the remaining budget shrinks with the clock and stops at zero"""
+    clock = FakeClock()
+    deadline = Deadline(2.0, clock=clock)
+
+    assert deadline.remaining() == 2.0
+    clock.now += 1.5
+    assert deadline.remaining() == 0.5
+    assert not deadline.expired()
+    clock.now += 1.0
+    assert deadline.remaining() == 0.0
+    assert deadline.expired()
+
+
+def test_deadline_of():
+    """Test budgets in seconds become deadlines and deadlines pass through"""
+    deadline = Deadline(1.0)
+
+    assert Deadline.of(None) is None
+    assert Deadline.of(deadline) is deadline
+    assert Deadline.of(3).budget == 3.0
+
+
+def test_degradations_are_recorded_in_order():
+    deadline = Deadline(1.0)
+
+    deadline.degrade("local_intent")
+    deadline.degrade(SKIPPED_ACTION, "generate_recommendation")
+
+    assert deadline.degradations == [
+        "local_intent",
+        "skipped_action:generate_recommendation",
+    ]
@@ -0,0 +1,115 @@
+import io
+import json
+import logging
+import queue
+import sys
+
+from utils.logging import (
+    DroppingQueueHandler,
+    JsonFormatter,
+    RateLimitFilter,
+    SamplingFilter,
+    bind_log_context,
+    configure_logging,
+    reset_log_context,
+)
+
+
+def make_record(name="ext.collect_info", level=logging.INFO, msg="hi", args=()):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_configure_logging_writes_json_with_context():
+    """Test records are written by the listener as JSON with the bound fields"""
+    stream = io.StringIO()
+    pipeline = configure_logging(level="INFO", json_format=True, stream=stream)
+    try:
+        tokens = bind_log_context(engagement_id="e1", state="collect", event="ask")
+        logging.getLogger("ext.collect_info").info(
+            "Collected %s", "cuisine", extra={"slot": "cuisine"}
+        )
+        reset_log_context(tokens)
+        logging.getLogger("ext.collect_info").info("No context")
+        pipeline.stop()
+    finally:
+        configure_logging()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == "Collected cuisine"
+    assert first["logger"] == "ext.collect_info"
+    assert (first["engagement_id"], first["state"], first["event"]) == (
+        "e1",
+        "collect",
+        "ask",
+    )
+    assert first["slot"] == "cuisine"
+    assert "engagement_id" not in second
+
+
+def test_queue_handler_drops_when_full():
+    """Test a full queue drops records instead of blocking the caller"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_queue_handler_formats_lazily():
+    """Test immutable arguments are left for the listener to interpolate"""
+    handler = DroppingQueueHandler(queue.Queue())
+    slots = {"cuisine": "thai"}
+
+    lazy = handler.prepare(make_record(msg="Collected %s", args=("cuisine",)))
+    eager = handler.prepare(make_record(msg="Slots %s", args=(slots,)))
+    slots["cuisine"] = "pizza"
+
+    assert lazy.args == ("cuisine",)
+    assert eager.args is None
+    assert eager.getMessage() == "Slots {'cuisine': 'thai'}"
+
+
+def test_sampling_filter():
+    """Test only records below WARNING of sampled loggers are dropped"""
+
+    class FixedRandom:
+        def random(self):
+            return 0.5
+
+    sampling = SamplingFilter({"ext": 0.1, "ext.collect_info": 0.9}, rng=FixedRandom())
+
+    assert sampling.filter(make_record())
+    assert not sampling.filter(make_record(name="ext.make_recommendation"))
+    assert sampling.filter(make_record(name="ext.other", level=logging.WARNING))
+    assert sampling.filter(make_record(name="service.prompt_service"))
+
+
+def test_rate_limit_filter():
+    """Test a logger is limited per second and reports what it suppressed"""
+    now = [0.0]
+    limiter = RateLimitFilter({"ext": 2}, clock=lambda: now[0])
+
+    passed = [limiter.filter(make_record()) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.filter(make_record(level=logging.ERROR))
+
+    now[0] = 1.0
+    record = make_record()
+    assert limiter.filter(record)
+    assert record.suppressed == 3
+
+
+def test_json_formatter_renders_exceptions():
+    """Test tracebacks rendered on the logging thread are kept"""
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord(
+            "ext", logging.ERROR, __file__, 1, "failed", (), sys.exc_info()
+        )
+
+    entry = json.loads(JsonFormatter().format(handler.prepare(record)))
+    assert "ValueError: boom" in entry["exc_info"]
@@ -0,0 +1,109 @@
+import threading
+import urllib.request
+
+import pytest
+
+from utils.metrics import Metric, MetricsRegistry
+
+
+def test_counter_sums_threads():
+    """Test counter increments from several threads add up"""
+    registry = MetricsRegistry()
+    turns = registry.counter("turns", "Turns handled", ["outcome"])
+
+    def work():
+        for _ in range(1000):
+            turns.inc(outcome="ok")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    turns.inc(2, outcome="error")
+
+    assert turns.value(outcome="ok") == 4000
+    assert turns.value(outcome="error") == 2
+    with pytest.raises(ValueError):
+        turns.inc(-1, outcome="ok")
+    with pytest.raises(ValueError):
+        turns.inc(state="ok")
+
+
+def test_registry_reuses_metrics():
+    """Test declaring a metric twice returns it, unless the type differs"""
+    registry = MetricsRegistry()
+
+    assert registry.counter("turns", "Turns") is registry.counter("turns", "Turns")
+    with pytest.raises(ValueError):
+        registry.gauge("turns", "Turns")
+
+
+def test_exposition_format():
+    """Test metrics render in the Prometheus text format"""
+    registry = MetricsRegistry()
+    registry.counter("turns", "Turns handled", ["role"]).inc(role='say "hi"')
+    active = registry.gauge("active", "Active engagements")
+    active.inc()
+    active.inc()
+    active.dec()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    lines = registry.exposition().splitlines()
+    assert "# TYPE active gauge" in lines
+    assert "active 1.0" in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1.0' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2.0' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3.0' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3.0" in lines
+    assert 'turns_total{role="say \\"hi\\""} 1.0' in lines
+    assert latency.count() == 3
+
+
+def test_metrics_must_implement_samples():
+    class Untyped(Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("untyped", "No samples")
+
+
+def test_gauge_function():
+    """Test gauges can be read from a function when collected"""
+    registry = MetricsRegistry()
+    engagements = {"a": 1, "b": 2}
+    registry.gauge("engagements", "Engagements").set_function(lambda: len(engagements))
+
+    assert "engagements 2.0" in registry.exposition().splitlines()
+
+
+def test_write_text(tmp_path):
+    """Test the exposition can be dumped to a file"""
+    registry = MetricsRegistry()
+    registry.counter("turns", "Turns").inc()
+    path = tmp_path / "metrics.prom"
+
+    registry.write_text(str(path))
+
+    assert "turns_total 1.0" in path.read_text(encoding="utf-8")
+
+
+def test_http_server_routes():
+    """Test /metrics and registered routes are served"""
+    registry = MetricsRegistry()
+    registry.counter("turns", "Turns").inc()
+    registry.register_route("/admin/ping", lambda: ("text/plain", "pong"))
+    server = registry.start_http_server(0)
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert "turns_total 1.0" in response.read().decode("utf-8")
+        with urllib.request.urlopen(f"{base}/admin/ping") as response:
+            assert response.read() == b"pong"
+    finally:
+        registry.stop_http_server()
@@ -0,0 +1,14 @@
+from utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 11
+
+
+def test_truncate_to_tokens_cuts_at_boundaries():
+    """Test the kept tail starts at a line, else at a word"""
+    assert truncate_to_tokens("short", 2) == "short"
+    assert truncate_to_tokens("first line\nsecond line", 4) == "second line"
+    assert truncate_to_tokens("one two three four five", 3) == "four five"
+    assert truncate_to_tokens("word " + "x" * 20, 2) == ""
@@ -0,0 +1,112 @@
+"""Benchmark creating engagements one by one against creating them in a batch.
+
+Each path creates the same number of engagements in a fresh engagement service
+and reports the throughput and the memory allocated per engagement. The per
+call path is what ``create_engagement`` costs in a loop, the batch path is one
+``create_engagements`` call.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/bench_engagements.py -n 50000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# Engagements are never run, but the service center builds a client
+os.environ.setdefault("OPENAI_API_KEY", "offline-bench")
+
+# pylint:disable=wrong-import-position
+from service.user_engagement_service import UserEngagementService
+
+DEFAULT_TEMPLATES = {
+    "agent": "./src/config/agent_template/restaurant_guide_agent.yaml",
+    "role": "./src/config/role_template/restaurant_guide_role.yaml",
+    "target": "./src/config/target_template/user.yaml",
+}
+
+
+def per_call(service: UserEngagementService, n: int, templates: Dict[str, str]):
+    """Create n engagements with one create_engagement call each."""
+    for _ in range(n):
+        service.create_engagement(
+            templates["agent"], templates["role"], templates["target"]
+        )
+
+
+def batch(service: UserEngagementService, n: int, templates: Dict[str, str]):
+    """Create n engagements with a single create_engagements call."""
+    service.create_engagements(
+        n, templates["agent"], templates["role"], templates["target"]
+    )
+
+
+def measure(
+    create: Callable, n: int, templates: Dict[str, str], trace_memory: bool
+) -> Dict:
+    """Time one creation path in a fresh engagement service.
+
+    Args:
+        create: per_call or batch
+        n: Number of engagements to create
+        templates: Agent, role and target template paths
+        trace_memory: Also measure allocations, which slows creation down
+
+    Returns:
+        Dict: Seconds, engagements per second and KiB allocated per engagement
+    """
+    service = UserEngagementService()
+    # Load the templates and bind the role outside of the measurement
+    service.delete_engagement(
+        service.create_engagement(
+            templates["agent"], templates["role"], templates["target"]
+        )
+    )
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    create(service, n, templates)
+    seconds = time.perf_counter() - started
+    result = {
+        "seconds": round(seconds, 3),
+        "engagements_per_second": round(n / seconds, 1),
+    }
+    if trace_memory:
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["kib_per_engagement"] = round(allocated / n / 1024, 2)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("-n", type=int, default=10_000, help="Engagements per path")
+    parser.add_argument("--agent", default=DEFAULT_TEMPLATES["agent"])
+    parser.add_argument("--role", default=DEFAULT_TEMPLATES["role"])
+    parser.add_argument("--target", default=DEFAULT_TEMPLATES["target"])
+    parser.add_argument(
+        "--memory", action="store_true", help="Measure allocations per engagement"
+    )
+    args = parser.parse_args(argv)
+
+    templates = {"agent": args.agent, "role": args.role, "target": args.target}
+    report = {
+        "engagements": args.n,
+        "per_call": measure(per_call, args.n, templates, args.memory),
+        "batch": measure(batch, args.n, templates, args.memory),
+    }
+    report["speedup"] = round(
+        report["per_call"]["seconds"] / report["batch"]["seconds"], 2
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
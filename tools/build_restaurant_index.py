@@ -0,0 +1,143 @@
+"""Build and benchmark the restaurant index behind generate_recommendation.
+
+Builds a memory-mapped index from a CSV file with the columns name, latitude,
+longitude, price (1-4), rating (0-5) and issuers (separated by ``;``), or from
+synthetic restaurants clustered around random cities. Point the service at
+the index with ``RESTAURANT_INDEX_DIR``.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/build_restaurant_index.py build restaurants/ \\
+        --csv restaurants.csv
+    PYTHONPATH=src python tools/build_restaurant_index.py build restaurants/ \\
+        --synthetic 1000000
+    PYTHONPATH=src python tools/build_restaurant_index.py bench restaurants/
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from core.restaurant_index import (
+    DEFAULT_ISSUERS,
+    RestaurantColumns,
+    RestaurantIndex,
+    synthetic_restaurants,
+)
+
+
+def read_csv(path: str) -> RestaurantColumns:
+    """Read restaurants from a CSV file.
+
+    Raises:
+        ValueError: If a row names an unknown card issuer
+    """
+    names, latitude, longitude, price, rating, issuers = [], [], [], [], [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            mask = 0
+            for issuer in filter(None, row.get("issuers", "").split(";")):
+                issuer = issuer.strip().lower()
+                if issuer not in DEFAULT_ISSUERS:
+                    raise ValueError(f"Unknown issuer {issuer} of {row['name']}")
+                mask |= 1 << DEFAULT_ISSUERS.index(issuer)
+            names.append(row["name"])
+            latitude.append(float(row["latitude"]))
+            longitude.append(float(row["longitude"]))
+            price.append(int(row["price"]))
+            rating.append(float(row["rating"]))
+            issuers.append(mask)
+    return RestaurantColumns(
+        names=names,
+        latitude=np.array(latitude),
+        longitude=np.array(longitude),
+        price=np.array(price),
+        rating=np.array(rating),
+        issuers=np.array(issuers),
+    )
+
+
+def build(args) -> dict:
+    """Build an index from a CSV file or synthetic restaurants."""
+    started = time.perf_counter()
+    if args.csv:
+        columns = read_csv(args.csv)
+    else:
+        columns = synthetic_restaurants(args.synthetic, seed=args.seed)
+    loaded = time.perf_counter()
+    index = RestaurantIndex.build(args.directory, columns, cell_size=args.cell_size)
+    return {
+        "restaurants": len(index),
+        "cells": int(len(index.cell_ids)),
+        "read_seconds": round(loaded - started, 3),
+        "build_seconds": round(time.perf_counter() - loaded, 3),
+    }
+
+
+def bench(args) -> dict:
+    """Time queries around random restaurants of an index."""
+    started = time.perf_counter()
+    index = RestaurantIndex.load(args.directory)
+    load_ms = (time.perf_counter() - started) * 1000
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(0, len(index), args.queries)
+
+    timings, results = [], 0
+    for row in rows:
+        price_low = int(rng.integers(1, 5))
+        started = time.perf_counter()
+        restaurants = index.query(
+            float(index.latitude[row]),
+            float(index.longitude[row]),
+            radius_km=args.radius,
+            price_range=[price_low, min(price_low + 1, 4)],
+            rating_range=[3.5, 5.0],
+            issuer=DEFAULT_ISSUERS[int(rng.integers(len(DEFAULT_ISSUERS)))],
+        )
+        timings.append(time.perf_counter() - started)
+        results += len(restaurants)
+
+    timings_ms = np.array(timings) * 1000
+    return {
+        "restaurants": len(index),
+        "queries": args.queries,
+        "load_ms": round(load_ms, 3),
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 3),
+        "queries_per_second": round(args.queries / (timings_ms.sum() / 1000), 1),
+        "mean_results": round(results / args.queries, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Build an index")
+    build_parser.add_argument("directory", help="Directory to write the index to")
+    source = build_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file of restaurants")
+    source.add_argument("--synthetic", type=int, help="Number of fake restaurants")
+    build_parser.add_argument("--cell-size", type=float, default=0.05)
+    build_parser.add_argument("--seed", type=int)
+    build_parser.set_defaults(run=build)
+
+    bench_parser = commands.add_parser("bench", help="Benchmark queries")
+    bench_parser.add_argument("directory", help="Directory of the index")
+    bench_parser.add_argument("--queries", type=int, default=10_000)
+    bench_parser.add_argument("--radius", type=float, default=5.0)
+    bench_parser.add_argument("--seed", type=int)
+    bench_parser.set_defaults(run=bench)
+
+    args = parser.parse_args(argv)
+    print(json.dumps(args.run(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Profile the memory engagements retain as their conversations go on.
+
+Creates engagements, runs simulated turns through them with recorded intents,
+and reports the retained bytes per engagement and component before and after
+the turns, the role and cache memory, and the source lines whose allocations
+grew the most in between according to tracemalloc. With ``--max-turn-bytes``
+the tool fails when an engagement grows by more per turn, to catch growth
+regressions in CI.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/memory_profile.py -n 200 --turns 50
+    PYTHONPATH=src python tools/memory_profile.py --turns 100 --max-turn-bytes 512
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Dict, List, Optional
+
+# Turns are answered by recorded intents, but the service center builds a client
+os.environ.setdefault("OPENAI_API_KEY", "offline-memory-profile")
+# The actions log every turn at INFO
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# pylint:disable=wrong-import-position
+from service import service_center
+from service.llm_service import RecordedInference
+from service.memory_profiler import allocation_diff, memory_report
+from service.user_engagement_service import UserEngagementService
+
+DEFAULT_TEMPLATES = {
+    "agent": "./src/config/agent_template/restaurant_guide_agent.yaml",
+    "role": "./src/config/role_template/restaurant_guide_role.yaml",
+    "target": "./src/config/target_template/user.yaml",
+}
+DEFAULT_QUERIES = [
+    "I'm looking for somewhere to eat tonight",
+    "Somewhere not too expensive, I pay with my visa card",
+    "Good reviews matter to me, at least four stars",
+    "Anything close to the city center works",
+]
+
+
+def run_turns(
+    service: UserEngagementService,
+    engagement_ids: List[str],
+    turns: int,
+    queries: List[str],
+) -> None:
+    """Send the queries in turn to every engagement."""
+    for turn in range(turns):
+        query = queries[turn % len(queries)]
+        for engagement_id in engagement_ids:
+            service.get_agent_with_engagement_id(engagement_id).interact(query)
+
+
+def profile(args) -> Dict:
+    """Create the engagements, run the turns and diff the memory."""
+    # Stay in information collection: every query carries the same intent
+    service_center.use_llm_service(RecordedInference(default_event=args.event))
+    service = UserEngagementService()
+    engagement_ids = service.create_engagements(
+        args.n, args.agent, args.role, args.target
+    )
+    gc.collect()
+    before = memory_report(service, sample=None, top=args.top)
+
+    tracemalloc.start(args.frames)
+    first = tracemalloc.take_snapshot()
+    run_turns(service, engagement_ids, args.turns, args.queries or DEFAULT_QUERIES)
+    gc.collect()
+    second = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    after = memory_report(service, sample=None, top=args.top)
+
+    growth = after["mean_bytes"]["total"] - before["mean_bytes"]["total"]
+    return {
+        "engagements": args.n,
+        "turns": args.turns,
+        "before": before["mean_bytes"],
+        "after": after["mean_bytes"],
+        "growth_per_turn": round(growth / args.turns, 1) if args.turns else 0.0,
+        "largest": after["largest"],
+        "shared_bytes": after["shared_bytes"],
+        "roles": after["roles"],
+        "caches": after["caches"],
+        "allocation_growth": allocation_diff(first, second, args.top),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("-n", type=int, default=100, help="Engagements to create")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per engagement")
+    parser.add_argument("--queries", nargs="+", help="Queries sent in turn")
+    parser.add_argument(
+        "--event", default="collect_info", help="Intent of every simulated turn"
+    )
+    parser.add_argument("--top", type=int, default=10, help="Entries per listing")
+    parser.add_argument(
+        "--frames", type=int, default=1, help="Frames tracemalloc keeps per block"
+    )
+    parser.add_argument(
+        "--max-turn-bytes",
+        type=float,
+        help="Fail when an engagement grows by more bytes per turn on average",
+    )
+    parser.add_argument("--agent", default=DEFAULT_TEMPLATES["agent"])
+    parser.add_argument("--role", default=DEFAULT_TEMPLATES["role"])
+    parser.add_argument("--target", default=DEFAULT_TEMPLATES["target"])
+    args = parser.parse_args(argv)
+
+    report = profile(args)
+    print(json.dumps(report, indent=2))
+    if args.max_turn_bytes is not None and (
+        report["growth_per_turn"] > args.max_turn_bytes
+    ):
+        print(
+            f"Engagements grow by {report['growth_per_turn']} bytes per turn, "
+            f"more than {args.max_turn_bytes}",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
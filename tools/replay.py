@@ -0,0 +1,337 @@
+"""Replay recorded conversations through fresh engagements on a process pool.
+
+Each input line is a JSON object::
+
+    {"id": "conv-1",
+     "templates": {"agent": "...", "role": "...", "target": "..."},
+     "turns": [{"query": "near 37.77, -122.41", "event": "collect_info"}, ...]}
+
+``templates`` falls back to the command line defaults and each turn's ``event``
+is the recorded intent returned by the offline LLM backend. One JSON result per
+conversation is written to the output with the state path and per-turn timings,
+and an aggregate throughput summary is printed to stderr. A conversation that
+cannot be replayed, e.g. a malformed line, is written as a failed result with
+its error instead of aborting the replay.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/replay.py transcripts.jsonl -o results.jsonl -w 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Optional
+
+# The replay never reaches the provider, but the service center builds a client
+os.environ.setdefault("OPENAI_API_KEY", "offline-replay")
+
+# pylint:disable=wrong-import-position
+from service import service_center
+from service.llm_service import RecordedInference
+from service.user_engagement_service import UserEngagementService
+from utils.logging import logging
+
+DEFAULT_TEMPLATES = {
+    "agent": "./src/config/agent_template/restaurant_guide_agent.yaml",
+    "role": "./src/config/role_template/restaurant_guide_role.yaml",
+    "target": "./src/config/target_template/user.yaml",
+}
+
+_worker_state: Dict = {}
+
+
+def _init_worker(log_level: str, llm_latency: float) -> None:
+    """Bind a recorded LLM backend and an engagement store to this process."""
+    logging.getLogger().setLevel(log_level)
+    llm = RecordedInference(latency=llm_latency)
+    service_center.use_llm_service(llm)
+    _worker_state["llm"] = llm
+    _worker_state["engagements"] = UserEngagementService()
+
+
+def failed_result(conversation_id: Optional[str], error: BaseException) -> Dict:
+    """Get the result of a conversation that could not be replayed.
+
+    Args:
+        conversation_id: ID of the conversation, None if it is unknown
+        error: Why the replay failed
+
+    Returns:
+        Dict: Result without states or turns, with the error
+    """
+    return {
+        "id": conversation_id,
+        "state_path": [],
+        "final_state": None,
+        "ended": False,
+        "turns": [],
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def replay_conversation(line: str, default_templates: Dict[str, str]) -> Dict:
+    """Replay one recorded conversation through a fresh engagement.
+
+    Args:
+        line: JSON encoded conversation
+        default_templates: Templates used when the conversation names none
+
+    Returns:
+        Dict: State path, per-turn timings and outcome of the conversation,
+            or a failed result if it could not be replayed
+    """
+    conversation_id = None
+    try:
+        conversation = json.loads(line)
+        conversation_id = conversation.get("id")
+        return _replay(conversation, default_templates)
+    except Exception as e:  # pylint:disable=broad-exception-caught
+        return failed_result(conversation_id, e)
+
+
+def _replay(conversation: Dict, default_templates: Dict[str, str]) -> Dict:
+    """Replay a parsed conversation, raising if it cannot be replayed."""
+    templates = {**default_templates, **conversation.get("templates", {})}
+    turns = conversation.get("turns", [])
+    llm: RecordedInference = _worker_state["llm"]
+    engagements: UserEngagementService = _worker_state["engagements"]
+
+    engagement_id = engagements.create_engagement(
+        agent_template_path=templates["agent"],
+        role_template_path=templates["role"],
+        target_template_path=templates["target"],
+    )
+    agent = engagements.get_agent_with_engagement_id(engagement_id)
+    llm.load(turn.get("event", llm.default_event) for turn in turns)
+
+    state_path = [agent.current_state.name]
+    turn_results = []
+    try:
+        for turn in turns:
+            state_before = agent.current_state.name
+            started = time.perf_counter()
+            response = agent.interact(turn.get("query", ""))
+            latency_ms = (time.perf_counter() - started) * 1000
+            state_after = agent.current_state.name
+            if state_after != state_before:
+                state_path.append(state_after)
+            turn_results.append(
+                {
+                    "event": turn.get("event"),
+                    "state_before": state_before,
+                    "state_after": state_after,
+                    "latency_ms": round(latency_ms, 3),
+                    "success": response.is_success,
+                }
+            )
+            if agent.is_in_end_state():
+                break
+    finally:
+        engagements.delete_engagement(engagement_id)
+
+    return {
+        "id": conversation.get("id"),
+        "state_path": state_path,
+        "final_state": state_path[-1],
+        "ended": agent.is_in_end_state(),
+        "turns": turn_results,
+    }
+
+
+class ReplaySummary:
+    """Aggregate throughput and latency over replayed conversations.
+
+    Turn latencies are kept in a fixed-size reservoir sample so memory stays
+    bounded regardless of the number of conversations.
+    """
+
+    def __init__(self, reservoir_size: int = 10000):
+        self.conversations = 0
+        self.failed_conversations = 0
+        self.turns = 0
+        self.failed_turns = 0
+        self.ended = 0
+        self.final_states: Dict[str, int] = {}
+        self._reservoir: List[float] = []
+        self._reservoir_size = reservoir_size
+        self._seen = 0
+        self._started = time.perf_counter()
+
+    def add(self, result: Dict) -> None:
+        """Add the result of one conversation."""
+        self.conversations += 1
+        if "error" in result:
+            self.failed_conversations += 1
+            return
+        self.ended += int(result["ended"])
+        final_state = result["final_state"]
+        self.final_states[final_state] = self.final_states.get(final_state, 0) + 1
+        for turn in result["turns"]:
+            self.turns += 1
+            self.failed_turns += int(not turn["success"])
+            self._sample(turn["latency_ms"])
+
+    def _sample(self, latency_ms: float) -> None:
+        self._seen += 1
+        if len(self._reservoir) < self._reservoir_size:
+            self._reservoir.append(latency_ms)
+            return
+        index = random.randrange(self._seen)
+        if index < self._reservoir_size:
+            self._reservoir[index] = latency_ms
+
+    def _percentile(self, values: List[float], percentile: float) -> Optional[float]:
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+        return round(values[index], 3)
+
+    def to_dict(self) -> Dict:
+        """Get the summary as a JSON serializable dictionary."""
+        elapsed = time.perf_counter() - self._started
+        latencies = sorted(self._reservoir)
+        return {
+            "conversations": self.conversations,
+            "failed_conversations": self.failed_conversations,
+            "turns": self.turns,
+            "failed_turns": self.failed_turns,
+            "ended_conversations": self.ended,
+            "final_states": self.final_states,
+            "elapsed_seconds": round(elapsed, 3),
+            "conversations_per_second": round(self.conversations / elapsed, 2),
+            "turns_per_second": round(self.turns / elapsed, 2),
+            "turn_latency_ms": {
+                "p50": self._percentile(latencies, 50),
+                "p95": self._percentile(latencies, 95),
+                "p99": self._percentile(latencies, 99),
+            },
+        }
+
+
+def replay(  # pylint:disable=too-many-locals
+    lines: Iterable[str],
+    output,
+    workers: int,
+    max_in_flight: int,
+    default_templates: Dict[str, str],
+    log_level: str = "WARNING",
+    llm_latency: float = 0.0,
+) -> Dict:
+    """Stream conversations through the replay workers.
+
+    At most ``max_in_flight`` conversations are submitted at once, so the input
+    is read lazily and memory stays flat for arbitrarily large files.
+
+    Args:
+        lines: JSON encoded conversations
+        output: Text stream receiving one JSON result per conversation
+        workers: Number of worker processes, 0 replays in this process
+        max_in_flight: Maximum number of submitted but unfinished conversations
+        default_templates: Templates used when a conversation names none
+        log_level: Log level inside the workers
+        llm_latency: Simulated seconds per LLM call
+
+    Returns:
+        Dict: Aggregate summary of the replay
+    """
+    summary = ReplaySummary()
+
+    def emit(result: Dict) -> None:
+        summary.add(result)
+        output.write(json.dumps(result) + "\n")
+
+    def emit_future(future) -> None:
+        # Failures are caught in the workers, this is a worker that died
+        try:
+            result = future.result()
+        except Exception as e:  # pylint:disable=broad-exception-caught
+            result = failed_result(None, e)
+        emit(result)
+
+    conversations = (line for line in lines if line.strip())
+
+    if workers == 0:
+        _init_worker(log_level, llm_latency)
+        for line in conversations:
+            emit(replay_conversation(line, default_templates))
+        return summary.to_dict()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(log_level, llm_latency),
+    ) as pool:
+        pending = set()
+        for line in conversations:
+            pending.add(pool.submit(replay_conversation, line, default_templates))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    emit_future(future)
+        for future in wait(pending).done:
+            emit_future(future)
+
+    return summary.to_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("input", help="JSONL file of conversations, '-' for stdin")
+    parser.add_argument("-o", "--output", help="JSONL results file, stdout if omitted")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Bound on queued conversations, defaults to 4 per worker",
+    )
+    parser.add_argument("--agent-template", default=DEFAULT_TEMPLATES["agent"])
+    parser.add_argument("--role-template", default=DEFAULT_TEMPLATES["role"])
+    parser.add_argument("--target-template", default=DEFAULT_TEMPLATES["target"])
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated latency of each recorded LLM call",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    default_templates = {
+        "agent": args.agent_template,
+        "role": args.role_template,
+        "target": args.target_template,
+    }
+    max_in_flight = args.max_in_flight or max(1, args.workers) * 4
+
+    with ExitStack() as stack:
+        lines = (
+            sys.stdin
+            if args.input == "-"
+            else stack.enter_context(open(args.input, "r", encoding="utf-8"))
+        )
+        output = (
+            stack.enter_context(open(args.output, "w", encoding="utf-8"))
+            if args.output
+            else sys.stdout
+        )
+        summary = replay(
+            lines,
+            output,
+            workers=args.workers,
+            max_in_flight=max_in_flight,
+            default_templates=default_templates,
+            log_level=args.log_level,
+            llm_latency=args.llm_latency_ms / 1000,
+        )
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Simulate engagements of a role to plan LLM capacity.
+
+Compiles the role into a Markov chain using event priors per state (uniform
+over the events each state offers by default) and simulates engagements in
+vectorized batches. Reports where engagements end and after how many turns,
+where they spend their turns, and the LLM calls they cost.
+
+Priors are a YAML file mapping state names to event weights, e.g.:
+    information_collection: {collect_info: 8, default_fallback_event: 1}
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/simulate_role.py \\
+        src/config/role_template/restaurant_guide_role.yaml --engagements 1000000
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict
+from typing import List, Optional
+
+from core.entity.role import Role
+from core.role_simulator import RoleSimulator, SimulationReport
+from utils.yaml_loader import load_file
+
+
+def print_report(report: SimulationReport, seconds: float, volume: int) -> None:
+    """Print a simulation report as text."""
+    print(
+        f"Simulated {report.engagements:,} engagements in {seconds:.2f}s "
+        f"({report.engagements / seconds:,.0f}/s)"
+    )
+    print("Outcomes:")
+    for state, fraction in report.outcomes.items():
+        turns = report.turns_to_end.get(state)
+        detail = (
+            f"  turns mean {turns['mean']:.2f} p50 {turns['p50']:.0f} "
+            f"p95 {turns['p95']:.0f}"
+            if turns
+            else ""
+        )
+        expected = report.expected_outcomes.get(state)
+        exact = f" (exact {expected:.2%})" if expected is not None else ""
+        print(f"  {state:<28} {fraction:8.2%}{exact}{detail}")
+    print(
+        f"  {'unfinished after ' + str(report.max_turns):<28} {report.unfinished:8.2%}"
+    )
+
+    exact = (
+        f" (exact {report.expected_turns:.2f})"
+        if report.expected_turns is not None
+        else " (no exact value, some engagements never end)"
+    )
+    print(f"Mean turns per engagement: {report.mean_turns:.2f}{exact}")
+    print("Occupancy, mean turns per engagement:")
+    for state, turns in sorted(report.occupancy.items(), key=lambda i: -i[1]):
+        if turns:
+            print(f"  {state:<28} {turns:8.2f}")
+    print(
+        f"LLM calls per engagement: mean {report.mean_llm_calls:.2f}, "
+        f"p95 {report.p95_llm_calls:.0f}; "
+        f"{report.projected_llm_calls(volume):,.0f} per {volume:,} engagements"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("template", help="Role template YAML or compiled artifact")
+    parser.add_argument("--priors", help="YAML file of event weights per state")
+    parser.add_argument("--engagements", type=int, default=1_000_000)
+    parser.add_argument("--max-turns", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--requirement-probability",
+        type=float,
+        default=1.0,
+        help="Chance that the slots a transition requires are filled",
+    )
+    parser.add_argument(
+        "--llm-calls-per-turn",
+        type=float,
+        default=1.0,
+        help="LLM calls per turn, lower it to account for intent caches",
+    )
+    parser.add_argument(
+        "--volume",
+        type=int,
+        default=1_000_000,
+        help="Engagements to project the LLM call volume for",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    simulator = RoleSimulator(
+        Role.from_template(args.template),
+        priors=load_file(args.priors) if args.priors else None,
+        requirement_probability=args.requirement_probability,
+        llm_calls_per_turn=args.llm_calls_per_turn,
+    )
+    started = time.perf_counter()
+    report = simulator.simulate(
+        args.engagements,
+        max_turns=args.max_turns,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
+    seconds = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+    else:
+        print_report(report, seconds, args.volume)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
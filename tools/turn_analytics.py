@@ -0,0 +1,131 @@
+"""Report funnel, latency, event and fallback aggregates of a turn log.
+
+Reads the segments of a ``TURN_LOG_DIR`` into NumPy columns, caching the columns
+of sealed segments so that later runs only scan new segments, and prints the
+report as JSON. ``generate`` writes synthetic engagements walking the restaurant
+guide role to benchmark the analytics.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/turn_analytics.py report turns/
+    PYTHONPATH=src python tools/turn_analytics.py report turns/ \\
+        --funnel information_collection restaurant_recommendation success
+    PYTHONPATH=src python tools/turn_analytics.py generate turns/ --turns 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import List, Optional
+
+# The analytics never reach the provider, but the service center builds a client
+os.environ.setdefault("OPENAI_API_KEY", "offline-analytics")
+
+# pylint:disable=wrong-import-position
+from service.turn_analytics import TurnAnalytics
+from service.turn_log import TurnLog, TurnRecord
+
+# State, event, next state and probability of the synthetic walk
+WALK = {
+    "information_collection": [
+        ("collect_info", "information_collection", 0.45),
+        ("collect_info", "restaurant_recommendation", 0.45),
+        ("default_fallback_event", "error", 0.10),
+    ],
+    "restaurant_recommendation": [
+        ("make_recommendation", "restaurant_detail_retrieval", 0.8),
+        ("modify_preferences", "information_collection", 0.15),
+        ("default_fallback_event", "restaurant_recommendation", 0.05),
+    ],
+    "restaurant_detail_retrieval": [
+        ("details_retrieved", "success", 0.9),
+        ("retrieval_failed", "error", 0.1),
+    ],
+}
+
+
+def report(args) -> dict:
+    """Load the log and compute the aggregates."""
+    started = time.perf_counter()
+    analytics = TurnAnalytics(args.directory)
+    loaded = time.perf_counter()
+    result = analytics.report(funnel=args.funnel)
+    result["load_seconds"] = round(loaded - started, 3)
+    result["aggregate_seconds"] = round(time.perf_counter() - loaded, 3)
+    return result
+
+
+def generate(args) -> dict:
+    """Write synthetic engagements until the number of turns is reached."""
+    rng = random.Random(args.seed)
+    log = TurnLog(args.directory, durable=False)
+    started = time.perf_counter()
+    turns = engagements = 0
+    try:
+        while turns < args.turns:
+            engagement_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            log.append_create([engagement_id], "agent.yaml", "role.yaml", "user.yaml")
+            engagements += 1
+            state = "information_collection"
+            while state in WALK and turns < args.turns:
+                transitions = WALK[state]
+                event, next_state, _ = rng.choices(
+                    transitions, weights=[t[2] for t in transitions]
+                )[0]
+                intent_seconds = rng.lognormvariate(-0.7, 0.4)
+                actions_seconds = rng.expovariate(50)
+                log.append_turn(
+                    TurnRecord(
+                        engagement_id=engagement_id,
+                        state_before=state,
+                        state_after=next_state,
+                        event=event,
+                        actions=[event],
+                        timestamp=time.time(),
+                        turn_seconds=intent_seconds + actions_seconds,
+                        intent_seconds=intent_seconds,
+                        actions_seconds=actions_seconds,
+                        outcome="ok",
+                        query="",
+                        reply="",
+                        slots={},
+                    )
+                )
+                turns += 1
+                state = next_state
+    finally:
+        log.close()
+    return {
+        "turns": turns,
+        "engagements": engagements,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = commands.add_parser("report", help="Report the aggregates")
+    report_parser.add_argument("directory", help="Directory of the turn log")
+    report_parser.add_argument(
+        "--funnel", nargs="+", help="States of the funnel in order"
+    )
+    report_parser.set_defaults(run=report)
+
+    generate_parser = commands.add_parser("generate", help="Write synthetic turns")
+    generate_parser.add_argument("directory", help="Directory of the turn log")
+    generate_parser.add_argument("--turns", type=int, default=1_000_000)
+    generate_parser.add_argument("--seed", type=int)
+    generate_parser.set_defaults(run=generate)
+
+    args = parser.parse_args(argv)
+    print(json.dumps(args.run(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
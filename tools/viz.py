@@ -1,10 +1,75 @@
+"""Render a role template's state machine with Graphviz.
+
+With a snapshot of the transition counters, dumped to ``TRANSITION_COUNTERS_FILE``
+or served on ``/admin/transitions``, the graph becomes a runtime heatmap: edge
+widths follow how often each transition was taken, and nodes are coloured from
+green to red by their p95 turn latency.
+
+Usage (from the repository root):
+    PYTHONPATH=src python tools/viz.py \\
+        src/config/role_template/restaurant_guide_role.yaml --counters counters.json
+"""
+import argparse
+import json
+import math
+import sys
+from typing import Dict, List, Optional
+
 import graphviz
 
 from core.entity.role import Role
 
+# Roles with more states are laid out with sfdp and drop state descriptions
+LARGE_ROLE_STATES = 50
+
+STATE_COLORS = {"start": "#90EE90", "end": "#FFB6C1"}
+DEFAULT_STATE_COLOR = "#ADD8E6"
+
+
+def load_counters(counters_path: str, role_name: str) -> Optional[Dict]:
+    """Load the counters of a role from a snapshot file.
+
+    Args:
+        counters_path: JSON snapshot written by TransitionCounters
+        role_name: Name of the role to get the counters of
+
+    Returns:
+        Optional[Dict]: States and transitions of the role, None if it has no counters
+    """
+    with open(counters_path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    return snapshot.get("roles", {}).get(role_name)
+
+
+def heat_color(value: float, low: float, high: float) -> str:
+    """Interpolate between green and red.
 
-def visualize_state_machine(
-    template_path: str, output_path: str = "state_machine"
+    Args:
+        value: Value to colour
+        low: Value shown green
+        high: Value shown red
+
+    Returns:
+        str: Hex colour
+    """
+    ratio = 0.0 if high <= low else min(max((value - low) / (high - low), 0.0), 1.0)
+    red = int(0x4C + (0xE0 - 0x4C) * ratio)
+    green = int(0xC0 + (0x40 - 0xC0) * ratio)
+    return f"#{red:02X}{green:02X}40"
+
+
+def edge_width(count: int, max_count: int) -> float:
+    """Scale the pen width of an edge logarithmically with its traffic."""
+    if not count or not max_count:
+        return 1.0
+    return 1.0 + 7.0 * math.log1p(count) / math.log1p(max_count)
+
+
+def visualize_state_machine(  # pylint:disable=too-many-locals
+    template_path: str,
+    output_path: str = "state_machine",
+    counters_path: Optional[str] = None,
+    fmt: str = "png",
 ) -> None:
     """
     Visualize the state machine defined in the YAML template using Graphviz.
@@ -12,13 +77,34 @@ def visualize_state_machine(
     Args:
         template_path: Path to the YAML template file
         output_path: Path where the visualization should be saved (without extension)
+        counters_path: Optional counters snapshot to overlay as a heatmap
+        fmt: Output format, e.g. png or svg
     """
     # Parse the template
     role = Role.from_template(template_path)
+    counters = load_counters(counters_path, role.name) if counters_path else None
+    state_counters = counters["states"] if counters else {}
+    edge_counts = {
+        (t["from"], t["to"]): t["count"]
+        for t in (counters or {}).get("transitions", [])
+    }
+    large = len(role.states) > LARGE_ROLE_STATES
 
     # Create a new directed graph
     dot = graphviz.Digraph(comment="State Machine Visualization")
-    dot.attr(rankdir="LR")  # Left to right layout
+    if large:
+        # Hierarchical layouts get unreadable and slow with hundreds of states
+        dot.engine = "sfdp"
+        dot.attr(overlap="prism", splines="true", outputorder="edgesfirst")
+    else:
+        dot.attr(rankdir="LR")  # Left to right layout
+
+    p95s = [
+        s["latency_p95"]
+        for s in state_counters.values()
+        if s.get("latency_p95") is not None
+    ]
+    low, high = (min(p95s), max(p95s)) if p95s else (0.0, 0.0)
 
     # Add nodes (states)
     for state_name, state in role.states.items():
@@ -26,34 +112,65 @@ def visualize_state_machine(
         node_attrs = {
             "shape": "rectangle",
             "style": "filled",
-            "fillcolor": "#90EE90"
-            if state.state_type == "start"
-            else "#FFB6C1"
-            if state.state_type == "end"
-            else "#ADD8E6",
+            "fillcolor": STATE_COLORS.get(state.state_type, DEFAULT_STATE_COLOR),
             "width": "0.5",  # Set width of the node
             "height": "0.5",  # Set height of the node
         }
 
         # Add label with description if available
-        label = state_name
-        if state.description:
-            label += f"\n{state.description}"
+        lines: List[str] = [state_name]
+        if state.description and not large:
+            lines.append(state.description)
+
+        stats = state_counters.get(state_name)
+        if stats and stats.get("latency_p95") is not None:
+            node_attrs["fillcolor"] = heat_color(stats["latency_p95"], low, high)
+            lines.append(
+                f"{stats['turns']} turns, p95 {stats['latency_p95'] * 1000:.0f} ms"
+            )
+        if stats and stats.get("dwell_mean") is not None:
+            lines.append(f"dwell {stats['dwell_mean']:.1f} s")
 
-        dot.node(state_name, label, **node_attrs)
+        dot.node(state_name, "\n".join(lines), **node_attrs)
 
     # Add edges (transitions)
+    max_count = max(edge_counts.values(), default=0)
     for state_name, state in role.states.items():
         for transition in state.transitions:
             edge_label = transition.condition if transition.condition else ""
-            dot.edge(state_name, transition.to, edge_label)
+            edge_attrs = {}
+            if counters:
+                count = edge_counts.get((state_name, transition.to), 0)
+                edge_attrs["penwidth"] = f"{edge_width(count, max_count):.2f}"
+                edge_label = f"{edge_label} ({count})" if edge_label else str(count)
+                if not count:
+                    edge_attrs["color"] = "#BBBBBB"
+            dot.edge(state_name, transition.to, edge_label, **edge_attrs)
 
     # Save the visualization
-    dot.render(output_path, format="png", cleanup=True)
-    print(f"Visualization saved to {output_path}.png")
+    dot.render(output_path, format=fmt, cleanup=True)
+    print(f"Visualization saved to {output_path}.{fmt}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("template", help="Role template YAML or compiled artifact")
+    parser.add_argument(
+        "--output", default="state_machine", help="Path without extension"
+    )
+    parser.add_argument("--counters", help="Counters snapshot JSON to overlay")
+    parser.add_argument("--format", default="png", help="Graphviz output format")
+    args = parser.parse_args(argv)
+
+    visualize_state_machine(
+        args.template,
+        output_path=args.output,
+        counters_path=args.counters,
+        fmt=args.format,
+    )
+    return 0
 
 
 if __name__ == "__main__":
-    # Example usage
-    file_path = "../src/config/role_template/restaurant_guide_role.yaml"
-    visualize_state_machine(file_path)
+    sys.exit(main())